@@ -12,7 +12,19 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
+# Serve /graphql with the async view
+os.environ.setdefault('CRM_GRAPHQL_ASYNC', 'True')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from crm.websocket import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Serve websockets (GraphQL subscriptions) and HTTP (Django)."""
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
 
 
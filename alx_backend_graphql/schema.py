@@ -2,7 +2,10 @@
 Main GraphQL schema for the project.
 """
 import graphene
-from crm.schema import Query as CRMQuery, Mutation as CRMMutation
+from crm.schema import (
+    AsyncMutation as CRMAsyncMutation, AsyncQuery as CRMAsyncQuery,
+    Mutation as CRMMutation, Query as CRMQuery, Subscription as CRMSubscription,
+)
 
 
 class Query(CRMQuery, graphene.ObjectType):
@@ -15,6 +18,29 @@ class Mutation(CRMMutation, graphene.ObjectType):
     pass
 
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+class Subscription(CRMSubscription, graphene.ObjectType):
+    """Main Subscription class combining all app subscriptions."""
+    pass
+
+
+schema = graphene.Schema(query=Query, mutation=Mutation, subscription=Subscription)
+
+
+class AsyncQuery(CRMAsyncQuery, graphene.ObjectType):
+    """Main Query class with async resolvers, for the ASGI view."""
+    class Meta:
+        name = 'Query'
+        description = Query._meta.description
+
+
+class AsyncMutation(CRMAsyncMutation, graphene.ObjectType):
+    """Main Mutation class with async mutations, for the ASGI view."""
+    class Meta:
+        name = 'Mutation'
+        description = Mutation._meta.description
 
 
+# Same API as ``schema``, executed by crm.views.AsyncCRMGraphQLView
+async_schema = graphene.Schema(
+    query=AsyncQuery, mutation=AsyncMutation, subscription=Subscription
+)
@@ -137,10 +137,92 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 GRAPHENE = {
     'SCHEMA': 'alx_backend_graphql.schema.schema',
     'MIDDLEWARE': [
-        'graphene_django.extras.CountMiddleware',
+        'crm.tracing.TracingMiddleware',
     ],
 }
 
+# Batches: a JSON array of up to CRM_GRAPHQL_MAX_BATCH_SIZE operations is
+# executed in one request; the async view runs consecutive queries of a
+# batch concurrently when CRM_GRAPHQL_BATCH_PARALLEL is on
+CRM_GRAPHQL_MAX_BATCH_SIZE = 20
+CRM_GRAPHQL_BATCH_PARALLEL = True
+
+# Subscriptions: published through CRM_PUBSUB_BROKER (in-process by default;
+# point it at a shared broker to fan out across ASGI workers) to websocket
+# clients, each buffering up to CRM_SUBSCRIPTION_QUEUE_SIZE messages
+CRM_PUBSUB_BROKER = config('CRM_PUBSUB_BROKER', default='crm.pubsub.InProcessBroker')
+CRM_SUBSCRIPTION_QUEUE_SIZE = 100
+CRM_WEBSOCKET_INIT_TIMEOUT = 10
+
+# Change feed: tombstones of deleted rows are kept this long
+CRM_TOMBSTONE_RETENTION_DAYS = 90
+
+# Serve /graphql with the async view; asgi.py turns this on
+CRM_GRAPHQL_ASYNC = config('CRM_GRAPHQL_ASYNC', default=False, cast=bool)
+
+# Tracing: this fraction of GraphQL requests is traced per resolver and SQL
+# query and logged to crm.tracing; CRM_TRACING_EXTENSIONS also returns the
+# trace in the response extensions
+CRM_TRACING_SAMPLE_RATE = config('CRM_TRACING_SAMPLE_RATE', default=0.01, cast=float)
+CRM_TRACING_EXTENSIONS = DEBUG
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'crm.tracing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Query limits: operations nested deeper than CRM_QUERY_MAX_DEPTH or with an
+# estimated cost (objects resolved, weighted per "Type.field") above
+# CRM_QUERY_MAX_COST are rejected before execution
+CRM_QUERY_MAX_DEPTH = 10
+CRM_QUERY_MAX_COST = config('CRM_QUERY_MAX_COST', default=10000, cast=int)
+CRM_QUERY_COST_WEIGHTS = {}
+# Page size assumed for connections without first/last nested inside a list
+# or another connection; top-level ones assume RELAY_CONNECTION_MAX_LIMIT
+CRM_QUERY_NESTED_PAGE_SIZE = 10
+
+# Caches: Redis when REDIS_CACHE_URL is set (production), else in-process
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+    } if REDIS_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Opt-in response cache for read-only queries, invalidated by model signals;
+# responses live for the shortest TTL (seconds) among the models they read
+CRM_RESPONSE_CACHE_ENABLED = config('CRM_RESPONSE_CACHE_ENABLED', default=False, cast=bool)
+CRM_RESPONSE_CACHE_ALIAS = 'default'
+CRM_RESPONSE_CACHE_DEFAULT_TTL = 60
+CRM_RESPONSE_CACHE_TTLS = {
+    'Customer': 60,
+    'Product': 300,
+    'Order': 30,
+}
+
+# Automatic persisted queries: registered documents live in this cache,
+# parsed documents in a per-process LRU of CRM_DOCUMENT_CACHE_SIZE entries
+CRM_PERSISTED_QUERY_CACHE = 'default'
+CRM_PERSISTED_QUERY_TIMEOUT = None
+CRM_DOCUMENT_CACHE_SIZE = config('CRM_DOCUMENT_CACHE_SIZE', default=256, cast=int)
+
+# GraphQL execution for cron jobs and Celery tasks: 'local' runs documents
+# in-process against the schema, 'http' posts them to CRM_GRAPHQL_URL
+CRM_GRAPHQL_EXECUTOR = config('CRM_GRAPHQL_EXECUTOR', default='local')
+CRM_GRAPHQL_URL = config('CRM_GRAPHQL_URL', default='http://localhost:8000/graphql')
+CRM_GRAPHQL_HTTP_RETRIES = config('CRM_GRAPHQL_HTTP_RETRIES', default=3, cast=int)
+CRM_GRAPHQL_HTTP_TIMEOUT = config('CRM_GRAPHQL_HTTP_TIMEOUT', default=10, cast=float)
+CRM_GRAPHQL_HTTP_PERSISTED = config('CRM_GRAPHQL_HTTP_PERSISTED', default=True, cast=bool)
+
 # Cron Jobs Configuration
 CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
@@ -1,14 +1,24 @@
 """
 URL configuration for alx_backend_graphql project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 
+from crm.views import (
+    AsyncCRMGraphQLView, CRMGraphQLView, export_orders_view, graphql_stats,
+)
+
+# /graphql is served by the async view under ASGI (see asgi.py)
+GraphQLViewClass = AsyncCRMGraphQLView if settings.CRM_GRAPHQL_ASYNC else CRMGraphQLView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path('graphql', csrf_exempt(GraphQLViewClass.as_view(graphiql=True))),
+    path('graphql/async', csrf_exempt(AsyncCRMGraphQLView.as_view(graphiql=True))),
+    path('graphql/stats', graphql_stats),
+    path('export/orders', export_orders_view),
 ]
 
 
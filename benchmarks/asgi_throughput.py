@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+Benchmark sync WSGI against async ASGI GraphQL throughput.
+
+Drives Django's WSGI handler (the sync view, at most ``--workers`` requests
+at a time) and ASGI handler (the async view, on one event loop) in-process
+with the same number of concurrent clients, against a throwaway test
+database, and prints requests per second and p50/p99 latency for each.
+``--db-latency`` adds a sleep to every SQL query to stand in for a database
+across the network; with SQLite in-process both handlers are otherwise CPU
+bound and the comparison mostly measures per-request overhead.
+
+Usage:
+    python benchmarks/asgi_throughput.py --clients 50 --workers 8 --db-latency 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import django
+
+# Setup Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.client import RequestFactory
+
+from crm.models import Customer, Order, Product
+
+QUERIES = [
+    """
+    query Orders {
+        allOrders(first: 20) {
+            edges { node { totalAmount customer { name } products { edges { node { name } } } } }
+        }
+    }
+    """,
+    "query Stats { crmStats { customers orders revenue averageOrderValue } }",
+]
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of ``samples`` (nearest rank)."""
+    ordered = sorted(samples)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def seed(customers, orders_per_customer=3):
+    """Insert customers with a few orders of two products each."""
+    products = Product.objects.bulk_create([
+        Product(name=f"Bench Product {idx}", price=Decimal("4.50"), stock=100)
+        for idx in range(20)
+    ])
+    created = Customer.objects.bulk_create([
+        Customer(name=f"Bench Customer {idx}", email=f"bench{idx}@example.com")
+        for idx in range(customers)
+    ])
+    orders = Order.objects.bulk_create([
+        Order(customer=customer, total_amount=Decimal("9.00"))
+        for customer in created
+        for _ in range(orders_per_customer)
+    ])
+    OrderProduct = Order.products.through
+    OrderProduct.objects.bulk_create([
+        OrderProduct(order_id=order.pk, product_id=products[(idx + n) % len(products)].pk)
+        for idx, order in enumerate(orders)
+        for n in range(2)
+    ])
+
+
+def add_db_latency(milliseconds):
+    """Sleep ``milliseconds`` around every query on every connection."""
+    def slow_execute(execute, sql, params, many, context):
+        time.sleep(milliseconds / 1000)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(slow_execute)
+
+    connection_created.connect(install, weak=False)
+    connection.execute_wrappers.append(slow_execute)
+
+
+def request_bodies(total):
+    return [
+        json.dumps({'query': QUERIES[idx % len(QUERIES)]}).encode()
+        for idx in range(total)
+    ]
+
+
+def run_wsgi(path, bodies, clients, workers):
+    """Return latency samples (ms) and elapsed seconds for the WSGI handler."""
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    # At most ``workers`` requests are served at once, like a threaded WSGI
+    # server; latency includes the wait for a free worker
+    server = threading.BoundedSemaphore(workers)
+    queue = list(bodies)
+    samples = []
+
+    def call(body):
+        environ = factory.post(
+            path, body, content_type='application/json', HTTP_HOST='localhost'
+        ).environ
+        status = []
+        start = time.perf_counter()
+        with server:
+            chunks = handler(environ, lambda code, headers: status.append(code))
+            b''.join(chunks)
+        samples.append((time.perf_counter() - start) * 1000)
+        if not status[0].startswith('200'):
+            raise SystemExit(f"WSGI request failed: {status[0]}")
+
+    def client():
+        while queue:
+            call(queue.pop())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for future in [pool.submit(client) for _ in range(clients)]:
+            future.result()
+    return samples, time.perf_counter() - started
+
+
+async def asgi_call(app, path, body):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'POST',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'content-type', b'application/json')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects early
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = (time.perf_counter() - start) * 1000
+    if status[0] != 200:
+        raise SystemExit(f"ASGI request failed: {status[0]}")
+    return elapsed
+
+
+def run_asgi(path, bodies, clients):
+    """Return latency samples (ms) and elapsed seconds for the ASGI handler."""
+    handler = ASGIHandler()
+
+    async def client(queue, samples):
+        while queue:
+            samples.append(await asgi_call(handler, path, queue.pop()))
+
+    async def main():
+        queue = list(bodies)
+        samples = []
+        await asyncio.gather(*(client(queue, samples) for _ in range(clients)))
+        return samples
+
+    started = time.perf_counter()
+    samples = asyncio.run(main())
+    return samples, time.perf_counter() - started
+
+
+def report(label, samples, elapsed):
+    print(
+        f"{label:>6} {len(samples) / elapsed:>10.1f} {statistics.median(samples):>10.2f} "
+        f"{percentile(samples, 99):>10.2f}"
+    )
+
+
+def run(customers, requests, clients, workers, db_latency):
+    # Only the sync view traces; keep both doing the same work
+    settings.CRM_TRACING_SAMPLE_RATE = 0
+    seed(customers)
+    if db_latency:
+        add_db_latency(db_latency)
+    bodies = request_bodies(requests)
+
+    print(f"{requests} requests, {clients} clients, {workers} WSGI workers, "
+          f"{db_latency} ms per query")
+    print(f"{'server':>6} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    report('wsgi', *run_wsgi('/graphql', bodies, clients, workers))
+    report('asgi', *run_asgi('/graphql/async', bodies, clients))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--customers', type=int, default=1000,
+                        help='number of synthetic customers to seed')
+    parser.add_argument('--requests', type=int, default=500, help='requests per server')
+    parser.add_argument('--clients', type=int, default=50, help='concurrent clients')
+    parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--db-latency', type=float, default=0,
+                        help='milliseconds added to every SQL query')
+    args = parser.parse_args()
+
+    # Never benchmark against the development database
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(args.customers, args.requests, args.clients, args.workers, args.db_latency)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Benchmark createOrder latency against basket size.
+
+Runs the mutation in-process against a throwaway test database and prints
+the median and p95 latency plus the SQL query count for each basket size.
+
+Usage:
+    python benchmarks/create_order_latency.py --sizes 1,10,50,200 --runs 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+import django
+
+# Setup Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from alx_backend_graphql.schema import schema
+from crm.models import Customer, Product
+
+MUTATION = """
+    mutation CreateOrder($input: OrderInput!) {
+        createOrder(input: $input) {
+            order { id totalAmount }
+        }
+    }
+"""
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of ``samples`` (nearest rank)."""
+    ordered = sorted(samples)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def run(sizes, runs):
+    """Time ``runs`` createOrder calls for each basket size."""
+    customer = Customer.objects.create(name="Bench Customer", email="bench@example.com")
+    products = Product.objects.bulk_create([
+        Product(name=f"Bench Product {idx}", price=Decimal("9.99"), stock=100)
+        for idx in range(max(sizes))
+    ])
+
+    print(f"{'basket':>8} {'p50 ms':>10} {'p95 ms':>10} {'queries':>8}")
+    for size in sizes:
+        variables = {'input': {
+            'customerId': str(customer.pk),
+            'productIds': [str(product.pk) for product in products[:size]],
+        }}
+        samples = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                result = schema.execute(MUTATION, variable_values=variables)
+                samples.append((time.perf_counter() - start) * 1000)
+            if result.errors:
+                raise SystemExit(f"createOrder failed: {result.errors}")
+        print(
+            f"{size:>8} {statistics.median(samples):>10.2f} "
+            f"{percentile(samples, 95):>10.2f} {len(queries):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1,10,50,200',
+                        help='comma separated basket sizes')
+    parser.add_argument('--runs', type=int, default=50, help='mutations per basket size')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    # Never benchmark against the development database
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(sizes, args.runs)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+Benchmark representative GraphQL operations against a JSON baseline.
+
+Seeds a throwaway test database with ``crm.synthetic`` data, replays each
+query and mutation in ``OPERATIONS`` ``--runs`` times through the
+``/graphql`` view, and records p50/p99 latency and the SQL query count of
+every operation. ``--output`` writes the results as JSON; ``--compare``
+reads an earlier file and exits non-zero when an operation issues more
+queries than the baseline or its p99 grew by more than ``--tolerance``.
+The data is seeded with a fixed ``--seed`` and end date, so runs on the
+same machine are comparable; latencies across machines are not.
+
+Usage:
+    python benchmarks/graphql_suite.py --output benchmarks/baseline.json
+    python benchmarks/graphql_suite.py --compare benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+
+# Setup Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from crm.models import Customer, Product
+from crm.synthetic import generate
+
+# Latest synthetic order date, fixed so every run sees the same data
+END = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+ORDER_FIELDS = (
+    "id totalAmount orderDate customer { name } products(first: 10) { edges { node { name } } }"
+)
+
+# name -> (document, variables factory taking the run number and the seeded rows)
+OPERATIONS = {
+    'hello': ("query { hello }", None),
+    'customersByName': (
+        "query($name: String) { allCustomersFiltered(first: 20, nameIcontains: $name) "
+        "{ edges { node { id name email } } } }",
+        lambda run, data: {'name': ['ali', 'smi', 'mwa', 'ng'][run % 4]},
+    ),
+    'customerSearch': (
+        "query($search: String) { allCustomersFiltered(first: 20, search: $search) "
+        "{ edges { node { id name email } } } }",
+        lambda run, data: {'search': ['alice johnson', 'omar', 'patel'][run % 3]},
+    ),
+    'lowStockProducts': (
+        "query { allProducts(first: 50, lowStock: true) { edges { node { id name stock } } } }",
+        None,
+    ),
+    'recentOrders': (
+        f"query {{ allOrders(first: 50) {{ edges {{ node {{ {ORDER_FIELDS} }} }} }} }}",
+        None,
+    ),
+    'largeOrders': (
+        "query { allOrders(first: 50, totalAmountGte: 500) "
+        f"{{ edges {{ node {{ {ORDER_FIELDS} }} }} }} }}",
+        None,
+    ),
+    'crmStats': (
+        "query($start: DateTime) { crmStats(start: $start) "
+        "{ customers orders revenue averageOrderValue } }",
+        lambda run, data: {'start': (END - timedelta(days=30)).isoformat()},
+    ),
+    'ordersChangedSince': (
+        "query($since: DateTime!) { ordersChangedSince(since: $since, first: 100) "
+        "{ edges { node { id totalAmount updatedAt } } pageInfo { endCursor } } }",
+        lambda run, data: {'since': data['started'].isoformat()},
+    ),
+    'createCustomer': (
+        "mutation($name: String!, $email: String!, $phone: String!) "
+        "{ createCustomer(name: $name, email: $email, phone: $phone) { customer { id } } }",
+        lambda run, data: {
+            'name': f"Bench {run}", 'email': f"bench{run}@example.com",
+            'phone': f"+1555{run:07d}",
+        },
+    ),
+    'createOrder': (
+        "mutation($input: OrderInput!) { createOrder(input: $input) { order { id } } }",
+        lambda run, data: {'input': {
+            'customerId': str(data['customers'][run % len(data['customers'])]),
+            'productIds': [
+                str(data['products'][(run + offset) % len(data['products'])])
+                for offset in range(3)
+            ],
+        }},
+    ),
+}
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of ``samples`` (nearest rank)."""
+    ordered = sorted(samples)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def run_operation(client, document, variables, runs, data):
+    """Return latency samples (ms) and the most queries of the ``runs`` requests."""
+    samples, queries = [], 0
+    for run in runs:
+        body = {'query': document}
+        if variables is not None:
+            body['variables'] = variables(run, data)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.post(
+                '/graphql', json.dumps(body), content_type='application/json',
+                HTTP_HOST='localhost',
+            )
+            samples.append((time.perf_counter() - start) * 1000)
+        result = response.json()
+        if response.status_code != 200 or result.get('errors'):
+            errors = result.get('errors') or response.status_code
+            raise SystemExit(f"{document!r} failed: {errors}")
+        queries = max(queries, len(captured))
+    return samples, queries
+
+
+def run(args):
+    # Measure the operations, not tracing or cached responses
+    settings.CRM_TRACING_SAMPLE_RATE = 0
+    settings.CRM_RESPONSE_CACHE_ENABLED = False
+    started = datetime.now(timezone.utc)
+    counts = generate(
+        args.customers, args.products, args.orders, seed=args.seed, end=END,
+    )
+    data = {
+        'started': started,
+        'customers': list(Customer.objects.order_by('pk').values_list('pk', flat=True)[:1000]),
+        'products': list(Product.objects.order_by('pk').values_list('pk', flat=True)[:1000]),
+    }
+
+    client = Client()
+    names = args.operations.split(',') if args.operations else list(OPERATIONS)
+    results = {}
+    print(f"{'operation':>20} {'p50 ms':>10} {'p99 ms':>10} {'queries':>8}")
+    for name in names:
+        document, variables = OPERATIONS[name]
+        # Warm up the document cache and connection before timing; mutations
+        # get distinct run numbers so they never collide
+        run_operation(client, document, variables, [args.runs], data)
+        samples, queries = run_operation(client, document, variables, range(args.runs), data)
+        results[name] = {
+            'p50_ms': round(statistics.median(samples), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'queries': queries,
+        }
+        print(f"{name:>20} {results[name]['p50_ms']:>10.2f} {results[name]['p99_ms']:>10.2f} "
+              f"{queries:>8}")
+
+    return {
+        'meta': {
+            'created': started.isoformat(),
+            'seed': args.seed,
+            'rows': counts,
+            'runs': args.runs,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'operations': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against ``baseline``; return the names of regressed operations."""
+    if baseline['meta'].get('rows') != results['meta']['rows']:
+        print("warning: the baseline was recorded with different data sizes")
+    regressions = []
+    print(f"\n{'operation':>20} {'p99 ms':>17} {'queries':>10}")
+    for name, current in results['operations'].items():
+        before = baseline['operations'].get(name)
+        if before is None:
+            print(f"{name:>20} {'(new)':>17}")
+            continue
+        slower = current['p99_ms'] > before['p99_ms'] * (1 + tolerance)
+        more_queries = current['queries'] > before['queries']
+        flag = '  REGRESSION' if slower or more_queries else ''
+        print(f"{name:>20} {before['p99_ms']:>8.2f}->{current['p99_ms']:<8.2f} "
+              f"{before['queries']:>4}->{current['queries']:<4}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0, help='synthetic data seed')
+    parser.add_argument('--runs', type=int, default=50, help='requests per operation')
+    parser.add_argument('--operations', help='comma separated subset of operations')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p99 growth before a regression')
+    args = parser.parse_args()
+    unknown = set(args.operations.split(',') if args.operations else []) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+
+    # Never benchmark against the development database
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        results = run(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            raise SystemExit(f"Regressed: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmark the indexed name/email search against a plain icontains scan.
+
+Seeds a throwaway test database with synthetic customers and prints the
+median and p95 latency of each search term for both the unindexed
+``icontains`` lookup and the database's search backend.
+
+Usage:
+    python benchmarks/search_latency.py --customers 1000000 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import django
+
+# Setup Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
+django.setup()
+
+from django.db import connection
+
+from crm.models import Customer
+from crm.search import SearchBackend, get_search_backend
+
+FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'Dmitri', 'Esther', 'Farid', 'Grace', 'Hiroshi']
+LAST_NAMES = ['Smith', 'Okafor', 'Nakamura', 'Garcia', 'Mwangi', 'Novak', 'Larsen']
+TERMS = ['ali', 'mwangi', 'okafor42', 'customer7@', 'zzzz']
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of ``samples`` (nearest rank)."""
+    ordered = sorted(samples)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def seed(count, batch_size=5000):
+    """Insert ``count`` synthetic customers."""
+    for start in range(0, count, batch_size):
+        Customer.objects.bulk_create([
+            Customer(
+                name=f"{FIRST_NAMES[idx % len(FIRST_NAMES)]} "
+                     f"{LAST_NAMES[idx % len(LAST_NAMES)]}{idx}",
+                email=f"customer{idx}@example.com",
+            )
+            for idx in range(start, min(start + batch_size, count))
+        ], batch_size=batch_size)
+
+
+def time_lookup(lookup, runs):
+    """Return latency samples in milliseconds and the row count for ``lookup``."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = len(lookup())
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, rows
+
+
+def run(customers, runs):
+    """Compare plain and indexed lookups for each search term."""
+    seed(customers)
+    plain = SearchBackend()
+    backend = get_search_backend()
+    queryset = Customer.objects.order_by()
+
+    print(f"{customers} customers, backend {type(backend).__name__}")
+    print(f"{'term':>12} {'rows':>8} {'plain p50':>10} {'plain p95':>10} "
+          f"{'index p50':>10} {'index p95':>10}")
+    for term in TERMS:
+        plain_samples, rows = time_lookup(
+            lambda: list(plain.contains(queryset, ['name', 'email'], term).values_list('pk')),
+            runs,
+        )
+        index_samples, index_rows = time_lookup(
+            lambda: list(backend.contains(queryset, ['name', 'email'], term).values_list('pk')),
+            runs,
+        )
+        if rows != index_rows:
+            raise SystemExit(f"Result mismatch for {term!r}: {rows} != {index_rows}")
+        print(
+            f"{term:>12} {rows:>8} {statistics.median(plain_samples):>10.2f} "
+            f"{percentile(plain_samples, 95):>10.2f} "
+            f"{statistics.median(index_samples):>10.2f} "
+            f"{percentile(index_samples, 95):>10.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--customers', type=int, default=100000,
+                        help='number of synthetic customers to seed')
+    parser.add_argument('--runs', type=int, default=20, help='lookups per term')
+    args = parser.parse_args()
+
+    # Never benchmark against the development database
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(args.customers, args.runs)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
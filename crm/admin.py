@@ -2,7 +2,7 @@
 Django admin configuration for CRM models.
 """
 from django.contrib import admin
-from .models import Customer, Product, Order
+from .models import Customer, Product, Order, Tombstone
 
 
 @admin.register(Customer)
@@ -30,3 +30,8 @@ class OrderAdmin(admin.ModelAdmin):
     filter_horizontal = ['products']
 
 
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    """Admin interface for Tombstone model."""
+    list_display = ['id', 'model', 'object_id', 'deleted_at']
+    list_filter = ['model', 'deleted_at']
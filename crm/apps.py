@@ -5,4 +5,5 @@ class CrmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crm'
 
-
+    def ready(self):
+        from . import signals  # noqa: F401
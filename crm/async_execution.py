@@ -0,0 +1,101 @@
+"""
+Async execution of GraphQL documents for the ASGI view.
+
+Documents run on the event loop with graphql-core's async executor against
+``alx_backend_graphql.schema.async_schema``, whose ``crmStats`` resolver
+and ``createCustomer``/``createProduct`` mutations use Django's async ORM
+interface. Every other resolver is synchronous ORM code, which must not run
+on the event loop, so ``SyncResolverMiddleware`` moves it to the request's
+thread with ``sync_to_async``:
+
+* root fields (queries and mutations) always run in the thread, and
+  querysets they return are evaluated there;
+* nested fields are resolved inline, since they mostly read attributes of
+  already loaded rows, and are retried in the thread when they turn out to
+  need the database: Django raises ``SynchronousOnlyOperation`` before
+  issuing any query.
+
+Subscriptions execute the document once per event, with the same
+middleware and a fresh context, so loaders never serve one event's rows
+to the next.
+"""
+from asyncio import iscoroutinefunction
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db.models.query import QuerySet
+from graphql import ExecutionResult, create_source_event_stream, execute
+
+
+def evaluate(result):
+    """Return ``result`` with querysets evaluated, so no query runs on the event loop."""
+    if isinstance(result, QuerySet) and result._result_cache is None:
+        return list(result)
+    return result
+
+
+def resolve_sync(next, root, info, **args):
+    return evaluate(next(root, info, **args))
+
+
+class SyncResolverMiddleware:
+    """
+    Graphene middleware running synchronous resolvers off the event loop.
+    Must come first in the middleware list, which graphql-core makes the
+    innermost, so ``next`` is the resolver itself.
+    """
+
+    def resolve(self, next, root, info, **args):
+        if iscoroutinefunction(next):
+            return next(root, info, **args)
+        if info.parent_type in (info.schema.query_type, info.schema.mutation_type):
+            return sync_to_async(resolve_sync)(next, root, info, **args)
+
+        try:
+            result = next(root, info, **args)
+        except SynchronousOnlyOperation:
+            return sync_to_async(resolve_sync)(next, root, info, **args)
+        if isinstance(result, QuerySet) and result._result_cache is None:
+            return sync_to_async(evaluate)(result)
+        return result
+
+
+async def execute_document_async(schema, document, **options):
+    """Execute an already validated ``document`` against the graphene ``schema``."""
+    result = execute(schema.graphql_schema, document, **options)
+    if isawaitable(result):
+        result = await result
+    return result
+
+
+async def subscribe_document(schema, document, context_factory, **options):
+    """
+    Subscribe to an already validated subscription ``document``. Returns an
+    ``ExecutionResult`` with the errors when the subscription could not be
+    set up, or an async iterator of one result per event.
+    """
+    stream = create_source_event_stream(
+        schema.graphql_schema,
+        document,
+        context_value=context_factory(),
+        variable_values=options.get('variable_values'),
+        operation_name=options.get('operation_name'),
+    )
+    if isawaitable(stream):
+        stream = await stream
+    if isinstance(stream, ExecutionResult):
+        return stream
+    return event_results(schema, document, stream, context_factory, options)
+
+
+async def event_results(schema, document, stream, context_factory, options):
+    try:
+        async for event in stream:
+            yield await execute_document_async(
+                schema, document, root_value=event, context_value=context_factory(), **options
+            )
+    finally:
+        aclose = getattr(stream, 'aclose', None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,223 @@
+"""
+Query cost analysis.
+
+Every operation gets an estimated cost before it executes: the number of
+objects it can resolve, weighted per field. A connection multiplies the
+cost of its ``edges`` by the page size the client asked for with
+``first``/``last``, plain lists by ``DEFAULT_LIST_SIZE``, and nested
+connections multiply each other, so
+``allOrders(first: 100) { ... customer { orders { ... products ... } } }``
+is priced at what it would really fetch. An omitted page size counts as
+the relay maximum at the top level, but as ``DEFAULT_NESTED_PAGE_SIZE``
+inside another list or connection: an order's products or a customer's
+orders are a handful of rows, and pricing them at the maximum would reject
+ordinary queries like ``allOrders { ... products { ... } }``.
+``query_cost_validator`` rejects
+operations over budget as a validation error; the view runs it together
+with graphene's ``depth_limit_validator`` and reports the cost in the
+response ``extensions``.
+"""
+import graphene
+from django.conf import settings
+from graphene.utils.is_introspection_key import is_introspection_key
+from graphene.validation import depth_limit_validator
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode, FragmentSpreadNode, GraphQLError, GraphQLInt, InlineFragmentNode,
+    OperationDefinitionNode, Undefined, VariableNode, get_named_type, get_nullable_type,
+    is_leaf_type, is_list_type, value_from_ast,
+)
+from graphql.validation import ValidationRule
+
+DEFAULT_MAX_COST = 10000
+DEFAULT_MAX_DEPTH = 10
+
+# Assumed length of lists that are not paginated (e.g. allCustomers)
+DEFAULT_LIST_SIZE = 100
+
+# Assumed page size of a connection without first/last nested in a list or
+# another connection (e.g. an order's products)
+DEFAULT_NESTED_PAGE_SIZE = 10
+
+# Extra cost per resolved object, on top of 1 for objects and 0 for scalars;
+# keyed by "Type.field"
+FIELD_WEIGHTS = {
+    'Query.crmStats': 10,
+    'CRMStatsType.weeks': 5,
+}
+
+
+def operation_key(operation):
+    """Return the name ``operation`` is reported under."""
+    return operation.name.value if operation.name else 'anonymous'
+
+
+def is_connection(graphql_type):
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, graphene.relay.Connection)
+
+
+class CostAnalyzer:
+    """Estimate the cost of the operations in a document."""
+
+    def __init__(
+        self, schema, document, variables=None, weights=None,
+        list_size=DEFAULT_LIST_SIZE, page_size=None, nested_page_size=DEFAULT_NESTED_PAGE_SIZE,
+    ):
+        self.schema = schema
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if not isinstance(definition, OperationDefinitionNode)
+        }
+        self.variables = variables or {}
+        self.weights = FIELD_WEIGHTS if weights is None else weights
+        self.list_size = list_size
+        self.page_size = page_size or graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+        self.nested_page_size = min(nested_page_size, self.page_size)
+        self.defaults = {}
+
+    def operation_cost(self, operation):
+        """Return the estimated cost of the operation definition ``operation``."""
+        self.defaults = {
+            definition.variable.name.value: definition.default_value
+            for definition in operation.variable_definitions
+            if definition.default_value is not None
+        }
+        root_type = self.schema.get_root_type(operation.operation)
+        return self.selection_cost(root_type, operation.selection_set, None, frozenset(), False)
+
+    def selection_cost(self, parent_type, selection_set, page, visited, nested):
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += self.field_cost(parent_type, selection, page, visited, nested)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                cost += self.selection_cost(
+                    fragment_type, selection.selection_set, page, visited, nested
+                )
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                cost += self.selection_cost(
+                    fragment_type, fragment.selection_set, page, visited | {name}, nested
+                )
+        return cost
+
+    def field_cost(self, parent_type, field, page, visited, nested):
+        name = field.name.value
+        field_def = getattr(parent_type, 'fields', {}).get(name)
+        if is_introspection_key(name) or field_def is None:
+            return 0
+        field_type = get_named_type(field_def.type)
+        weight = self.weights.get(f"{parent_type.name}.{name}", 0)
+        if is_leaf_type(field_type) or not field.selection_set:
+            return weight
+
+        if is_connection(field_type):
+            size, page = 1, self.connection_size(field, nested)
+        elif is_connection(parent_type) and is_list_type(get_nullable_type(field_def.type)):
+            # Connection edges: one per row of the page
+            size, page = page, None
+        elif is_list_type(get_nullable_type(field_def.type)):
+            size, page = self.list_size, None
+        else:
+            size, page = 1, None
+        children = self.selection_cost(
+            field_type, field.selection_set, page, visited, nested or size > 1
+        )
+        return size * (1 + weight + children)
+
+    def connection_size(self, field, nested=False):
+        """Return the page size a connection ``field`` asks for."""
+        sizes = [
+            size for size in (self.int_argument(field, 'first'), self.int_argument(field, 'last'))
+            if size is not None
+        ]
+        if sizes:
+            return max(min(sizes), 0)
+        return self.nested_page_size if nested else self.page_size
+
+    def int_argument(self, field, name):
+        for argument in field.arguments:
+            if argument.name.value != name:
+                continue
+            value = argument.value
+            if isinstance(value, VariableNode):
+                variable = value.name.value
+                if variable in self.variables:
+                    try:
+                        return int(self.variables[variable])
+                    except (TypeError, ValueError):
+                        return None
+                value = self.defaults.get(variable)
+                if value is None:
+                    return None
+            value = value_from_ast(value, GraphQLInt)
+            return None if value is Undefined else value
+        return None
+
+
+def query_cost_validator(
+    max_cost, variables=None, weights=None, list_size=DEFAULT_LIST_SIZE, page_size=None,
+    callback=None, nested_page_size=DEFAULT_NESTED_PAGE_SIZE,
+):
+    """
+    Return a validation rule rejecting operations whose estimated cost
+    exceeds ``max_cost``. ``callback`` receives the cost of every operation
+    by name, like graphene's ``depth_limit_validator``.
+    """
+
+    class QueryCostValidator(ValidationRule):
+        def __init__(self, validation_context):
+            super().__init__(validation_context)
+            analyzer = CostAnalyzer(
+                validation_context.schema, validation_context.document,
+                variables, weights, list_size, page_size, nested_page_size,
+            )
+            costs = {}
+            for definition in validation_context.document.definitions:
+                if not isinstance(definition, OperationDefinitionNode):
+                    continue
+                name = operation_key(definition)
+                costs[name] = cost = analyzer.operation_cost(definition)
+                if max_cost is not None and cost > max_cost:
+                    validation_context.report_error(
+                        GraphQLError(
+                            f"'{name}' has an estimated cost of {cost}, "
+                            f"exceeding the maximum of {max_cost}.",
+                            [definition],
+                            extensions={'code': 'QUERY_TOO_COMPLEX'},
+                        )
+                    )
+            if callable(callback):
+                callback(costs)
+
+    return QueryCostValidator
+
+
+def max_query_cost():
+    return getattr(settings, 'CRM_QUERY_MAX_COST', DEFAULT_MAX_COST)
+
+
+def complexity_rules(variables=None, callback=None):
+    """Return the depth and cost rules configured in settings for one request."""
+    return [
+        depth_limit_validator(getattr(settings, 'CRM_QUERY_MAX_DEPTH', DEFAULT_MAX_DEPTH)),
+        query_cost_validator(
+            max_query_cost(),
+            variables,
+            weights={**FIELD_WEIGHTS, **getattr(settings, 'CRM_QUERY_COST_WEIGHTS', {})},
+            list_size=getattr(settings, 'CRM_QUERY_LIST_SIZE', DEFAULT_LIST_SIZE),
+            callback=callback,
+            nested_page_size=getattr(
+                settings, 'CRM_QUERY_NESTED_PAGE_SIZE', DEFAULT_NESTED_PAGE_SIZE
+            ),
+        ),
+    ]
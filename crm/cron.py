@@ -3,8 +3,8 @@ Cron jobs for CRM application using django-crontab.
 """
 import os
 from django.utils import timezone
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+
+from crm.executors import execute
 
 
 def log_crm_heartbeat():
@@ -20,13 +20,11 @@ def log_crm_heartbeat():
     with open(log_file, 'a') as f:
         f.write(message)
     
-    # Optionally query GraphQL hello field (commented out as it requires server to be running)
+    # Optionally query GraphQL hello field (commented out; with
+    # CRM_GRAPHQL_EXECUTOR = 'http' it requires the server to be running)
     # This would verify the GraphQL endpoint is responsive
     # try:
-    #     transport = RequestsHTTPTransport(url="http://localhost:8000/graphql")
-    #     client = Client(transport=transport, fetch_schema_from_transport=False)
-    #     query = gql("{ hello }")
-    #     result = client.execute(query)
+    #     result = execute("{ hello }")
     #     with open(log_file, 'a') as f:
     #         f.write(f"{timestamp} GraphQL endpoint responsive: {result.get('hello')}\n")
     # except Exception as e:
@@ -36,15 +34,15 @@ def log_crm_heartbeat():
 
 def update_low_stock():
     """
-    Execute the UpdateLowStockProducts mutation via GraphQL endpoint.
+    Execute the UpdateLowStockProducts mutation with the configured
+    GraphQL executor (in-process by default).
     Logs updated product names and new stock levels to /tmp/low_stock_updates_log.txt with timestamp.
     """
-    url = "http://localhost:8000/graphql"
     log_file = '/tmp/low_stock_updates_log.txt'
     timestamp = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
     
     # GraphQL mutation to update low stock products
-    mutation = gql("""
+    mutation = """
         mutation {
             updateLowStockProducts {
                 updatedProducts {
@@ -54,15 +52,11 @@ def update_low_stock():
                 message
             }
         }
-    """)
+    """
     
     try:
-        # Create GraphQL client
-        transport = RequestsHTTPTransport(url=url)
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-        
         # Execute mutation
-        result = client.execute(mutation)
+        result = execute(mutation)
         
         # Extract results
         mutation_result = result.get('updateLowStockProducts', {})
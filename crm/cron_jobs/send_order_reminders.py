@@ -2,13 +2,18 @@
 """
 Script to send order reminders for pending orders (order_date within last 7 days).
 Uses GraphQL to query orders and logs reminders.
+
+Orders are walked in keyset pages of bounded size, so memory does not grow
+with the number of orders. Each customer gets one reminder per run, log
+lines are written once per page, and the highest order ID processed is
+saved as a watermark so the next run only sees newer orders.
 """
+import argparse
+import json
 import os
 import sys
 import django
-from datetime import datetime, timedelta
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from datetime import timedelta
 
 # Setup Django
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -16,63 +21,123 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
 django.setup()
 
 from django.utils import timezone
+from graphql_relay import from_global_id
 
+from crm.executors import execute
 
-def send_order_reminders():
-    """Query GraphQL for orders within last 7 days and log reminders."""
-    # GraphQL endpoint
-    url = "http://localhost:8000/graphql"
-    
-    # Create GraphQL client
-    transport = RequestsHTTPTransport(url=url)
-    client = Client(transport=transport, fetch_schema_from_transport=False)
-    
-    # Calculate date 7 days ago
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    date_str = seven_days_ago.isoformat()
-    
-    # GraphQL query to get orders within last 7 days
-    # Using orderDateGte filter (camelCase version of order_date_gte)
-    query = gql("""
-        query GetRecentOrders($orderDateGte: DateTime!) {
-            allOrders(orderDateGte: $orderDateGte) {
-                edges {
-                    node {
-                        id
-                        orderDate
-                        customer {
-                            email
-                        }
+LOG_FILE = '/tmp/order_reminders_log.txt'
+WATERMARK_FILE = '/tmp/order_reminders_watermark.json'
+
+# Orders per GraphQL page; the connection caps pages at 100
+CHUNK_SIZE = 100
+
+# GraphQL query to get orders within last 7 days, newer than the watermark
+# Using orderDateGte filter (camelCase version of order_date_gte)
+QUERY = """
+    query GetRecentOrders(
+        $orderDateGte: DateTime!, $idGt: Decimal, $first: Int!, $after: String
+    ) {
+        allOrders(orderDateGte: $orderDateGte, idGt: $idGt, first: $first, after: $after) {
+            edges {
+                node {
+                    id
+                    orderDate
+                    customer {
+                        email
                     }
                 }
             }
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
         }
-    """)
-    
+    }
+"""
+
+
+def read_watermark(path=WATERMARK_FILE):
+    """Return the last processed order ID, or None before the first run."""
     try:
-        # Execute query
-        result = client.execute(query, variable_values={"orderDateGte": date_str})
-        
-        # Process results
-        orders = result.get('allOrders', {}).get('edges', [])
-        
-        # Log to file
-        with open('/tmp/order_reminders_log.txt', 'a') as f:
+        with open(path) as f:
+            return json.load(f)['last_order_id']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_watermark(last_order_id, path=WATERMARK_FILE):
+    """Atomically record the last processed order ID."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_order_id': last_order_id, 'updated_at': timezone.now().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def iter_order_chunks(since, after_id=None, chunk_size=CHUNK_SIZE):
+    """Yield pages of order nodes placed since ``since`` with IDs above ``after_id``."""
+    variables = {'orderDateGte': since.isoformat(), 'idGt': after_id, 'first': chunk_size}
+    while True:
+        result = execute(QUERY, variable_values=variables)
+        connection = result.get('allOrders', {})
+        yield [edge.get('node', {}) for edge in connection.get('edges', [])]
+        page_info = connection.get('pageInfo', {})
+        if not page_info.get('hasNextPage'):
+            return
+        variables['after'] = page_info['endCursor']
+
+
+def iter_reminders(chunks, stats):
+    """
+    Yield one page of ``(order_id, email)`` reminders per chunk, skipping
+    customers already reminded this run and tracking the highest order ID.
+    """
+    reminded = set()
+    for nodes in chunks:
+        reminders = []
+        for node in nodes:
+            stats['orders'] += 1
+            order_pk = int(from_global_id(node['id'])[1])
+            stats['last_order_id'] = max(stats['last_order_id'] or 0, order_pk)
+            email = (node.get('customer') or {}).get('email', 'N/A')
+            if email in reminded:
+                continue
+            reminded.add(email)
+            reminders.append((node['id'], email))
+        yield reminders
+
+
+def send_order_reminders(chunk_size=CHUNK_SIZE, log_file=LOG_FILE, watermark_file=WATERMARK_FILE):
+    """Query GraphQL for orders within last 7 days and log reminders."""
+    # Calculate date 7 days ago
+    seven_days_ago = timezone.now() - timedelta(days=7)
+    after_id = read_watermark(watermark_file)
+    stats = {'orders': 0, 'reminders': 0, 'last_order_id': after_id}
+
+    try:
+        with open(log_file, 'a') as f:
             timestamp = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-            f.write(f"{timestamp} - Processing {len(orders)} order reminders\n")
-            
-            for edge in orders:
-                node = edge.get('node', {})
-                order_id = node.get('id', 'N/A')
-                customer = node.get('customer', {})
-                email = customer.get('email', 'N/A')
-                f.write(f"{timestamp} - Order ID: {order_id}, Customer Email: {email}\n")
-        
+            chunks = iter_order_chunks(seven_days_ago, after_id, chunk_size)
+            for reminders in iter_reminders(chunks, stats):
+                # One write per page rather than per reminder
+                f.writelines(
+                    f"{timestamp} - Order ID: {order_id}, Customer Email: {email}\n"
+                    for order_id, email in reminders
+                )
+                stats['reminders'] += len(reminders)
+            f.write(
+                f"{timestamp} - Processed {stats['reminders']} order reminders "
+                f"({stats['orders']} new orders)\n"
+            )
+
+        # Only advance once every page was logged
+        if stats['last_order_id'] is not None:
+            write_watermark(stats['last_order_id'], watermark_file)
         print("Order reminders processed!")
-        
+        return stats
+
     except Exception as e:
         # Log errors
-        with open('/tmp/order_reminders_log.txt', 'a') as f:
+        with open(log_file, 'a') as f:
             timestamp = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
             f.write(f"{timestamp} - ERROR: {str(e)}\n")
         print(f"Error processing order reminders: {str(e)}")
@@ -80,4 +145,8 @@ def send_order_reminders():
 
 
 if __name__ == '__main__':
-    send_order_reminders()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='orders fetched per GraphQL page (at most 100)')
+    args = parser.parse_args()
+    send_order_reminders(chunk_size=args.chunk_size)
@@ -0,0 +1,145 @@
+"""
+GraphQL executors for cron jobs and Celery tasks.
+
+Jobs used to post their documents to ``http://localhost:8000/graphql``,
+paying for HTTP, JSON and a Django request per run and failing whenever the
+web server was down. ``execute()`` runs the same documents in-process
+against ``alx_backend_graphql.schema.schema`` by default. Setting
+``CRM_GRAPHQL_EXECUTOR = 'http'`` keeps remote execution, over one pooled
+keep-alive session per process.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+from graphql import print_ast
+
+from .persisted_queries import execute_document, get_document_cache, query_hash
+
+DEFAULT_GRAPHQL_URL = 'http://localhost:8000/graphql'
+
+
+class GraphQLExecutionError(Exception):
+    """Raised when a document executes with errors."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(str(error.get('message', error)) for error in errors))
+
+
+def document_source(document):
+    """Return the source of ``document``, a string or a parsed ``gql()`` document."""
+    return document if isinstance(document, str) else print_ast(document)
+
+
+class LocalExecutor:
+    """Execute documents in-process against the project schema."""
+
+    def __init__(self, schema=None):
+        if schema is None:
+            from alx_backend_graphql.schema import schema
+        self.schema = schema
+
+    def execute(self, document, variable_values=None):
+        """Execute ``document`` and return its data, raising on errors."""
+        # Resolvers keep per-request state (e.g. loaders) on the context
+        request = HttpRequest()
+        request.method = 'POST'
+        parsed, errors = get_document_cache().get(self.schema, document_source(document))
+        if errors:
+            raise GraphQLExecutionError([error.formatted for error in errors])
+        result = execute_document(
+            self.schema, parsed, variable_values=variable_values, context_value=request
+        )
+        if result.errors:
+            raise GraphQLExecutionError([error.formatted for error in result.errors])
+        return result.data
+
+
+class HTTPExecutor:
+    """
+    Execute documents against a remote GraphQL endpoint.
+
+    The session is kept for the life of the process so connections are
+    pooled and kept alive across runs. Only connection failures are
+    retried: those requests never reached the server, so a mutation can
+    never be applied twice. With ``persisted`` the query text is only sent
+    when the server does not know its hash yet.
+    """
+
+    def __init__(self, url, retries=3, timeout=10, pool_size=10, persisted=True):
+        import requests
+        from requests.adapters import HTTPAdapter, Retry
+
+        self.url = url
+        self.timeout = timeout
+        self.persisted = persisted
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries, connect=retries, read=0, status=0, backoff_factor=0.5
+            ),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def execute(self, document, variable_values=None):
+        """Post ``document`` and return its data, raising on errors."""
+        source = document_source(document)
+        body = {'query': source, 'variables': variable_values or {}}
+        if self.persisted:
+            body['extensions'] = {
+                'persistedQuery': {'version': 1, 'sha256Hash': query_hash(source)}
+            }
+            try:
+                return self._post({**body, 'query': None})
+            except GraphQLExecutionError as error:
+                if not any(e.get('message') == 'PersistedQueryNotFound' for e in error.errors):
+                    raise
+        return self._post(body)
+
+    def _post(self, body):
+        response = self.session.post(self.url, json=body, timeout=self.timeout)
+        try:
+            payload = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise
+        if payload.get('errors'):
+            raise GraphQLExecutionError(payload['errors'])
+        response.raise_for_status()
+        return payload.get('data')
+
+    def close(self):
+        self.session.close()
+
+
+_executors = {}
+
+
+def get_executor(mode=None):
+    """
+    Return the process-wide executor for ``mode``, ``'local'`` or ``'http'``,
+    defaulting to ``settings.CRM_GRAPHQL_EXECUTOR``.
+    """
+    mode = mode or getattr(settings, 'CRM_GRAPHQL_EXECUTOR', 'local')
+    if mode not in _executors:
+        if mode == 'local':
+            _executors[mode] = LocalExecutor()
+        elif mode == 'http':
+            _executors[mode] = HTTPExecutor(
+                getattr(settings, 'CRM_GRAPHQL_URL', DEFAULT_GRAPHQL_URL),
+                retries=getattr(settings, 'CRM_GRAPHQL_HTTP_RETRIES', 3),
+                timeout=getattr(settings, 'CRM_GRAPHQL_HTTP_TIMEOUT', 10),
+                persisted=getattr(settings, 'CRM_GRAPHQL_HTTP_PERSISTED', True),
+            )
+        else:
+            raise ImproperlyConfigured(
+                f"CRM_GRAPHQL_EXECUTOR must be 'local' or 'http', not {mode!r}"
+            )
+    return _executors[mode]
+
+
+def execute(document, variable_values=None, mode=None):
+    """Execute ``document`` with the configured executor and return its data."""
+    return get_executor(mode).execute(document, variable_values)
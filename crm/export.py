@@ -0,0 +1,244 @@
+"""
+Streaming bulk export of orders.
+
+Exporting through the ``allOrders`` connection builds the whole response in
+memory. ``export_orders`` instead reads orders in ``chunk_size`` batches from
+a database cursor (``QuerySet.iterator``; a server-side cursor on
+PostgreSQL), fetches the products of each batch with one query, and hands
+each batch to a writer that turns it into bytes straight away, so memory
+stays bounded by the chunk size whatever the number of orders.
+
+Orders are selected with ``OrderFilter``, taking the same filters as
+``allOrders`` (``orderDateGte`` or ``order_date_gte``), in the default
+order. Writers exist for NDJSON, CSV and Parquet; Parquet needs the
+optional ``pyarrow`` package. Under ASGI, ``aexport_orders`` streams the
+same bytes from an async iterator, since Django would read a sync one into
+memory in full before sending it.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from graphene.utils.str_converters import to_snake_case
+
+from .filters import OrderFilter
+from .models import Order
+
+# Orders read and written per batch
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_COLUMNS = {
+    'id': 'id',
+    'order_date': 'order_date',
+    'total_amount': 'total_amount',
+    'customer_id': 'customer_id',
+    'customer_name': 'customer__name',
+    'customer_email': 'customer__email',
+}
+
+
+def filter_orders(params):
+    """
+    Return the orders selected by ``params``, ``OrderFilter`` data with
+    snake_case or GraphQL camelCase names. Raises ``ValidationError`` for
+    unknown filters and invalid values.
+    """
+    data = {to_snake_case(name): value for name, value in params.items()}
+    unknown = sorted(set(data) - set(OrderFilter.base_filters))
+    if unknown:
+        raise ValidationError(f"Unknown order filters: {', '.join(unknown)}")
+    filterset = OrderFilter(data=data, queryset=Order.objects.all())
+    if not filterset.is_valid():
+        raise ValidationError(
+            "; ".join(f"{name}: {' '.join(errors)}" for name, errors in filterset.errors.items())
+        )
+    return filterset.qs
+
+
+def order_batches(orders, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of export rows for ``orders``, ``chunk_size`` at a time, each
+    row with its customer's details and the list of its products.
+    """
+    rows = orders.values_list(*ORDER_COLUMNS.values()).iterator(chunk_size=chunk_size)
+    last_id = None
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        chunk = []
+        for values in batch:
+            # Filters joining products can repeat an order; its rows are
+            # adjacent because the ordering ends in the primary key
+            if values[0] != last_id:
+                chunk.append(dict(zip(ORDER_COLUMNS, values), products=[]))
+                last_id = values[0]
+        if not chunk:
+            continue
+
+        by_id = {row['id']: row for row in chunk}
+        links = (
+            Order.products.through.objects
+            .filter(order_id__in=by_id)
+            .order_by('order_id', 'product_id')
+            .values_list('order_id', 'product_id', 'product__name', 'product__price')
+        )
+        for order_id, product_id, name, price in links:
+            by_id[order_id]['products'].append({'id': product_id, 'name': name, 'price': price})
+        yield chunk
+
+
+class NDJSONWriter:
+    """One JSON object per order and line, products nested."""
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def start(self):
+        return b''
+
+    def write(self, rows):
+        return ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows).encode()
+
+    def finish(self):
+        return b''
+
+
+class CSVWriter:
+    """One CSV line per order, product IDs and names joined with ``;``."""
+    content_type = 'text/csv'
+    extension = 'csv'
+    header = [*ORDER_COLUMNS, 'product_ids', 'product_names']
+
+    def _lines(self, lines):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(lines)
+        return buffer.getvalue().encode()
+
+    def start(self):
+        return self._lines([self.header])
+
+    def write(self, rows):
+        return self._lines(
+            [
+                *(row[column] for column in ORDER_COLUMNS),
+                ';'.join(str(product['id']) for product in row['products']),
+                ';'.join(product['name'] for product in row['products']),
+            ]
+            for row in rows
+        )
+
+    def finish(self):
+        return b''
+
+
+class ByteSink(io.RawIOBase):
+    """Write-only file collecting what is written until drained, even after close."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ParquetWriter:
+    """One Parquet row group per batch, products as a list of structs."""
+    content_type = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImproperlyConfigured("Parquet export requires the pyarrow package")
+
+        self.pa = pa
+        money = pa.decimal128(12, 2)
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('order_date', pa.timestamp('us', tz='UTC')),
+            ('total_amount', money),
+            ('customer_id', pa.int64()),
+            ('customer_name', pa.string()),
+            ('customer_email', pa.string()),
+            ('products', pa.list_(pa.struct([
+                ('id', pa.int64()), ('name', pa.string()), ('price', money),
+            ]))),
+        ])
+        # The Parquet writer closes its file, so it writes to a sink that
+        # keeps what it collected
+        self.sink = ByteSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+
+    def start(self):
+        return self.sink.drain()
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+        return self.sink.drain()
+
+    def finish(self):
+        self.writer.close()
+        return self.sink.drain()
+
+
+WRITERS = {
+    'ndjson': NDJSONWriter,
+    'csv': CSVWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def get_writer(name):
+    """Return a writer for the format ``name``; raises ``ValueError`` if unknown."""
+    try:
+        writer_class = WRITERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown export format {name!r}; choose from {', '.join(WRITERS)}")
+    return writer_class()
+
+
+def export_orders(orders, writer, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield ``orders`` encoded by ``writer``, one byte string per batch."""
+    yield writer.start()
+    for rows in order_batches(orders, chunk_size):
+        yield writer.write(rows)
+    yield writer.finish()
+
+
+async def aexport_orders(orders, writer, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Async version of ``export_orders``: each batch is read and encoded in
+    the thread that owns the database connection, one at a time.
+    """
+    chunks = export_orders(orders, writer, chunk_size)
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,88 @@
+"""
+Custom connection fields for CRM queries.
+"""
+from django.db.models.query import QuerySet
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from promise import Promise
+
+from .loaders import get_loaders
+from .optimizer import optimize_queryset
+from .pagination import keyset_ordering, model_columns, paginate
+
+
+class CRMConnectionField(DjangoFilterConnectionField):
+    """
+    Filter connection field that optimizes its queryset for the requested
+    selection and registers each resolved page with the request's loaders
+    so nested relations are fetched in batches.
+    """
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        qs = super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+        return optimize_queryset(qs, info, required=cls.required_columns(qs))
+
+    @classmethod
+    def required_columns(cls, queryset):
+        """Columns the connection reads itself, kept by column pruning."""
+        return ()
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args
+    ):
+        result = super().connection_resolver(
+            resolver,
+            connection,
+            default_manager,
+            queryset_resolver,
+            max_limit,
+            enforce_first_or_last,
+            root,
+            info,
+            **args
+        )
+
+        def register_page(page):
+            get_loaders(info.context).register(edge.node for edge in page.edges)
+            return page
+
+        if Promise.is_thenable(result):
+            return Promise.resolve(result).then(register_page)
+        return register_page(result)
+
+
+class KeysetConnectionField(CRMConnectionField):
+    """
+    CRM connection field paginated by keyset cursors on the queryset's
+    ordering plus the primary key, so every page is an index range scan
+    no matter how deep it is. Orderings that cannot serve as a keyset fall
+    back to offset cursors.
+    """
+
+    @classmethod
+    def required_columns(cls, queryset):
+        keys = keyset_ordering(queryset)
+        return model_columns(queryset.model, keys) if keys else ()
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        queryset = maybe_queryset(iterable)
+        keys = keyset_ordering(queryset) if isinstance(queryset, QuerySet) else None
+        if keys is None:
+            return super().resolve_connection(connection, args, iterable, max_limit)
+        return paginate(queryset, keys, args, connection, max_limit)
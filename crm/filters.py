@@ -3,18 +3,38 @@ Django-filter classes for CRM models.
 """
 import django_filters
 from .models import Customer, Product, Order
+from .search import get_search_backend
 
 
-class CustomerFilter(django_filters.FilterSet):
+class SearchFilterMixin:
+    """Route substring filters through the database's search backend."""
+
+    def filter_contains(self, queryset, name, value):
+        """Case-insensitive substring match on ``name`` using the search index."""
+        if value:
+            return get_search_backend(queryset.db).contains(queryset, [name], value)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Ranked search over the model's indexed text columns, best match first."""
+        if value:
+            return get_search_backend(queryset.db).search(queryset, value)
+        return queryset
+
+
+class CustomerFilter(SearchFilterMixin, django_filters.FilterSet):
     """Filter class for Customer model."""
-    name = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
-    name_icontains = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
-    email = django_filters.CharFilter(field_name='email', lookup_expr='icontains')
-    email_icontains = django_filters.CharFilter(field_name='email', lookup_expr='icontains')
+    name = django_filters.CharFilter(field_name='name', method='filter_contains')
+    name_icontains = django_filters.CharFilter(field_name='name', method='filter_contains')
+    email = django_filters.CharFilter(field_name='email', method='filter_contains')
+    email_icontains = django_filters.CharFilter(field_name='email', method='filter_contains')
     created_at = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='exact')
     created_at_gte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
     created_at_lte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='lte')
     
+    # Ranked free-text search over name and email
+    search = django_filters.CharFilter(method='filter_search')
+
     # Custom filter for phone pattern (starts with +1)
     phone_pattern = django_filters.CharFilter(method='filter_phone_pattern')
 
@@ -29,10 +49,10 @@ class CustomerFilter(django_filters.FilterSet):
         return queryset
 
 
-class ProductFilter(django_filters.FilterSet):
+class ProductFilter(SearchFilterMixin, django_filters.FilterSet):
     """Filter class for Product model."""
-    name = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
-    name_icontains = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = django_filters.CharFilter(field_name='name', method='filter_contains')
+    name_icontains = django_filters.CharFilter(field_name='name', method='filter_contains')
     price = django_filters.NumberFilter(field_name='price', lookup_expr='exact')
     price_gte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price_lte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
@@ -40,6 +60,9 @@ class ProductFilter(django_filters.FilterSet):
     stock_gte = django_filters.NumberFilter(field_name='stock', lookup_expr='gte')
     stock_lte = django_filters.NumberFilter(field_name='stock', lookup_expr='lte')
     
+    # Ranked free-text search over name
+    search = django_filters.CharFilter(method='filter_search')
+
     # Custom filter for low stock (stock < 10)
     low_stock = django_filters.BooleanFilter(method='filter_low_stock')
 
@@ -54,7 +77,7 @@ class ProductFilter(django_filters.FilterSet):
         return queryset
 
 
-class OrderFilter(django_filters.FilterSet):
+class OrderFilter(SearchFilterMixin, django_filters.FilterSet):
     """Filter class for Order model."""
     total_amount = django_filters.NumberFilter(field_name='total_amount', lookup_expr='exact')
     total_amount_gte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
@@ -66,18 +89,21 @@ class OrderFilter(django_filters.FilterSet):
     # Filter by customer name (related field lookup)
     customer_name = django_filters.CharFilter(
         field_name='customer__name',
-        lookup_expr='icontains'
+        method='filter_contains'
     )
     
     # Filter by product name (related field lookup)
     product_name = django_filters.CharFilter(
         field_name='products__name',
-        lookup_expr='icontains'
+        method='filter_contains'
     )
     
     # Filter orders that include a specific product ID
     product_id = django_filters.NumberFilter(field_name='products__id', lookup_expr='exact')
 
+    # Orders created after a known order ID, for incremental consumers
+    id_gt = django_filters.NumberFilter(field_name='id', lookup_expr='gt')
+
     class Meta:
         model = Order
         fields = ['total_amount', 'order_date', 'customer', 'products']
@@ -0,0 +1,398 @@
+"""
+Bulk import of customers, products and orders from CSV or NDJSON files.
+
+Files are read as a stream and handled ``batch_size`` rows at a time: each
+batch is validated in memory with the same rules as the GraphQL mutations,
+its references are resolved with one query per kind, and the valid rows are
+upserted with ``bulk_create(update_conflicts=True)`` in one transaction.
+Invalid rows are reported and skipped.
+
+* Customers are matched on ``email``; name and phone are updated.
+* Products and orders are matched on ``id`` when the row has one (e.g. a
+  file from ``export_orders``) and inserted otherwise. The ID sequence is
+  moved past imported IDs before rows without one are inserted.
+* Orders name their customer by ``customer_email`` or ``customer_id`` and
+  their products by ``product_ids`` (a list, or ``;``-separated in CSV) or
+  ``products`` (objects with an ``id``, as exported). References are kept in
+  in-memory maps so each customer and product is looked up once per import.
+
+Bulk inserts bypass model signals, so the importer does their work itself:
+customer order aggregates are refreshed, cached responses invalidated, and
+``orderCreated`` and ``productStockChanged`` events published for new
+orders, new products and changed stock when each batch commits.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.core.validators import validate_email
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Customer, Order, Product
+from .pubsub import publish_orders_created, publish_stock_changes
+from .response_cache import invalidate
+
+# Rows validated and upserted per transaction
+IMPORT_BATCH_SIZE = 1000
+
+
+def read_rows(path, file_format=None):
+    """
+    Yield ``(line_number, row)`` from the CSV or NDJSON file at ``path``;
+    the format defaults to the file extension.
+    """
+    file_format = file_format or ('csv' if path.endswith('.csv') else 'ndjson')
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else {'__invalid__': line}
+
+
+def text(row, name):
+    """Return the stripped string value of ``name``, or ``None`` if blank."""
+    value = row.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def to_decimal(value, label):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        number = None
+    if number is None or not number.is_finite():
+        raise ValidationError(f"Invalid {label} '{value}'")
+    return number
+
+
+def to_int(value, label):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid {label} '{value}'")
+
+
+class ImportReport:
+    """Running totals of an import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+
+    def add(self, rows, imported, errors):
+        self.rows += rows
+        self.imported += imported
+        self.errors.extend(errors)
+
+
+class BulkImporter:
+    """
+    Validate and upsert rows of one model in batches. Subclasses implement
+    ``clean_row`` (raising ``ValidationError``) and ``save``.
+    """
+    model = None
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def run(self, rows, on_batch=None):
+        """Import ``(line_number, row)`` pairs; returns an ``ImportReport``."""
+        report = ImportReport()
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.prepare(batch)
+            cleaned, errors = {}, []
+            for line_number, row in batch:
+                try:
+                    if '__invalid__' in row:
+                        raise ValidationError("Invalid JSON")
+                    key, obj = self.clean_row(row)
+                except ValidationError as e:
+                    errors.append((line_number, '; '.join(e.messages)))
+                    continue
+                # A key repeated within the batch keeps its last row, as
+                # one upsert cannot touch the same row twice
+                cleaned.pop(key, None)
+                cleaned[key] = obj
+            objects = list(cleaned.values())
+            if objects:
+                with transaction.atomic():
+                    self.save(objects)
+            report.add(len(batch), len(objects), errors)
+            if on_batch is not None:
+                on_batch(report)
+        self.finish()
+        return report
+
+    def prepare(self, batch):
+        """Load what validating ``batch`` needs, in as few queries as possible."""
+
+    def clean_row(self, row):
+        """Return ``(upsert key, unsaved instance)`` for a valid ``row``."""
+        raise NotImplementedError
+
+    def save(self, objects):
+        raise NotImplementedError
+
+    def row_pk(self, row):
+        pk = text(row, 'id')
+        return None if pk is None else to_int(pk, 'id')
+
+    def reset_sequence(self):
+        """
+        Move the primary key sequence past the IDs imported so far. Runs
+        before rows without an ID are inserted, which would otherwise draw
+        an imported ID from the sequence on PostgreSQL.
+        """
+        connection = connections[router.db_for_write(self.model)]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [self.model]):
+                cursor.execute(sql)
+
+    def finish(self):
+        """Invalidate cached responses."""
+        invalidate(self.model)
+
+
+class CustomerImporter(BulkImporter):
+    """Upsert customers by email."""
+    model = Customer
+
+    def clean_row(self, row):
+        from .schema import CreateCustomer
+
+        name, email, phone = text(row, 'name'), text(row, 'email'), text(row, 'phone')
+        if name is None:
+            raise ValidationError("Name is required")
+        if email is None:
+            raise ValidationError("Email is required")
+        validate_email(email)
+        if phone is not None and not CreateCustomer.validate_phone(phone):
+            raise ValidationError(f"Invalid phone format for '{phone}'")
+        return email, Customer(name=name, email=email, phone=phone)
+
+    def save(self, objects):
+        Customer.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=['email'],
+            update_fields=['name', 'phone', 'updated_at'],
+        )
+
+
+class ProductImporter(BulkImporter):
+    """Upsert products by ID, inserting rows without one."""
+    model = Product
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.previous_stock = {}
+
+    def prepare(self, batch):
+        pks = set()
+        for _, row in batch:
+            try:
+                pk = self.row_pk(row)
+            except ValidationError:
+                continue  # Reported by clean_row
+            if pk is not None:
+                pks.add(pk)
+        self.previous_stock = dict(
+            Product.objects.filter(pk__in=pks).values_list('pk', 'stock')
+        ) if pks else {}
+
+    def clean_row(self, row):
+        from .schema import CreateProduct
+
+        pk = self.row_pk(row)
+        name = text(row, 'name')
+        if name is None:
+            raise ValidationError("Name is required")
+        price = to_decimal(text(row, 'price'), 'price')
+        stock = text(row, 'stock')
+        values = CreateProduct.clean(SimpleNamespace(
+            name=name, price=price, stock=None if stock is None else to_int(stock, 'stock'),
+        ))
+        product = Product(pk=pk, **values)
+        return (pk if pk is not None else object()), product
+
+    def save(self, objects):
+        existing = [product for product in objects if product.pk is not None]
+        if existing:
+            Product.objects.bulk_create(
+                existing,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=['name', 'price', 'stock', 'updated_at'],
+            )
+            self.reset_sequence()
+        new = Product.objects.bulk_create([product for product in objects if product.pk is None])
+        publish_stock_changes(
+            [(product, self.previous_stock.get(product.pk)) for product in existing
+             if self.previous_stock.get(product.pk) != product.stock]
+            + [(product, None) for product in new if product.pk is not None]
+        )
+
+
+class OrderImporter(BulkImporter):
+    """Upsert orders by ID, resolving customers and products through ID maps."""
+    model = Order
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.customers_by_email = {}
+        self.customer_pks = set()
+        self.product_prices = {}
+
+    @staticmethod
+    def product_refs(row):
+        products = row.get('products')
+        if isinstance(products, list):
+            return [product.get('id') if isinstance(product, dict) else product
+                    for product in products]
+        product_ids = row.get('product_ids')
+        if isinstance(product_ids, str):
+            return [pk for pk in product_ids.split(';') if pk.strip()]
+        return product_ids if isinstance(product_ids, list) else []
+
+    def prepare(self, batch):
+        rows = [row for _, row in batch if '__invalid__' not in row]
+        emails = {text(row, 'customer_email') for row in rows} - {None}
+        emails -= self.customers_by_email.keys()
+        if emails:
+            self.customers_by_email.update(
+                Customer.objects.filter(email__in=emails).values_list('email', 'pk')
+            )
+
+        customer_pks, product_pks = set(), set()
+        for row in rows:
+            try:
+                if text(row, 'customer_id') is not None:
+                    customer_pks.add(to_int(text(row, 'customer_id'), 'customer_id'))
+                product_pks.update(to_int(pk, 'product ID') for pk in self.product_refs(row))
+            except ValidationError:
+                pass  # Reported by clean_row
+        customer_pks -= self.customer_pks
+        if customer_pks:
+            self.customer_pks.update(
+                Customer.objects.filter(pk__in=customer_pks).values_list('pk', flat=True)
+            )
+        product_pks -= self.product_prices.keys()
+        if product_pks:
+            self.product_prices.update(
+                Product.objects.filter(pk__in=product_pks).values_list('pk', 'price')
+            )
+
+    def clean_row(self, row):
+        from .schema import missing_ids_message
+
+        pk = self.row_pk(row)
+        email, customer_id = text(row, 'customer_email'), text(row, 'customer_id')
+        if email is not None:
+            customer_pk = self.customers_by_email.get(email)
+            if customer_pk is None:
+                raise ValidationError(f"Customer with email '{email}' does not exist")
+        elif customer_id is not None:
+            customer_pk = to_int(customer_id, 'customer_id')
+            if customer_pk not in self.customer_pks:
+                raise ValidationError(f"Customer with ID '{customer_id}' does not exist")
+        else:
+            raise ValidationError("customer_email or customer_id is required")
+
+        refs = self.product_refs(row)
+        if not refs:
+            raise ValidationError("At least one product must be selected")
+        product_pks = [to_int(ref, 'product ID') for ref in refs]
+        missing = [ref for ref, pk in zip(refs, product_pks) if pk not in self.product_prices]
+        if missing:
+            raise ValidationError(missing_ids_message("Product", missing))
+
+        total = text(row, 'total_amount')
+        if total is None:
+            total_amount = sum(self.product_prices[pk] for pk in product_pks)
+        else:
+            total_amount = to_decimal(total, 'total_amount')
+        order_date = text(row, 'order_date')
+        if order_date is None:
+            order_date = timezone.now()
+        else:
+            order_date = parse_datetime(order_date)
+            if order_date is None:
+                raise ValidationError(f"Invalid order_date '{text(row, 'order_date')}'")
+
+        order = Order(
+            pk=pk, customer_id=customer_pk, total_amount=total_amount, order_date=order_date
+        )
+        order._import_product_pks = list(dict.fromkeys(product_pks))
+        return (pk if pk is not None else object()), order
+
+    def save(self, objects):
+        existing = [order for order in objects if order.pk is not None]
+        new = [order for order in objects if order.pk is None]
+        previous = dict(
+            Order.objects.filter(pk__in=[order.pk for order in existing])
+            .values_list('pk', 'customer_id')
+        )
+        # Customers losing a reassigned order need their aggregates refreshed too
+        customer_pks = set(previous.values())
+        if existing:
+            Order.objects.bulk_create(
+                existing,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=['customer', 'total_amount', 'order_date', 'updated_at'],
+            )
+            self.reset_sequence()
+        # Upserts do not return IDs, so new orders are inserted separately
+        connection = connections[router.db_for_write(Order)]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(new)
+        else:
+            for order in new:
+                order.save()
+
+        OrderProduct = Order.products.through
+        OrderProduct.objects.filter(order_id__in=[order.pk for order in existing]).delete()
+        OrderProduct.objects.bulk_create([
+            OrderProduct(order_id=order.pk, product_id=product_pk)
+            for order in objects
+            for product_pk in order._import_product_pks
+        ])
+        customer_pks.update(order.customer_id for order in objects)
+        Customer.objects.refresh_order_stats(customer_pks)
+        publish_orders_created(
+            order for order in objects if order.pk is not None and order.pk not in previous
+        )
+
+    def finish(self):
+        super().finish()
+        invalidate(Customer, Product)
+
+
+IMPORTERS = {
+    'customers': CustomerImporter,
+    'products': ProductImporter,
+    'orders': OrderImporter,
+}
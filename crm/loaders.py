@@ -0,0 +1,148 @@
+"""
+Per-request DataLoaders for batching relation lookups in CRM resolvers.
+
+A ``LoaderRegistry`` is attached to the GraphQL context on first use. Every
+model instance handed out by a connection or a loader is registered on it, so
+the first relation miss on a page resolves the relation for the whole page
+with a single ``IN (...)`` query instead of one query per row.
+"""
+from collections import defaultdict
+
+from crm.models import Customer, Order, Product
+
+
+def related_ordering(model, prefix):
+    """Translate ``model``'s default ordering onto a relation ``prefix``."""
+    ordering = []
+    for field in model._meta.ordering:
+        descending = field.startswith('-')
+        ordering.append(f"{'-' if descending else ''}{prefix}__{field.lstrip('-')}")
+    return ordering
+
+
+class DataLoader:
+    """
+    Memoizing loader that resolves a miss together with every pending key.
+
+    ``batch_load_fn`` receives a set of keys and returns a dict mapping each
+    key to its value. ``pending_keys_fn`` returns the keys the registry
+    already knows will be requested, which are loaded in the same batch.
+    """
+
+    def __init__(self, batch_load_fn, pending_keys_fn=None):
+        self.batch_load_fn = batch_load_fn
+        self.pending_keys_fn = pending_keys_fn
+        self._cache = {}
+
+    def load(self, key):
+        """Return the value for ``key``, batching any pending keys on a miss."""
+        if key not in self._cache:
+            keys = {key}
+            if self.pending_keys_fn is not None:
+                keys.update(k for k in self.pending_keys_fn() if k not in self._cache)
+            self._cache.update(self.batch_load_fn(keys))
+        return self._cache[key]
+
+    def load_many(self, keys):
+        """Return the values for ``keys`` in order."""
+        return [self.load(key) for key in keys]
+
+    def prime(self, key, value):
+        """Seed the cache with a known value without querying."""
+        self._cache.setdefault(key, value)
+
+    def clear(self, key=None):
+        """Forget one cached key, or the whole cache."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+
+class LoaderRegistry:
+    """Request-scoped set of loaders for the CRM relations."""
+
+    def __init__(self):
+        self._seen = defaultdict(dict)
+
+        self.customer = DataLoader(
+            self._load_customers,
+            lambda: {order.customer_id for order in self.seen(Order)},
+        )
+        self.products_by_order = DataLoader(
+            self._load_products_by_order,
+            lambda: {order.pk for order in self.seen(Order)},
+        )
+        self.orders_by_customer = DataLoader(
+            self._load_orders_by_customer,
+            lambda: {customer.pk for customer in self.seen(Customer)},
+        )
+        self.orders_by_product = DataLoader(
+            self._load_orders_by_product,
+            lambda: {product.pk for product in self.seen(Product)},
+        )
+
+    def register(self, instances):
+        """Record instances whose relations are likely to be resolved next."""
+        for instance in instances:
+            if instance is not None:
+                self._seen[type(instance)][instance.pk] = instance
+
+    def seen(self, model):
+        """Return the registered instances of ``model``."""
+        return list(self._seen[model].values())
+
+    def _load_customers(self, keys):
+        customers = Customer.objects.in_bulk(keys)
+        self.register(customers.values())
+        return {key: customers.get(key) for key in keys}
+
+    def _load_products_by_order(self, keys):
+        result = {key: [] for key in keys}
+        rows = (
+            Order.products.through.objects
+            .filter(order_id__in=keys)
+            .select_related('product')
+            .order_by(*related_ordering(Product, 'product'))
+        )
+        for row in rows:
+            result[row.order_id].append(row.product)
+        self.register(row.product for row in rows)
+        return result
+
+    def _load_orders_by_customer(self, keys):
+        result = {key: [] for key in keys}
+        orders = list(Order.objects.filter(customer_id__in=keys))
+        for order in orders:
+            result[order.customer_id].append(order)
+        self.register(orders)
+        return result
+
+    def _load_orders_by_product(self, keys):
+        result = {key: [] for key in keys}
+        rows = (
+            Order.products.through.objects
+            .filter(product_id__in=keys)
+            .select_related('order')
+            .order_by(*related_ordering(Order, 'order'))
+        )
+        for row in rows:
+            result[row.product_id].append(row.order)
+        self.register(row.order for row in rows)
+        return result
+
+
+def get_loaders(context):
+    """Return the loader registry attached to ``context``, creating it on first use."""
+    loaders = getattr(context, 'loaders', None)
+    if loaders is None:
+        loaders = LoaderRegistry()
+        if context is not None:
+            context.loaders = loaders
+    return loaders
+
+
+def reset_loaders(context):
+    """Drop the loader registry attached to ``context``; the next use starts empty."""
+    if getattr(context, 'loaders', None) is not None:
+        context.loaders = None
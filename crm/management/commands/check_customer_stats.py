@@ -0,0 +1,49 @@
+"""
+Check the denormalized customer order aggregates against the orders table.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.models import Customer
+
+
+class Command(BaseCommand):
+    help = "Report customers whose stored order aggregates have drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='recompute the aggregates of drifted customers'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='maximum number of drifted customers to list'
+        )
+
+    def handle(self, *args, **options):
+        drifted = []
+        for customer_id, stored, computed in Customer.objects.order_stats_drift():
+            if len(drifted) < options['limit']:
+                self.stdout.write(
+                    f"Customer {customer_id}: stored {self.format(stored)}, "
+                    f"expected {self.format(computed)}"
+                )
+            drifted.append(customer_id)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Customer order stats are consistent"))
+            return
+
+        if options['fix']:
+            Customer.objects.refresh_order_stats(drifted)
+            self.stdout.write(
+                self.style.SUCCESS(f"Fixed order stats for {len(drifted)} customers")
+            )
+            return
+
+        raise CommandError(f"{len(drifted)} customers have drifted order stats")
+
+    @staticmethod
+    def format(stats):
+        order_count, lifetime_value, last_order_at = stats
+        last = last_order_at.isoformat() if last_order_at else 'never'
+        return f"{order_count} orders / {lifetime_value} / last {last}"
@@ -0,0 +1,85 @@
+"""
+Delete customers with no orders in the given period, in bounded batches.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from crm.models import Customer, Order
+
+# Customers deleted per transaction
+CLEANUP_BATCH_SIZE = 500
+CLEANUP_LOG_FILE = '/tmp/customer_cleanup_log.txt'
+
+
+class Command(BaseCommand):
+    help = "Delete customers with no orders in the last --days days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='delete customers without an order in this many days'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=CLEANUP_BATCH_SIZE,
+            help='customers deleted per transaction'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='report how many customers would be deleted without deleting'
+        )
+        parser.add_argument(
+            '--log-file', default=CLEANUP_LOG_FILE,
+            help='file the result is appended to'
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        inactive = Customer.objects.inactive(since)
+
+        if options['dry_run']:
+            count = inactive.count()
+            self.stdout.write(f"Would delete {count} inactive customers")
+            return
+
+        started = time.monotonic()
+        customers = orders = 0
+        last_pk = 0
+        while True:
+            # Candidates are read in primary key order, one bounded batch at
+            # a time, instead of materializing every stale ID up front
+            pks = list(
+                inactive.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            batch_started = time.monotonic()
+            with transaction.atomic():
+                # Re-check inside the transaction: a customer may have ordered
+                # since the batch was selected
+                _, deleted = Customer.objects.inactive(since).filter(pk__in=pks).delete()
+            customers += deleted.get(Customer._meta.label, 0)
+            orders += deleted.get(Order._meta.label, 0)
+            last_pk = pks[-1]
+            if options['verbosity'] >= 2:
+                elapsed = time.monotonic() - batch_started
+                self.stdout.write(
+                    f"Deleted batch up to customer {last_pk} in {elapsed:.2f}s "
+                    f"({customers} customers so far)"
+                )
+
+        elapsed = time.monotonic() - started
+        rate = customers / elapsed if elapsed else 0
+        with open(options['log_file'], 'a') as f:
+            timestamp = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+            f.write(f"{timestamp} - Deleted {customers} inactive customers\n")
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {customers} inactive customers and {orders} orders "
+            f"in {elapsed:.2f}s ({rate:.0f} customers/s)"
+        ))
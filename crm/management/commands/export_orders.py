@@ -0,0 +1,75 @@
+"""
+Stream orders to a file as NDJSON, CSV or Parquet, in bounded batches.
+"""
+import time
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.export import EXPORT_CHUNK_SIZE, WRITERS, filter_orders, get_writer, order_batches
+
+
+def parse_filter(value):
+    name, sep, filter_value = value.partition('=')
+    if not sep or not name:
+        raise ValueError(value)
+    return name, filter_value
+
+
+class Command(BaseCommand):
+    help = "Export orders with their customer and products, optionally filtered."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=list(WRITERS), default='ndjson',
+            help='output format (parquet needs pyarrow)'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='file to write (default: standard output, not for parquet)'
+        )
+        parser.add_argument(
+            '--filter', dest='filters', action='append', type=parse_filter, default=[],
+            metavar='NAME=VALUE',
+            help='OrderFilter filter, e.g. orderDateGte=2024-01-01 (repeatable)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='orders read and written per batch'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            orders = filter_orders(dict(options['filters']))
+            writer = get_writer(options['format'])
+        except (ValidationError, ImproperlyConfigured) as e:
+            raise CommandError(' '.join(getattr(e, 'messages', [str(e)])))
+
+        to_stdout = options['output'] == '-'
+        if to_stdout and options['format'] == 'parquet':
+            raise CommandError("Parquet exports need --output")
+
+        started = time.monotonic()
+        exported = 0
+        output = None if to_stdout else open(options['output'], 'wb')
+        try:
+            def write(data):
+                if output is None:
+                    self.stdout.write(data.decode(), ending='')
+                else:
+                    output.write(data)
+
+            write(writer.start())
+            for rows in order_batches(orders, options['chunk_size']):
+                write(writer.write(rows))
+                exported += len(rows)
+            write(writer.finish())
+        finally:
+            if output is not None:
+                output.close()
+
+        elapsed = time.monotonic() - started
+        rate = exported / elapsed if elapsed else 0
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {exported} orders in {elapsed:.2f}s ({rate:.0f} orders/s)"
+        ))
@@ -0,0 +1,53 @@
+"""
+Fill the database with deterministic synthetic customers, products and orders.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from crm.synthetic import GENERATE_BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = "Insert seeded synthetic customers, products and orders with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0, help='random seed')
+        parser.add_argument(
+            '--days', type=int, default=365, help='days of order history before --end'
+        )
+        parser.add_argument(
+            '--end', type=datetime.fromisoformat,
+            help='latest order date, ISO 8601 (default: now; fix it for identical data)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=GENERATE_BATCH_SIZE,
+            help='rows inserted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        end = options['end']
+        if end is not None and end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+
+        def log(message):
+            if options['verbosity'] >= 2:
+                self.stdout.write(message)
+
+        started = time.monotonic()
+        counts = generate(
+            options['customers'], options['products'], options['orders'],
+            seed=options['seed'], days=options['days'], end=end,
+            batch_size=options['batch_size'], log=log,
+        )
+        elapsed = time.monotonic() - started
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {counts['customers']} customers, {counts['products']} products "
+            f"and {counts['orders']} orders in {elapsed:.2f}s "
+            f"({rows / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
@@ -0,0 +1,56 @@
+"""
+Import customers, products or orders from a CSV or NDJSON file, in batches.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.importer import IMPORT_BATCH_SIZE, IMPORTERS, read_rows
+
+# Rejected rows printed; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = "Upsert customers, products or orders from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(IMPORTERS), help='what the file contains')
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'],
+            help='file format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='rows validated and upserted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['model']](batch_size=options['batch_size'])
+        started = time.monotonic()
+
+        def report_batch(report):
+            if options['verbosity'] >= 2:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{report.rows} rows read, {report.imported} imported "
+                    f"({report.rows / elapsed:.0f} rows/s)"
+                )
+
+        try:
+            report = importer.run(read_rows(options['path'], options['format']), report_batch)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for line_number, message in report.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f"Line {line_number}: {message}")
+        if len(report.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... and {len(report.errors) - MAX_REPORTED_ERRORS} more")
+
+        elapsed = time.monotonic() - started
+        rate = report.rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} of {report.rows} {options['model']} rows "
+            f"in {elapsed:.2f}s ({rate:.0f} rows/s), {len(report.errors)} rejected"
+        ))
@@ -0,0 +1,45 @@
+"""
+Rebuild the denormalized customer order aggregates from the orders table.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from crm.models import ORDER_STATS_BATCH_SIZE, Customer
+
+
+class Command(BaseCommand):
+    help = "Recompute last_order_at, order_count and lifetime_value for customers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=ORDER_STATS_BATCH_SIZE,
+            help='customers updated per transaction'
+        )
+        parser.add_argument(
+            'customer_ids', nargs='*', type=int,
+            help='only rebuild these customers (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        customer_ids = options['customer_ids'] or None
+
+        if customer_ids is not None:
+            updated = Customer.objects.refresh_order_stats(customer_ids)
+        else:
+            # Walk the table in primary key ranges so each transaction stays small
+            updated = 0
+            last_pk = 0
+            while True:
+                pks = list(
+                    Customer.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                with transaction.atomic():
+                    updated += Customer.objects.refresh_order_stats(pks)
+                last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order stats for {updated} customers"))
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def install_search_indexes(apps, schema_editor):
+    from crm.search import get_search_backend
+
+    get_search_backend(schema_editor.connection.alias).install(schema_editor.connection)
+
+
+def uninstall_search_indexes(apps, schema_editor):
+    from crm.search import get_search_backend
+
+    get_search_backend(schema_editor.connection.alias).uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_indexes, uninstall_search_indexes),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customer',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ['-order_date', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customers_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_customer_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_total_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_stock_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_low_stock_idx',
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-created_at', '-id'], name='customers_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-order_date', '-id'], name='orders_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-order_date', '-id'], name='orders_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_amount', '-order_date', '-id'], name='orders_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='products_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', '-created_at', '-id'], name='products_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock', '-created_at', '-id'], name='products_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('stock__lt', 10)), fields=['-created_at', '-id'], name='products_low_stock_idx'),
+        ),
+    ]
@@ -1,10 +1,152 @@
 """
 CRM models for Customer, Product, and Order.
 """
-from django.db import models
+from decimal import Decimal
+
+from django.db import connections, models, router, transaction
+from django.db.models import (
+    Case, Count, DecimalField, Exists, F, Max, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest, TruncWeek
 from django.core.validators import EmailValidator, RegexValidator
 from django.utils import timezone
 
+from .pubsub import publish_stock_changes
+from .response_cache import invalidate
+
+# Customers per UPDATE statement when maintaining order aggregates
+ORDER_STATS_BATCH_SIZE = 500
+
+
+class CustomerManager(models.Manager):
+    """Manager that maintains the denormalized per-customer order aggregates."""
+
+    def record_orders(self, orders):
+        """
+        Fold newly created ``orders`` into their customers' aggregates.
+
+        Deltas are applied with ``F()`` expressions, one ``UPDATE`` per
+        ORDER_STATS_BATCH_SIZE customers, so concurrent writers never lose
+        increments.
+        """
+        stats = {}
+        for order in orders:
+            count, total, last = stats.get(order.customer_id, (0, Decimal('0'), None))
+            stats[order.customer_id] = (
+                count + 1,
+                total + order.total_amount,
+                order.order_date if last is None else max(last, order.order_date),
+            )
+
+        customer_ids = list(stats)
+        for start in range(0, len(customer_ids), ORDER_STATS_BATCH_SIZE):
+            chunk = customer_ids[start:start + ORDER_STATS_BATCH_SIZE]
+
+            def per_customer(position, output_field):
+                return Case(
+                    *[When(pk=pk, then=Value(stats[pk][position])) for pk in chunk],
+                    output_field=output_field,
+                )
+
+            amount_field = self.model._meta.get_field('lifetime_value')
+            date_field = self.model._meta.get_field('last_order_at')
+            last_order_at = per_customer(2, date_field)
+            self.filter(pk__in=chunk).update(
+                order_count=F('order_count') + per_customer(0, models.IntegerField()),
+                lifetime_value=F('lifetime_value') + per_customer(1, amount_field),
+                last_order_at=Greatest(Coalesce(F('last_order_at'), last_order_at), last_order_at),
+                # update() skips auto_now; the change feed relies on it
+                updated_at=timezone.now(),
+            )
+        invalidate(self.model)
+
+    def computed_order_stats(self):
+        """Annotate each customer with aggregates computed from the orders table."""
+        orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+        return self.annotate(
+            computed_order_count=Coalesce(
+                Subquery(orders.annotate(n=Count('pk')).values('n')), 0
+            ),
+            computed_lifetime_value=Coalesce(
+                Subquery(orders.annotate(total=Sum('total_amount')).values('total')),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            computed_last_order_at=Subquery(
+                orders.annotate(last=Max('order_date')).values('last')
+            ),
+        )
+
+    def inactive(self, since):
+        """
+        Customers without an order placed on or after ``since``, including
+        customers who never ordered.
+
+        A single ``NOT EXISTS`` anti-join, answered per customer by a probe
+        of orders_customer_date_idx.
+        """
+        recent_orders = Order.objects.filter(customer=OuterRef('pk'), order_date__gte=since)
+        return self.filter(~Exists(recent_orders.order_by()))
+
+    def _customer_counts(self, start, end):
+        joined = models.Q()
+        if start is not None:
+            joined &= models.Q(created_at__gte=start)
+        if end is not None:
+            joined &= models.Q(created_at__lt=end)
+        customers = self.order_by()
+        if end is not None:
+            customers = customers.filter(created_at__lt=end)
+        return customers, {
+            'customers': Count('pk'),
+            'new_customers': Count('pk', filter=joined),
+        }
+
+    def customer_counts(self, start=None, end=None):
+        """
+        Return the size of the customer base as of ``end`` and the number of
+        customers who joined in ``[start, end)``, in one aggregate query.
+        """
+        customers, aggregates = self._customer_counts(start, end)
+        return customers.aggregate(**aggregates)
+
+    async def acustomer_counts(self, start=None, end=None):
+        """Async version of :meth:`customer_counts`."""
+        customers, aggregates = self._customer_counts(start, end)
+        return await customers.aaggregate(**aggregates)
+
+    def refresh_order_stats(self, customer_ids=None):
+        """Recompute the aggregates from the orders table; all customers if no IDs."""
+        customers = self.all() if customer_ids is None else self.filter(pk__in=customer_ids)
+        stats = self.computed_order_stats().filter(pk=OuterRef('pk'))
+        updated = customers.update(
+            order_count=Subquery(stats.values('computed_order_count')),
+            lifetime_value=Subquery(stats.values('computed_lifetime_value')),
+            last_order_at=Subquery(stats.values('computed_last_order_at')),
+            updated_at=timezone.now(),
+        )
+        invalidate(self.model)
+        return updated
+
+    def order_stats_drift(self, batch_size=ORDER_STATS_BATCH_SIZE):
+        """
+        Yield ``(customer_id, stored, computed)`` for customers whose stored
+        aggregates disagree with the orders table.
+
+        Values are compared in Python so backends that sum decimals as
+        floats do not report rounding noise as drift.
+        """
+        quantum = Decimal('0.01')
+        rows = self.computed_order_stats().order_by('pk').values_list(
+            'pk', 'order_count', 'lifetime_value', 'last_order_at',
+            'computed_order_count', 'computed_lifetime_value', 'computed_last_order_at',
+        )
+        for pk, *values in rows.iterator(chunk_size=batch_size):
+            stored = (values[0], Decimal(values[1]).quantize(quantum), values[2])
+            computed = (values[3], Decimal(values[4]).quantize(quantum), values[5])
+            if stored != computed:
+                yield pk, stored, computed
+
 
 class Customer(models.Model):
     """Customer model with name, email, and phone."""
@@ -14,14 +156,142 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized order aggregates, maintained by the order write paths
+    last_order_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.00')
+    )
+
+    objects = CustomerManager()
+
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         db_table = 'customers'
+        indexes = [
+            # Default ordering, keyset pages and CustomerFilter.created_at ranges
+            models.Index(fields=['-created_at', '-id'], name='customers_created_idx'),
+            # customersChangedSince pages
+            models.Index(fields=['updated_at', 'id'], name='customers_updated_idx'),
+            # CustomerFilter.phone_pattern prefix match (LIKE 'x%' needs the
+            # pattern opclass on PostgreSQL)
+            models.Index(
+                fields=['phone'], name='customers_phone_idx',
+                opclasses=['varchar_pattern_ops']
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+def supports_update_returning(connection):
+    """
+    Return whether ``connection`` runs ``UPDATE ... RETURNING`` with a
+    ``LIMIT`` subquery: PostgreSQL and SQLite 3.35+. MariaDB and Oracle
+    return columns from INSERT only.
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+class ProductManager(models.Manager):
+    """Manager with set-based stock maintenance for products."""
+
+    def restock(self, threshold, increment, batch_size=None):
+        """
+        Add ``increment`` to the stock of every product below ``threshold``.
+
+        Runs as a single atomic ``UPDATE ... SET stock = stock + increment``
+        (one per ``batch_size`` rows when given) and returns the updated
+        products, read back with ``RETURNING`` where the backend supports it.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        if supports_update_returning(connection):
+            products = self._restock_returning(db, threshold, increment, batch_size)
+        else:
+            products = self._restock_select(db, threshold, increment, batch_size)
+        # A raw UPDATE sends no post_save signals
+        invalidate(self.model)
+        publish_stock_changes((product, product.stock - increment) for product in products)
+        return products
+
+    def _restock_returning(self, db, threshold, increment, batch_size):
+        connection = connections[db]
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        fields = opts.concrete_fields
+        table = qn(opts.db_table)
+        pk = qn(opts.pk.column)
+        stock = qn(opts.get_field('stock').column)
+        updated_at = opts.get_field('updated_at')
+        now = updated_at.get_db_prep_value(timezone.now(), connection)
+
+        # Apply the same converters the ORM would to the returned columns
+        converters = []
+        for field in fields:
+            col = field.get_col(opts.db_table)
+            converters.append(
+                connection.ops.get_db_converters(col) + col.get_db_converters(connection)
+            )
+
+        returning = ', '.join(qn(field.column) for field in fields)
+        if batch_size:
+            where = (
+                f"{pk} IN (SELECT {pk} FROM {table} WHERE {stock} < %s AND {pk} > %s "
+                f"ORDER BY {pk} LIMIT %s)"
+            )
+        else:
+            where = f"{stock} < %s"
+        sql = (
+            f"UPDATE {table} SET {stock} = {stock} + %s, {qn(updated_at.column)} = %s "
+            f"WHERE {where} RETURNING {returning}"
+        )
+
+        products = []
+        last_pk = 0
+        with connection.cursor() as cursor:
+            while True:
+                params = [increment, now, threshold]
+                if batch_size:
+                    params += [last_pk, batch_size]
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                for row in rows:
+                    values = []
+                    for field, value, field_converters in zip(fields, row, converters):
+                        for converter in field_converters:
+                            value = converter(value, field.get_col(opts.db_table), connection)
+                        values.append(value)
+                    products.append(self.model.from_db(db, [f.attname for f in fields], values))
+                if not batch_size or len(rows) < batch_size:
+                    break
+                last_pk = max(product.pk for product in products[-len(rows):])
+
+        products.sort(key=lambda product: product.pk)
+        return products
+
+    def _restock_select(self, db, threshold, increment, batch_size):
+        # Backends without RETURNING lock the candidate rows, update them in
+        # one statement per batch and read them back afterwards
+        with transaction.atomic(using=db):
+            pks = list(
+                self.using(db).select_for_update()
+                .filter(stock__lt=threshold)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            step = batch_size or len(pks) or 1
+            for start in range(0, len(pks), step):
+                self.using(db).filter(pk__in=pks[start:start + step]).update(
+                    stock=F('stock') + increment,
+                    updated_at=timezone.now()
+                )
+            return list(self.using(db).filter(pk__in=pks).order_by('pk'))
+
+
 class Product(models.Model):
     """Product model with name, price, and stock."""
     name = models.CharField(max_length=255)
@@ -30,20 +300,108 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductManager()
+
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         db_table = 'products'
+        indexes = [
+            # Default ordering and keyset pages
+            models.Index(fields=['-created_at', '-id'], name='products_created_idx'),
+            # productsChangedSince pages
+            models.Index(fields=['updated_at', 'id'], name='products_updated_idx'),
+            # ProductFilter.price and stock lookups, in default order for
+            # equality matches
+            models.Index(fields=['price', '-created_at', '-id'], name='products_price_idx'),
+            models.Index(fields=['stock', '-created_at', '-id'], name='products_stock_idx'),
+            # ProductFilter.low_stock only ever reads the small stock < 10
+            # slice of the catalog, already in default order
+            models.Index(
+                fields=['-created_at', '-id'], name='products_low_stock_idx',
+                condition=models.Q(stock__lt=10)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - ${self.price}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded stock so saves can publish stock changes
+        instance._loaded_stock = instance.__dict__.get('stock')
+        return instance
+
+
+class OrderManager(models.Manager):
+    """Manager computing order reporting aggregates in the database."""
+
+    def in_range(self, start=None, end=None):
+        """Orders placed in ``[start, end)``; either bound may be omitted."""
+        orders = self.order_by()
+        if start is not None:
+            orders = orders.filter(order_date__gte=start)
+        if end is not None:
+            orders = orders.filter(order_date__lt=end)
+        return orders
+
+    @staticmethod
+    def _totals(revenue, orders):
+        # Quantized in Python: SQLite sums decimals as floats
+        revenue = Decimal(revenue or 0).quantize(Decimal('0.01'))
+        average = (revenue / orders).quantize(Decimal('0.01')) if orders else Decimal('0.00')
+        return revenue, average
+
+    STATS_AGGREGATES = {
+        'orders': Count('pk'),
+        'revenue': Sum('total_amount'),
+        'active_customers': Count('customer', distinct=True),
+    }
+
+    def stats(self, start=None, end=None):
+        """
+        Return order count, revenue, average order value and the number of
+        distinct ordering customers for ``[start, end)``, in one aggregate
+        query regardless of table size.
+        """
+        totals = self.in_range(start, end).aggregate(**self.STATS_AGGREGATES)
+        totals['revenue'], totals['average_order_value'] = self._totals(
+            totals['revenue'], totals['orders']
+        )
+        return totals
+
+    async def astats(self, start=None, end=None):
+        """Async version of :meth:`stats`."""
+        totals = await self.in_range(start, end).aaggregate(**self.STATS_AGGREGATES)
+        totals['revenue'], totals['average_order_value'] = self._totals(
+            totals['revenue'], totals['orders']
+        )
+        return totals
+
+    def weekly_stats(self, start=None, end=None):
+        """Yield :meth:`stats` per calendar week, oldest first, one row per week."""
+        rows = (
+            self.in_range(start, end)
+            .annotate(week_start=TruncWeek('order_date'))
+            .values('week_start')
+            .annotate(**self.STATS_AGGREGATES)
+            .order_by('week_start')
+        )
+        for row in rows.iterator():
+            row['revenue'], row['average_order_value'] = self._totals(
+                row['revenue'], row['orders']
+            )
+            yield row
+
 
 class Order(models.Model):
     """Order model linking customers and products."""
     customer = models.ForeignKey(
         Customer,
         on_delete=models.CASCADE,
-        related_name='orders'
+        related_name='orders',
+        # Covered by the leading column of orders_customer_date_idx
+        db_index=False
     )
     products = models.ManyToManyField(Product, related_name='orders')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -51,15 +409,77 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderManager()
+
     class Meta:
-        ordering = ['-order_date']
+        ordering = ['-order_date', '-id']
         db_table = 'orders'
+        indexes = [
+            # OrderFilter.customer and per-customer history in date order
+            models.Index(
+                fields=['customer', '-order_date', '-id'], name='orders_customer_date_idx'
+            ),
+            # Default ordering, keyset pages and OrderFilter.order_date ranges
+            models.Index(fields=['-order_date', '-id'], name='orders_date_idx'),
+            # OrderFilter.total_amount exact/range lookups
+            models.Index(fields=['total_amount', '-order_date', '-id'], name='orders_total_idx'),
+            # ordersChangedSince pages
+            models.Index(fields=['updated_at', 'id'], name='orders_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer.name} - ${self.total_amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded customer so a reassignment can refresh both
+        # customers' order aggregates
+        instance._loaded_customer_id = instance.__dict__.get('customer_id')
+        return instance
+
     def calculate_total(self):
         """Calculate total amount from associated products."""
         return sum(product.price for product in self.products.all())
 
 
+class TombstoneManager(models.Manager):
+    """Manager recording deletions for the change feed."""
+
+    def record(self, instances):
+        """Record the deletion of ``instances`` (customers, products or orders)."""
+        now = timezone.now()
+        self.bulk_create([
+            self.model(
+                model=instance._meta.model_name, object_id=instance.pk, deleted_at=now
+            )
+            for instance in instances
+        ])
+
+    def prune(self, before):
+        """Delete tombstones older than ``before``; returns how many were deleted."""
+        deleted, _ = self.filter(deleted_at__lt=before).delete()
+        return deleted
+
+
+class Tombstone(models.Model):
+    """A deleted customer, product or order, kept so incremental syncs see deletes."""
+    MODELS = ['customer', 'product', 'order']
+
+    model = models.CharField(max_length=20, choices=[(name, name) for name in MODELS])
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        db_table = 'tombstones'
+        indexes = [
+            # deletedSince pages, per model and across all of them
+            models.Index(fields=['model', 'deleted_at', 'id'], name='tombstones_model_idx'),
+            models.Index(fields=['deleted_at', 'id'], name='tombstones_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.model} #{self.object_id}"
@@ -0,0 +1,129 @@
+"""
+Selection-set aware queryset optimizer for CRM connections.
+
+Walks the fields requested under ``edges { node { ... } }`` and applies
+``select_related`` for forward relations, ``prefetch_related`` for to-many
+relations and ``.only()`` column pruning at every level of the selection.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+# GraphQL fields that never map to a model column
+IGNORED_FIELDS = {'__typename', 'id'}
+
+
+def collect_fields(field_nodes, fragments):
+    """
+    Return the fields selected below ``field_nodes``, keyed by field name.
+
+    Fragments are flattened and repeated selections of the same field are
+    grouped so their sub-selections are merged.
+    """
+    fields = {}
+
+    def visit(selection_set):
+        if selection_set is None:
+            return
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                visit(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = fragments.get(selection.name.value)
+                if fragment is not None:
+                    visit(fragment.selection_set)
+
+    for node in field_nodes:
+        visit(node.selection_set)
+    return fields
+
+
+def node_fields(field_nodes, fragments):
+    """Return the fields selected under a connection's ``edges { node }``."""
+    edges = collect_fields(field_nodes, fragments).get('edges', [])
+    return collect_fields(collect_fields(edges, fragments).get('node', []), fragments)
+
+
+def is_prefetched(instance, name):
+    """Return whether the to-many relation ``name`` was prefetched on ``instance``."""
+    return name in getattr(instance, '_prefetched_objects_cache', {})
+
+
+def build_plan(model, fields, fragments, prefix=''):
+    """
+    Work out the optimizations for ``model`` given its selected ``fields``.
+
+    Returns ``(only, select_related, prefetch_related)`` with paths prefixed
+    by ``prefix``. ``only`` is ``None`` when a selected field is not a model
+    field (a custom resolver may read any column), so nothing is pruned.
+    """
+    only = set()
+    prunable = True
+    select_related = []
+    prefetch_related = []
+
+    for name, nodes in fields.items():
+        if name in IGNORED_FIELDS:
+            continue
+        try:
+            field = model._meta.get_field(to_snake_case(name))
+        except FieldDoesNotExist:
+            prunable = False
+            continue
+
+        if field.many_to_many or field.one_to_many:
+            accessor = field.get_accessor_name() if field.auto_created else field.name
+            related_queryset = optimize(
+                field.related_model._default_manager.all(),
+                node_fields(nodes, fragments),
+                fragments,
+                # The reverse FK column is needed to match prefetched rows
+                required=[field.field.name] if field.one_to_many else [],
+            )
+            prefetch_related.append(Prefetch(prefix + accessor, queryset=related_queryset))
+        elif field.many_to_one or field.one_to_one:
+            if not field.concrete:
+                prunable = False
+                continue
+            only.add(prefix + field.name)
+            select_related.append(prefix + field.name)
+            related_only, related_select, related_prefetch = build_plan(
+                field.related_model,
+                collect_fields(nodes, fragments),
+                fragments,
+                prefix=f"{prefix}{field.name}__",
+            )
+            if related_only is not None:
+                only.add(f"{prefix}{field.name}__{field.related_model._meta.pk.name}")
+                only.update(related_only)
+            select_related.extend(related_select)
+            prefetch_related.extend(related_prefetch)
+        else:
+            only.add(prefix + field.name)
+
+    return (only if prunable else None), select_related, prefetch_related
+
+
+def optimize(queryset, fields, fragments, required=()):
+    """Apply the plan for ``fields`` to ``queryset``."""
+    only, select_related, prefetch_related = build_plan(queryset.model, fields, fragments)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if only is not None:
+        queryset = queryset.only(queryset.model._meta.pk.name, *required, *only)
+    return queryset
+
+
+def optimize_queryset(queryset, info, required=()):
+    """
+    Optimize a connection's queryset for the fields requested in ``info``,
+    always loading the ``required`` columns.
+    """
+    return optimize(
+        queryset, node_fields(info.field_nodes, info.fragments), info.fragments, required
+    )
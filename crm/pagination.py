@@ -0,0 +1,192 @@
+"""
+Keyset pagination for the CRM relay connections.
+
+Offset cursors turn deep pages into ``OFFSET n`` scans and shift when rows
+are inserted ahead of the page. Keyset cursors instead encode the sort key
+of the edge, ``(order_date, id)`` or ``(created_at, id)`` for the default
+orderings, and the next page is fetched with a range condition on that key
+that the ordering indexes answer directly at any depth.
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphql import GraphQLError
+
+
+def keyset_ordering(queryset):
+    """
+    Return the queryset's ordering as ``[(name, descending), ...]`` ending
+    in the primary key, or ``None`` when it cannot be used as a keyset.
+
+    Only plain local columns and annotations qualify; orderings through
+    relations, expressions and nullable columns fall back to offsets.
+    """
+    model = queryset.model
+    ordering = queryset.query.order_by or model._meta.ordering
+    pk_name = model._meta.pk.name
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str) or item == '?' or '__' in item:
+            return None
+        descending = item.startswith('-')
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = pk_name
+        if name not in queryset.query.annotations:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.is_relation or field.null:
+                return None
+        keys.append((name, descending))
+        if name == pk_name:
+            break
+    else:
+        # The primary key breaks ties, in the direction of the leading column
+        keys.append((pk_name, keys[0][1] if keys else False))
+    return keys
+
+
+def model_columns(model, keys):
+    """Return the keyset names that are model fields, for column pruning."""
+    names = {field.name for field in model._meta.concrete_fields}
+    return [name for name, descending in keys if name in names]
+
+
+def dump_value(value):
+    """Make a sort key value JSON-serializable without losing precision."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(instance, keys):
+    """Encode the sort key of ``instance`` as an opaque cursor."""
+    values = [dump_value(getattr(instance, name)) for name, descending in keys]
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, model, keys):
+    """Decode ``cursor`` back into typed sort key values."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        decoded = []
+        for (name, descending), value in zip(keys, values):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                decoded.append(value)
+            else:
+                decoded.append(field.to_python(value))
+        return decoded
+    except (ValueError, TypeError, ValidationError, binascii.Error):
+        raise GraphQLError(f"Invalid cursor: {cursor!r}")
+
+
+def keyset_filter(keys, values, forward):
+    """
+    Return the condition selecting rows strictly after (``forward``) or
+    before the row with sort key ``values``.
+
+    The leading column is also bounded on its own so the database can turn
+    the condition into a range scan of the ordering index.
+    """
+    def lookup(descending):
+        return 'lt' if descending == forward else 'gt'
+
+    (first_name, first_descending), first_value = keys[0], values[0]
+    bound = 'lte' if lookup(first_descending) == 'lt' else 'gte'
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(keys, values):
+        condition |= equal & Q(**{f"{name}__{lookup(descending)}": value})
+        equal &= Q(**{name: value})
+    return Q(**{f"{first_name}__{bound}": first_value}) & condition
+
+
+def order_by(keys, reverse=False):
+    """Return ``order_by`` arguments for ``keys``, optionally reversed."""
+    return [f"{'-' if descending != reverse else ''}{name}" for name, descending in keys]
+
+
+def paginate(queryset, keys, args, connection_type, max_limit=None):
+    """
+    Resolve one page of ``connection_type`` from ``queryset`` using keyset
+    cursors. ``first``/``after`` and ``last``/``before`` follow the relay
+    connection spec; ``offset`` skips that many rows past ``after``.
+    """
+    model = queryset.model
+    first = args.get('first')
+    last = args.get('last')
+    after = args.get('after')
+    before = args.get('before')
+    offset = args.get('offset')
+    for name, value in (('first', first), ('last', last), ('offset', offset)):
+        if value is not None and value < 0:
+            raise GraphQLError(f'Argument "{name}" must be a non-negative integer')
+    if first is None and last is None:
+        first = max_limit
+
+    if after:
+        queryset = queryset.filter(keyset_filter(keys, decode_cursor(after, model, keys), True))
+    if before:
+        queryset = queryset.filter(keyset_filter(keys, decode_cursor(before, model, keys), False))
+    if offset:
+        # An explicit offset still scans, but only once, to find the row
+        # the page continues from
+        anchor = queryset.order_by(*order_by(keys)).values_list(
+            *(name for name, descending in keys)
+        )[offset - 1:offset]
+        values = list(anchor[0]) if anchor else None
+        if values is None:
+            queryset = queryset.none()
+        else:
+            queryset = queryset.filter(keyset_filter(keys, values, True))
+
+    def window(ordered, size):
+        # One extra row tells whether another page exists
+        return list(ordered if size is None else ordered[:size + 1])
+
+    has_previous_page = bool(after or offset)
+    has_next_page = bool(before)
+    if first is not None or last is None:
+        rows = window(queryset.order_by(*order_by(keys)), first)
+        if first is not None and len(rows) > first:
+            has_next_page = True
+            rows = rows[:first]
+        if last is not None and len(rows) > last:
+            has_previous_page = True
+            rows = rows[-last:]
+    else:
+        rows = window(queryset.order_by(*order_by(keys, reverse=True)), last)
+        if len(rows) > last:
+            has_previous_page = True
+            rows = rows[:last]
+        rows.reverse()
+
+    edges = [
+        connection_type.Edge(node=row, cursor=encode_cursor(row, keys)) for row in rows
+    ]
+    page = connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
+    page.iterable = queryset
+    return page
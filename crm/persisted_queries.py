@@ -0,0 +1,190 @@
+"""
+Automatic persisted queries and a cache of parsed, validated documents.
+
+Clients may send ``extensions.persistedQuery.sha256Hash`` (the Apollo APQ
+protocol) instead of the query text. The first request carrying both the
+hash and the query registers it in a Django cache shared by all workers;
+after that the hash alone is enough, including over GET.
+
+Independently of the registry, every document is parsed and validated once
+per process and kept in an LRU keyed by its hash, so repeated documents
+skip straight to execution.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import GraphQLError, execute_sync, parse, specified_rules, validate
+
+PERSISTED_QUERY_VERSION = 1
+
+# Parsed documents kept per process
+DOCUMENT_CACHE_SIZE = 256
+
+
+class PersistedQueryNotFound(GraphQLError):
+    """The hash is not registered; the client should resend it with the query."""
+
+    def __init__(self):
+        super().__init__(
+            "PersistedQueryNotFound", extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'}
+        )
+
+
+def query_hash(source):
+    """Return the hex SHA-256 digest identifying ``source``."""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class PersistedQueryRegistry:
+    """Hash-to-document registry stored in a Django cache."""
+
+    def __init__(self, cache_alias='default', timeout=None):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @staticmethod
+    def key(sha256_hash):
+        return f"crm:apq:{sha256_hash}"
+
+    def get(self, sha256_hash):
+        """Return the registered document source, or ``None``."""
+        return self.cache.get(self.key(sha256_hash))
+
+    def register(self, sha256_hash, source):
+        """Register ``source`` under its hash."""
+        self.cache.set(self.key(sha256_hash), source, self.timeout)
+
+    def resolve(self, query, extensions):
+        """
+        Return ``(query, hash)`` for a request's query text and extensions,
+        registering or looking up persisted queries as needed. ``hash`` is
+        ``None`` when the request does not use persisted queries.
+        """
+        persisted = (extensions or {}).get('persistedQuery')
+        if not persisted:
+            return query, None
+        if persisted.get('version') != PERSISTED_QUERY_VERSION:
+            raise GraphQLError("Unsupported persisted query version")
+        sha256_hash = persisted.get('sha256Hash')
+        if not isinstance(sha256_hash, str):
+            raise GraphQLError("Persisted query requires a sha256Hash")
+
+        if query:
+            if query_hash(query) != sha256_hash:
+                raise GraphQLError("Provided sha256Hash does not match query")
+            self.register(sha256_hash, query)
+            return query, sha256_hash
+
+        query = self.get(sha256_hash)
+        if query is None:
+            raise PersistedQueryNotFound()
+        return query, sha256_hash
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU of ``(document, validation errors)`` keyed by query
+    hash, with hit and parse-time metrics.
+    """
+
+    def __init__(self, maxsize=DOCUMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.parse_seconds = 0.0
+
+    def get(self, schema, source, key=None, rules=None):
+        """
+        Return ``(document, errors)`` for ``source`` against the graphene
+        ``schema``, parsing and validating it only on a miss.
+        """
+        key = key or query_hash(source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        started = time.perf_counter()
+        try:
+            document = parse(source)
+        except GraphQLError as error:
+            entry = (None, [error])
+        else:
+            errors = validate(
+                schema.graphql_schema, document,
+                specified_rules if rules is None else rules,
+            )
+            entry = (document, errors)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.misses += 1
+            self.parse_seconds += elapsed
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        """Return hit rate and the parse/validate time saved by hits."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            average = self.parse_seconds / self.misses if self.misses else 0.0
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'parse_seconds': self.parse_seconds,
+                'saved_seconds': self.hits * average,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            self.parse_seconds = 0.0
+
+
+_registry = None
+_document_cache = None
+
+
+def get_registry():
+    """Return the process-wide persisted query registry."""
+    global _registry
+    if _registry is None:
+        _registry = PersistedQueryRegistry(
+            getattr(settings, 'CRM_PERSISTED_QUERY_CACHE', 'default'),
+            getattr(settings, 'CRM_PERSISTED_QUERY_TIMEOUT', None),
+        )
+    return _registry
+
+
+def get_document_cache():
+    """Return the process-wide parsed document cache."""
+    global _document_cache
+    if _document_cache is None:
+        _document_cache = DocumentCache(
+            getattr(settings, 'CRM_DOCUMENT_CACHE_SIZE', DOCUMENT_CACHE_SIZE)
+        )
+    return _document_cache
+
+
+def execute_document(schema, document, **options):
+    """Execute an already validated ``document`` against the graphene ``schema``."""
+    return execute_sync(schema.graphql_schema, document, **options)
@@ -0,0 +1,138 @@
+"""
+Publish/subscribe channels feeding the GraphQL subscriptions.
+
+Writes publish small JSON-serializable messages (primary keys and stock
+levels, never model instances) once their transaction commits, so
+subscribers never see rows that were rolled back. Model signals publish
+single-row writes; bulk write paths, which send no signals, call
+``publish_orders_created`` and ``publish_stock_changes`` themselves.
+
+Messages go through the broker named by ``CRM_PUBSUB_BROKER``. The default
+``InProcessBroker`` only reaches subscribers in the same process; a broker
+backed by Redis or another message bus implements the same two methods,
+``publish(channel, message)`` and ``subscribe(channel)``, to fan out
+across processes.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = 'crm.order_created'
+PRODUCT_STOCK_CHANGED = 'crm.product_stock_changed'
+
+# Messages buffered per subscriber before new ones are dropped
+DEFAULT_QUEUE_SIZE = 100
+
+
+class InProcessSubscription:
+    """Async iterator over the messages a subscriber receives."""
+
+    def __init__(self, broker, channel, queue_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Dropped a %s message for a slow subscriber", self.channel)
+
+    async def aclose(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Broker delivering messages to the subscribers of this process.
+
+    ``publish`` may be called from any thread; each message is handed to the
+    subscriber's event loop, where it waits in a bounded queue.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or getattr(
+            settings, 'CRM_SUBSCRIPTION_QUEUE_SIZE', DEFAULT_QUEUE_SIZE
+        )
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Subscribe to ``channel``; must be called on the consuming event loop."""
+        subscription = InProcessSubscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions[subscription.channel].discard(subscription)
+
+    def subscribers(self, channel):
+        """Return the number of subscribers to ``channel``."""
+        with self._lock:
+            return len(self._subscriptions[channel])
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions[channel])
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+
+_broker = None
+
+
+def get_broker():
+    """Return the process-wide broker configured by ``CRM_PUBSUB_BROKER``."""
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'CRM_PUBSUB_BROKER', 'crm.pubsub.InProcessBroker')
+        _broker = import_string(path)()
+    return _broker
+
+
+def publish(channel, messages):
+    """Publish ``messages`` on ``channel`` when the current transaction commits."""
+    messages = list(messages)
+    if not messages:
+        return
+
+    def send():
+        broker = get_broker()
+        for message in messages:
+            broker.publish(channel, message)
+
+    transaction.on_commit(send)
+
+
+def publish_orders_created(orders):
+    publish(ORDER_CREATED, (
+        {'id': order.pk, 'customer_id': order.customer_id} for order in orders
+    ))
+
+
+def publish_stock_changes(changes):
+    """Publish ``(product, previous_stock)`` pairs; ``None`` for new products."""
+    publish(PRODUCT_STOCK_CHANGED, (
+        {'id': product.pk, 'stock': product.stock, 'previous_stock': previous}
+        for product, previous in changes
+    ))
@@ -0,0 +1,167 @@
+"""
+Opt-in response cache for read-only GraphQL queries.
+
+Query results are stored in a Django cache under a key built from the
+normalized document, the operation name, the variables and a generation
+counter per model the query reads. Saving or deleting a ``Customer``,
+``Product`` or ``Order``, or changing an order's products, bumps that
+model's generation, so every cached response that read it is skipped from
+then on and simply expires. Write paths that bypass model signals (bulk
+inserts and ``UPDATE`` statements) call :func:`invalidate` themselves.
+
+Only queries whose root fields are all listed in ``CACHEABLE_ROOT_FIELDS``
+are cached, each for the shortest TTL among the models it reads.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from graphql import (
+    FieldNode, OperationType, TypeInfo, TypeInfoVisitor, Visitor, get_named_type,
+    print_ast, visit,
+)
+
+from .persisted_queries import query_hash
+
+# Models (by label) each cacheable root field reads, beyond the types it
+# selects; filters such as OrderFilter.customer_name read related tables
+CACHEABLE_ROOT_FIELDS = {
+    'hello': set(),
+    'allCustomers': {'crm.Customer'},
+    'allCustomersFiltered': {'crm.Customer'},
+    'allProducts': {'crm.Product'},
+    'allOrders': {'crm.Order', 'crm.Customer', 'crm.Product'},
+    'crmStats': {'crm.Customer', 'crm.Order'},
+}
+
+DEFAULT_TTL = 60
+
+
+def generation_key(label):
+    return f"crm:rc:gen:{label}"
+
+
+class ResponseCache:
+    """Versioned response cache backed by a Django cache alias."""
+
+    def __init__(self, schema, cache_alias='default', ttls=None, default_ttl=DEFAULT_TTL):
+        self.schema = schema
+        self.cache_alias = cache_alias
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def dependencies(self, document, operation):
+        """
+        Return the labels of the models ``operation`` reads, or ``None``
+        when it is not cacheable.
+        """
+        if operation is None or operation.operation != OperationType.QUERY:
+            return None
+        models = set()
+        for selection in operation.selection_set.selections:
+            if not isinstance(selection, FieldNode):
+                return None
+            if selection.name.value not in CACHEABLE_ROOT_FIELDS:
+                return None
+            models |= CACHEABLE_ROOT_FIELDS[selection.name.value]
+
+        # Add the model behind every object type the document selects;
+        # connections are selected through their edges { node } wrappers
+        type_info = TypeInfo(self.schema.graphql_schema)
+
+        def model_of(graphene_type):
+            return getattr(getattr(graphene_type, '_meta', None), 'model', None)
+
+        class ModelCollector(Visitor):
+            def enter_field(self, node, *args):
+                named_type = get_named_type(type_info.get_type())
+                graphene_type = getattr(named_type, 'graphene_type', None)
+                node_type = getattr(getattr(graphene_type, '_meta', None), 'node', None)
+                for model in (model_of(graphene_type), model_of(node_type)):
+                    if model is not None:
+                        models.add(model._meta.label)
+
+        visit(document, TypeInfoVisitor(type_info, ModelCollector()))
+        return models
+
+    def generations(self, labels):
+        """Return the current generation of each model, initializing missing ones."""
+        keys = [generation_key(label) for label in labels]
+        values = self.cache.get_many(keys)
+        for key in keys:
+            if key not in values:
+                # Seeded from the clock so an evicted counter can never
+                # come back at a value an old response was stored under
+                self.cache.add(key, time.time_ns())
+                values[key] = self.cache.get(key)
+        return sorted(values.items())
+
+    def key(self, document, operation_name, variables, labels):
+        """Return the cache key for one execution of ``document``."""
+        payload = json.dumps(
+            [print_ast(document), operation_name, variables or {}, self.generations(labels)],
+            sort_keys=True, default=str,
+        )
+        return f"crm:rc:{query_hash(payload)}"
+
+    def ttl(self, labels):
+        """Return the shortest TTL configured for the models in ``labels``."""
+        return min(
+            (self.ttls.get(label.split('.')[-1], self.default_ttl) for label in labels),
+            default=self.default_ttl,
+        )
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, data, labels):
+        self.cache.set(key, data, self.ttl(labels))
+
+
+def bump(labels):
+    """Advance the generation of ``labels`` so cached responses reading them miss."""
+    cache = caches[getattr(settings, 'CRM_RESPONSE_CACHE_ALIAS', 'default')]
+    for label in labels:
+        key = generation_key(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate(*models):
+    """
+    Invalidate cached responses reading ``models``, now and again when the
+    current transaction commits, so a response cached from pre-commit data
+    cannot outlive the write.
+    """
+    if not getattr(settings, 'CRM_RESPONSE_CACHE_ENABLED', False):
+        return
+    labels = [model._meta.label for model in models]
+    bump(labels)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump(labels))
+
+
+_response_cache = None
+
+
+def get_response_cache(schema):
+    """Return the process-wide response cache, or ``None`` when disabled."""
+    global _response_cache
+    if not getattr(settings, 'CRM_RESPONSE_CACHE_ENABLED', False):
+        return None
+    if _response_cache is None or _response_cache.schema is not schema:
+        _response_cache = ResponseCache(
+            schema,
+            getattr(settings, 'CRM_RESPONSE_CACHE_ALIAS', 'default'),
+            getattr(settings, 'CRM_RESPONSE_CACHE_TTLS', None),
+            getattr(settings, 'CRM_RESPONSE_CACHE_DEFAULT_TTL', DEFAULT_TTL),
+        )
+    return _response_cache
@@ -3,16 +3,75 @@ GraphQL schema for CRM app with queries and mutations.
 """
 import graphene
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
 import re
 
 from crm.models import Customer, Order
-from crm.models import Product
+from crm.models import Product, Tombstone
+from .fields import KeysetConnectionField
 from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .loaders import get_loaders
+from .optimizer import is_prefetched
+from .pubsub import ORDER_CREATED, PRODUCT_STOCK_CHANGED, get_broker, publish_orders_created
+from .response_cache import invalidate
+
+# Rows per INSERT statement for the bulk mutations
+BULK_CREATE_BATCH_SIZE = 500
+
+# Default restock policy for UpdateLowStockProducts
+LOW_STOCK_THRESHOLD = 10
+RESTOCK_INCREMENT = 10
+
+# Accepts +1234567890 style international numbers and 123-456-7890
+PHONE_PATTERN = re.compile(r'^(\+?\d{10,15}|\d{3}-\d{3}-\d{4})$')
+
+
+def to_pk(model, value):
+    """Convert a raw GraphQL ID to ``model``'s primary key, or ``None`` if malformed."""
+    try:
+        return model._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def missing_ids_message(label, ids):
+    """Build the error message for IDs that do not exist."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) == 1:
+        return f"{label} with ID '{ids[0]}' does not exist"
+    quoted = ", ".join(f"'{value}'" for value in ids)
+    return f"{label}s with IDs {quoted} do not exist"
+
+
+def insert_in_chunks(candidates, bulk_insert, insert_one):
+    """
+    Insert ``(row_index, obj)`` candidates in chunks of BULK_CREATE_BATCH_SIZE.
+
+    ``bulk_insert`` writes a list of objects in one go. A chunk that fails
+    with an IntegrityError (typically a concurrent writer) is retried row by
+    row with ``insert_one`` so the failure is attributed to its row.
+    Returns ``(created, errors)`` where errors are ``(row_index, message)``.
+    """
+    created = []
+    errors = []
+    for start in range(0, len(candidates), BULK_CREATE_BATCH_SIZE):
+        chunk = candidates[start:start + BULK_CREATE_BATCH_SIZE]
+        try:
+            with transaction.atomic():
+                bulk_insert([obj for _, obj in chunk])
+            created.extend(obj for _, obj in chunk)
+        except IntegrityError:
+            for idx, obj in chunk:
+                try:
+                    with transaction.atomic():
+                        insert_one(obj)
+                    created.append(obj)
+                except Exception as e:
+                    errors.append((idx, f"Row {idx + 1}: {str(e)}"))
+    return created, errors
 
 
 # Node Types
@@ -20,7 +79,7 @@ class CustomerType(DjangoObjectType):
     """GraphQL type for Customer model."""
     class Meta:
         model = Customer
-        fields = ("id", "name", "email", "phone")
+        fields = ("id", "name", "email", "phone", "order_count", "lifetime_value")
 
 
 class CustomerNode(DjangoObjectType):
@@ -31,6 +90,12 @@ class CustomerNode(DjangoObjectType):
         interfaces = (graphene.relay.Node,)
         fields = '__all__'
 
+    def resolve_orders(self, info, **kwargs):
+        """Resolve the customer's orders through the request's loaders."""
+        if is_prefetched(self, 'orders'):
+            return self.orders.all()
+        return get_loaders(info.context).orders_by_customer.load(self.pk)
+
 
 class ProductNode(DjangoObjectType):
     """GraphQL node for Product model."""
@@ -40,6 +105,12 @@ class ProductNode(DjangoObjectType):
         interfaces = (graphene.relay.Node,)
         fields = '__all__'
 
+    def resolve_orders(self, info, **kwargs):
+        """Resolve the orders containing this product through the request's loaders."""
+        if is_prefetched(self, 'orders'):
+            return self.orders.all()
+        return get_loaders(info.context).orders_by_product.load(self.pk)
+
 
 class OrderNode(DjangoObjectType):
     """GraphQL node for Order model."""
@@ -49,6 +120,78 @@ class OrderNode(DjangoObjectType):
         interfaces = (graphene.relay.Node,)
         fields = '__all__'
 
+    def resolve_customer(self, info):
+        """Resolve the order's customer through the request's loaders."""
+        if Order.customer.is_cached(self):
+            return self.customer
+        return get_loaders(info.context).customer.load(self.customer_id)
+
+    def resolve_products(self, info, **kwargs):
+        """Resolve the order's products through the request's loaders."""
+        if is_prefetched(self, 'products'):
+            return self.products.all()
+        return get_loaders(info.context).products_by_order.load(self.pk)
+
+
+# Node types whose rows the change feed reports, by Tombstone.model
+CHANGE_FEED_NODES = {'customer': CustomerNode, 'product': ProductNode, 'order': OrderNode}
+
+
+def changed_since(model, since):
+    """Rows of ``model`` written at or after ``since``, oldest change first."""
+    return model.objects.filter(updated_at__gte=since).order_by('updated_at', 'id')
+
+
+class ChangeFeedModel(graphene.Enum):
+    """Kind of row reported by the change feed."""
+    CUSTOMER = 'customer'
+    PRODUCT = 'product'
+    ORDER = 'order'
+
+
+class TombstoneNode(DjangoObjectType):
+    """GraphQL node for a deleted customer, product or order."""
+    class Meta:
+        model = Tombstone
+        filter_fields = {}
+        interfaces = (graphene.relay.Node,)
+        fields = ('object_id', 'deleted_at')
+
+    model = ChangeFeedModel(required=True)
+    # The ID the deleted row had in the *ChangedSince queries
+    deleted_id = graphene.ID(required=True)
+
+    def resolve_deleted_id(self, info):
+        """Resolve the deleted row's global ID."""
+        node = CHANGE_FEED_NODES[self.model]
+        return graphene.relay.Node.to_global_id(node._meta.name, self.object_id)
+
+
+class WeeklyStatsType(graphene.ObjectType):
+    """Order aggregates for one calendar week."""
+    week_start = graphene.DateTime(required=True)
+    orders = graphene.Int(required=True)
+    revenue = graphene.Decimal(required=True)
+    average_order_value = graphene.Decimal(required=True)
+    active_customers = graphene.Int(required=True)
+
+
+class CRMStatsType(graphene.ObjectType):
+    """CRM totals for a date range, computed with database aggregates."""
+    start = graphene.DateTime()
+    end = graphene.DateTime()
+    customers = graphene.Int(required=True)
+    new_customers = graphene.Int(required=True)
+    orders = graphene.Int(required=True)
+    revenue = graphene.Decimal(required=True)
+    average_order_value = graphene.Decimal(required=True)
+    active_customers = graphene.Int(required=True)
+    weeks = graphene.List(graphene.NonNull(WeeklyStatsType), required=True)
+
+    def resolve_weeks(self, info):
+        """Break the range down per week, only when the week rows are requested."""
+        return list(Order.objects.weekly_stats(self['start'], self['end']))
+
 
 # Input Types
 class CustomerInput(graphene.InputObjectType):
@@ -102,6 +245,12 @@ class CreateOrderOutput(graphene.ObjectType):
     order = graphene.Field(OrderNode)
 
 
+class BulkCreateOrdersOutput(graphene.ObjectType):
+    """Output type for BulkCreateOrders mutation."""
+    orders = graphene.List(OrderNode)
+    errors = graphene.List(graphene.String)
+
+
 # Mutations
 class CreateCustomer(graphene.Mutation):
     """Mutation to create a single customer."""
@@ -112,6 +261,11 @@ class CreateCustomer(graphene.Mutation):
         email = graphene.String(required=True)
         phone = graphene.String(required=True)
 
+    @staticmethod
+    def validate_phone(phone):
+        """Return whether ``phone`` matches an accepted phone format."""
+        return bool(PHONE_PATTERN.match(phone))
+
     def mutate(self, info, name, email, phone):
         """Create a new customer."""
         customer = Customer(name=name, email=email, phone=phone)
@@ -129,41 +283,53 @@ class BulkCreateCustomers(graphene.Mutation):
     @staticmethod
     def mutate(root, info, input):
         """Create multiple customers with partial success support."""
-        customers = []
         errors = []
 
-        # Process each customer independently for partial success
+        # Resolve email collisions against the database in a single query
+        existing_emails = set(
+            Customer.objects.filter(
+                email__in={customer_data.email for customer_data in input}
+            ).order_by().values_list('email', flat=True)
+        )
+
+        # Validate every row in memory, treating earlier rows of the payload
+        # as already taken so duplicates within the payload are reported too
+        candidates = []
         for idx, customer_data in enumerate(input):
-            try:
-                # Validate email uniqueness
-                if Customer.objects.filter(email=customer_data.email).exists():
-                    errors.append(
-                        f"Row {idx + 1}: Email '{customer_data.email}' already exists"
-                    )
-                    continue
-
-                # Validate phone format
-                if customer_data.phone and not CreateCustomer.validate_phone(
-                    customer_data.phone
-                ):
-                    errors.append(
-                        f"Row {idx + 1}: Invalid phone format for '{customer_data.phone}'"
-                    )
-                    continue
-
-                customer = Customer.objects.create(
-                    name=customer_data.name,
-                    email=customer_data.email,
-                    phone=customer_data.phone or None
+            if customer_data.email in existing_emails:
+                errors.append(
+                    (idx, f"Row {idx + 1}: Email '{customer_data.email}' already exists")
                 )
-                customers.append(customer)
+                continue
 
-            except Exception as e:
-                errors.append(f"Row {idx + 1}: {str(e)}")
+            if customer_data.phone and not CreateCustomer.validate_phone(
+                customer_data.phone
+            ):
+                errors.append(
+                    (idx, f"Row {idx + 1}: Invalid phone format for '{customer_data.phone}'")
+                )
+                continue
+
+            existing_emails.add(customer_data.email)
+            candidates.append((idx, Customer(
+                name=customer_data.name,
+                email=customer_data.email,
+                phone=customer_data.phone or None
+            )))
+
+        # Insert the survivors in chunks
+        customers, insert_errors = insert_in_chunks(
+            candidates,
+            Customer.objects.bulk_create,
+            lambda customer: customer.save()
+        )
+        errors.extend(insert_errors)
+        # bulk_create sends no post_save signals
+        invalidate(Customer)
 
         return BulkCreateCustomersOutput(
             customers=customers,
-            errors=errors
+            errors=[message for _, message in sorted(errors)]
         )
 
 
@@ -175,8 +341,8 @@ class CreateProduct(graphene.Mutation):
     Output = CreateProductOutput
 
     @staticmethod
-    def mutate(root, info, input):
-        """Create a new product."""
+    def clean(input):
+        """Validate ``input`` and return the product's field values."""
         # Validate price is positive
         if input.price <= 0:
             raise ValidationError("Price must be positive")
@@ -186,11 +352,12 @@ class CreateProduct(graphene.Mutation):
         if stock < 0:
             raise ValidationError("Stock cannot be negative")
 
-        product = Product.objects.create(
-            name=input.name,
-            price=input.price,
-            stock=stock
-        )
+        return {'name': input.name, 'price': input.price, 'stock': stock}
+
+    @staticmethod
+    def mutate(root, info, input):
+        """Create a new product."""
+        product = Product.objects.create(**CreateProduct.clean(input))
 
         return CreateProductOutput(product=product)
 
@@ -208,36 +375,139 @@ class CreateOrder(graphene.Mutation):
         # Validate customer exists
         try:
             customer = Customer.objects.get(pk=input.customer_id)
-        except Customer.DoesNotExist:
+        except (Customer.DoesNotExist, ValueError):
             raise ValidationError(f"Customer with ID '{input.customer_id}' does not exist")
 
         # Validate at least one product
         if not input.product_ids or len(input.product_ids) == 0:
             raise ValidationError("At least one product must be selected")
 
-        # Validate products exist
-        products = []
-        for product_id in input.product_ids:
-            try:
-                product = Product.objects.get(pk=product_id)
-                products.append(product)
-            except Product.DoesNotExist:
-                raise ValidationError(f"Product with ID '{product_id}' does not exist")
+        # Resolve all products in one query and report every missing ID at once
+        product_pks = [to_pk(Product, product_id) for product_id in input.product_ids]
+        products = Product.objects.in_bulk({pk for pk in product_pks if pk is not None})
+        missing = [
+            product_id for product_id, pk in zip(input.product_ids, product_pks)
+            if pk not in products
+        ]
+        if missing:
+            raise ValidationError(missing_ids_message("Product", missing))
 
         # Calculate total amount
-        total_amount = sum(product.price for product in products)
+        total_amount = sum(products[pk].price for pk in product_pks)
+
+        # Create the order and its through rows together
+        with transaction.atomic():
+            order = Order.objects.create(
+                customer=customer,
+                total_amount=total_amount,
+                order_date=input.order_date or timezone.now()
+            )
+            OrderProduct = Order.products.through
+            OrderProduct.objects.bulk_create([
+                OrderProduct(order_id=order.pk, product_id=pk)
+                for pk in dict.fromkeys(product_pks)
+            ])
+            # Through rows created directly send no m2m_changed signal
+            invalidate(Product)
 
-        # Create order
-        order = Order.objects.create(
-            customer=customer,
-            total_amount=total_amount,
-            order_date=input.order_date or timezone.now()
-        )
+        return CreateOrderOutput(order=order)
 
-        # Associate products
-        order.products.set(products)
 
-        return CreateOrderOutput(order=order)
+class BulkCreateOrders(graphene.Mutation):
+    """Mutation to create many orders in bulk."""
+    class Arguments:
+        input = graphene.List(OrderInput, required=True)
+
+    Output = BulkCreateOrdersOutput
+
+    @staticmethod
+    def mutate(root, info, input):
+        """Create multiple orders with partial success support."""
+        errors = []
+
+        # Resolve every referenced customer and product up front
+        customer_pks = [to_pk(Customer, order_data.customer_id) for order_data in input]
+        product_pks = [
+            [to_pk(Product, product_id) for product_id in order_data.product_ids or []]
+            for order_data in input
+        ]
+        existing_customers = set(
+            Customer.objects.filter(
+                pk__in={pk for pk in customer_pks if pk is not None}
+            ).order_by().values_list('pk', flat=True)
+        )
+        prices = dict(
+            Product.objects.filter(
+                pk__in={pk for pks in product_pks for pk in pks if pk is not None}
+            ).order_by().values_list('pk', 'price')
+        )
+
+        # Validate rows and compute totals from the in-memory price map
+        candidates = []
+        now = timezone.now()
+        for idx, order_data in enumerate(input):
+            if customer_pks[idx] not in existing_customers:
+                errors.append((idx, f"Row {idx + 1}: Customer with ID "
+                                    f"'{order_data.customer_id}' does not exist"))
+                continue
+
+            if not product_pks[idx]:
+                errors.append((idx, f"Row {idx + 1}: At least one product must be selected"))
+                continue
+
+            missing = [
+                product_id for product_id, pk in zip(order_data.product_ids, product_pks[idx])
+                if pk not in prices
+            ]
+            if missing:
+                errors.append((idx, f"Row {idx + 1}: {missing_ids_message('Product', missing)}"))
+                continue
+
+            order = Order(
+                customer_id=customer_pks[idx],
+                total_amount=sum(prices[pk] for pk in product_pks[idx]),
+                order_date=order_data.order_date or now
+            )
+            candidates.append((idx, (order, list(dict.fromkeys(product_pks[idx])))))
+
+        OrderProduct = Order.products.through
+
+        def bulk_insert(rows):
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # Through rows need the order IDs back from the INSERT
+                for row in rows:
+                    insert_one(row)
+                return
+            orders = Order.objects.bulk_create([order for order, _ in rows])
+            OrderProduct.objects.bulk_create([
+                OrderProduct(order_id=order.pk, product_id=pk)
+                for order, pks in rows
+                for pk in pks
+            ], batch_size=BULK_CREATE_BATCH_SIZE)
+            # bulk_create skips post_save, so update the customer aggregates
+            # and notify subscribers here
+            Customer.objects.record_orders(orders)
+            publish_orders_created(orders)
+
+        def insert_one(row):
+            order, pks = row
+            order.save()
+            OrderProduct.objects.bulk_create([
+                OrderProduct(order_id=order.pk, product_id=pk) for pk in pks
+            ])
+
+        created, insert_errors = insert_in_chunks(candidates, bulk_insert, insert_one)
+        errors.extend(insert_errors)
+        # bulk_create sends no post_save or m2m_changed signals
+        invalidate(Order, Product)
+
+        orders = [order for order, _ in created]
+        get_loaders(info.context).register(orders)
+
+        return BulkCreateOrdersOutput(
+            orders=orders,
+            errors=[message for _, message in sorted(errors)]
+        )
 
 
 # Output Type for UpdateLowStockProducts
@@ -250,25 +520,29 @@ class UpdateLowStockProductsOutput(graphene.ObjectType):
 class UpdateLowStockProducts(graphene.Mutation):
     """Mutation to update low-stock products (stock < 10) by incrementing stock by 10."""
     class Arguments:
-        pass
+        threshold = graphene.Int(default_value=LOW_STOCK_THRESHOLD)
+        increment = graphene.Int(default_value=RESTOCK_INCREMENT)
+        batch_size = graphene.Int()
 
     Output = UpdateLowStockProductsOutput
 
     @staticmethod
-    def mutate(root, info):
-        """Query products with stock < 10 and increment their stock by 10."""
-        # Query products with stock < 10
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        
-        # Update stock by incrementing by 10
-        updated_products = []
-        for product in low_stock_products:
-            product.stock += 10
-            product.save()
-            updated_products.append(product)
-        
+    def mutate(root, info, threshold, increment, batch_size=None):
+        """Increment the stock of products below ``threshold`` in one UPDATE."""
+        if increment <= 0:
+            raise ValidationError("Increment must be positive")
+
+        if batch_size is not None and batch_size <= 0:
+            raise ValidationError("Batch size must be positive")
+
+        updated_products = Product.objects.restock(
+            threshold=threshold,
+            increment=increment,
+            batch_size=batch_size
+        )
+
         message = f"Successfully updated {len(updated_products)} low-stock products"
-        
+
         return UpdateLowStockProductsOutput(
             updated_products=updated_products,
             message=message
@@ -287,20 +561,77 @@ class Query(graphene.ObjectType):
         """Resolve all customers."""
         return Customer.objects.all()
 
-    # Filtered queries using DjangoFilterConnectionField
-    all_customers_filtered = DjangoFilterConnectionField(
+    # Customer and order totals for an optional [start, end) date range
+    crm_stats = graphene.Field(
+        CRMStatsType,
+        start=graphene.DateTime(),
+        end=graphene.DateTime(),
+        required=True
+    )
+
+    @staticmethod
+    def check_range(start, end):
+        if start is not None and end is not None and start >= end:
+            raise ValidationError("Start must be before end")
+
+    def resolve_crm_stats(self, info, start=None, end=None):
+        """Resolve CRM totals with aggregate queries instead of fetching rows."""
+        Query.check_range(start, end)
+        stats = {'start': start, 'end': end}
+        stats.update(Customer.objects.customer_counts(start, end))
+        stats.update(Order.objects.stats(start, end))
+        return stats
+
+    # Filtered queries using DjangoFilterConnectionField, batched and
+    # keyset-paginated via KeysetConnectionField
+    all_customers_filtered = KeysetConnectionField(
         CustomerNode,
         filterset_class=CustomerFilter
     )
-    all_products = DjangoFilterConnectionField(
+    all_products = KeysetConnectionField(
         ProductNode,
         filterset_class=ProductFilter
     )
-    all_orders = DjangoFilterConnectionField(
+    all_orders = KeysetConnectionField(
         OrderNode,
         filterset_class=OrderFilter
     )
 
+    # Change feed for incremental syncs: rows written at or after ``since``
+    # and tombstones of rows deleted since, oldest first and paginated by
+    # (updated_at, id) keyset cursors on the *_updated_idx indexes
+    customers_changed_since = KeysetConnectionField(
+        CustomerNode, since=graphene.DateTime(required=True)
+    )
+    products_changed_since = KeysetConnectionField(
+        ProductNode, since=graphene.DateTime(required=True)
+    )
+    orders_changed_since = KeysetConnectionField(
+        OrderNode, since=graphene.DateTime(required=True)
+    )
+    deleted_since = KeysetConnectionField(
+        TombstoneNode, since=graphene.DateTime(required=True), model=ChangeFeedModel()
+    )
+
+    def resolve_customers_changed_since(self, info, since, **kwargs):
+        """Resolve customers created or updated since ``since``."""
+        return changed_since(Customer, since)
+
+    def resolve_products_changed_since(self, info, since, **kwargs):
+        """Resolve products created or updated since ``since``."""
+        return changed_since(Product, since)
+
+    def resolve_orders_changed_since(self, info, since, **kwargs):
+        """Resolve orders created or updated since ``since``."""
+        return changed_since(Order, since)
+
+    def resolve_deleted_since(self, info, since, model=None, **kwargs):
+        """Resolve tombstones of rows deleted since ``since``, optionally of one model."""
+        tombstones = Tombstone.objects.filter(deleted_at__gte=since)
+        if model is not None:
+            tombstones = tombstones.filter(model=model.value)
+        return tombstones
+
 
 # Mutation Class
 class Mutation(graphene.ObjectType):
@@ -309,5 +640,122 @@ class Mutation(graphene.ObjectType):
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
 
+
+class ProductStockChangeType(graphene.ObjectType):
+    """A change to a product's stock level."""
+    product = graphene.Field(ProductNode, required=True)
+    # Null for a newly created product
+    previous_stock = graphene.Int()
+    stock = graphene.Int(required=True)
+
+
+async def order_events(stream, customer_pk=None):
+    """Yield the orders announced on ``stream``, optionally for one customer."""
+    try:
+        async for message in stream:
+            if customer_pk is not None and message['customer_id'] != customer_pk:
+                continue
+            order = await Order.objects.select_related('customer').filter(
+                pk=message['id']
+            ).afirst()
+            if order is not None:
+                yield order
+    finally:
+        await stream.aclose()
+
+
+async def stock_events(stream, low_stock=False):
+    """
+    Yield the stock changes announced on ``stream``. With ``low_stock``,
+    only changes into, within or out of the low-stock range are yielded.
+    """
+    try:
+        async for message in stream:
+            levels = (message['stock'], message['previous_stock'])
+            if low_stock and not any(
+                level is not None and level < LOW_STOCK_THRESHOLD for level in levels
+            ):
+                continue
+            product = await Product.objects.filter(pk=message['id']).afirst()
+            if product is not None:
+                yield ProductStockChangeType(
+                    product=product,
+                    previous_stock=message['previous_stock'],
+                    stock=message['stock'],
+                )
+    finally:
+        await stream.aclose()
+
+
+# Subscription Class
+class Subscription(graphene.ObjectType):
+    """Subscription class for CRM app, served over the ASGI websocket."""
+    # Orders as they are created, optionally for one customer
+    order_created = graphene.Field(OrderNode, required=True, customer_id=graphene.ID())
+
+    # Stock level changes, optionally only around the low-stock threshold
+    product_stock_changed = graphene.Field(
+        ProductStockChangeType, required=True, low_stock=graphene.Boolean()
+    )
+
+    @staticmethod
+    def subscribe_order_created(root, info, customer_id=None):
+        """Stream orders as they are committed."""
+        # Subscribe before returning so no order committed meanwhile is missed
+        stream = get_broker().subscribe(ORDER_CREATED)
+        customer_pk = to_pk(Customer, customer_id) if customer_id is not None else None
+        return order_events(stream, customer_pk)
+
+    @staticmethod
+    def subscribe_product_stock_changed(root, info, low_stock=False):
+        """Stream product stock changes as they are committed."""
+        return stock_events(get_broker().subscribe(PRODUCT_STOCK_CHANGED), low_stock)
+
+
+# Async variants for the ASGI view, using Django's async ORM interface.
+# Fields without one keep their sync resolver, which the async executor runs
+# in the request's thread (see crm.async_execution).
+class AsyncCreateCustomer(CreateCustomer):
+    """Async version of CreateCustomer."""
+    class Meta:
+        name = 'CreateCustomer'
+        description = CreateCustomer._meta.description
+
+    async def mutate(self, info, name, email, phone):
+        """Create a new customer."""
+        customer = await Customer.objects.acreate(name=name, email=email, phone=phone)
+        return AsyncCreateCustomer(customer=customer)
+
+
+class AsyncCreateProduct(CreateProduct):
+    """Async version of CreateProduct."""
+    class Meta:
+        description = CreateProduct._meta.description
+
+    @staticmethod
+    async def mutate(root, info, input):
+        """Create a new product."""
+        product = await Product.objects.acreate(**CreateProduct.clean(input))
+
+        return CreateProductOutput(product=product)
+
+
+class AsyncQuery(Query):
+    """Query class for CRM app with async root resolvers."""
+
+    async def resolve_crm_stats(self, info, start=None, end=None):
+        """Resolve CRM totals with async aggregate queries."""
+        Query.check_range(start, end)
+        stats = {'start': start, 'end': end}
+        stats.update(await Customer.objects.acustomer_counts(start, end))
+        stats.update(await Order.objects.astats(start, end))
+        return stats
+
+
+class AsyncMutation(Mutation):
+    """Mutation class for CRM app with async mutations where available."""
+    create_customer = AsyncCreateCustomer.Field()
+    create_product = AsyncCreateProduct.Field()
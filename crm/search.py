@@ -0,0 +1,206 @@
+"""
+Pluggable substring search for the CRM name and email filters.
+
+``icontains`` compiles to ``LIKE '%x%'``, which a B-tree index cannot serve.
+The backend for the active database routes those lookups through an index
+that can: pg_trgm GIN indexes on PostgreSQL, and FTS5 trigram shadow tables
+kept in sync by triggers on SQLite. Other databases fall back to a plain
+``icontains``. ``settings.CRM_SEARCH_BACKEND`` overrides the choice with a
+dotted path to a ``SearchBackend`` subclass.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+
+# Columns indexed for substring search, keyed by table
+SEARCH_COLUMNS = {
+    'customers': ('name', 'email'),
+    'products': ('name',),
+}
+
+
+def resolve_path(model, path):
+    """Split a lookup path into ``(relation prefix, target model, field name)``."""
+    *relations, field_name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    prefix = ''.join(f"{relation}__" for relation in relations)
+    return prefix, model, field_name
+
+
+class SearchBackend:
+    """Fallback backend: case-insensitive ``LIKE`` without index support."""
+
+    def contains(self, queryset, paths, value):
+        """Filter rows where any of ``paths`` contains ``value``, ignoring case."""
+        condition = Q()
+        for path in paths:
+            condition |= Q(**{f"{path}__icontains": value})
+        return queryset.filter(condition)
+
+    def rank(self, queryset, paths, value):
+        """Annotate ``search_rank`` (higher is better) for rows matching ``value``."""
+        return queryset.annotate(search_rank=Value(1.0, output_field=FloatField()))
+
+    def search(self, queryset, value):
+        """Ranked search over the model's indexed columns, best match first."""
+        paths = SEARCH_COLUMNS.get(queryset.model._meta.db_table, ())
+        queryset = self.rank(self.contains(queryset, paths, value), paths, value)
+        return queryset.order_by('-search_rank', *queryset.model._meta.ordering)
+
+    # Index management is a no-op for backends without dedicated indexes
+    def install(self, connection):
+        pass
+
+    def uninstall(self, connection):
+        pass
+
+
+class PostgresTrigramBackend(SearchBackend):
+    """
+    PostgreSQL backend using pg_trgm.
+
+    Django compiles ``icontains`` to ``UPPER(col::text) LIKE UPPER(%s)``, so
+    the GIN indexes are built on that exact expression and the inherited
+    ``contains`` is served by them unchanged.
+    """
+
+    def rank(self, queryset, paths, value):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        similarities = [TrigramSimilarity(path, value) for path in paths]
+        if not similarities:
+            return super().rank(queryset, paths, value)
+        rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        return queryset.annotate(search_rank=rank)
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for table, columns in SEARCH_COLUMNS.items():
+                for column in columns:
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm_idx "
+                        f"ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+                    )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            for table, columns in SEARCH_COLUMNS.items():
+                for column in columns:
+                    cursor.execute(f"DROP INDEX IF EXISTS {table}_{column}_trgm_idx")
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    SQLite backend using external-content FTS5 tables with the trigram
+    tokenizer, which answer ``LIKE '%x%'`` from the index.
+    """
+
+    def contains(self, queryset, paths, value):
+        # FTS5 cannot push down LIKE with an ESCAPE clause, so values
+        # containing wildcards take the unindexed path
+        if '%' in value or '_' in value:
+            return super().contains(queryset, paths, value)
+
+        indexed = {}
+        plain = []
+        for path in paths:
+            prefix, model, field_name = resolve_path(queryset.model, path)
+            table = model._meta.db_table
+            column = model._meta.get_field(field_name).column
+            if column in SEARCH_COLUMNS.get(table, ()):
+                indexed.setdefault((prefix, table), []).append(column)
+            else:
+                plain.append(path)
+
+        condition = Q()
+        for (prefix, table), columns in indexed.items():
+            # One UNION branch per column keeps every LIKE index-assisted
+            sql = " UNION ".join(
+                f"SELECT rowid FROM {table}_fts WHERE {column} LIKE %s" for column in columns
+            )
+            condition |= Q(**{f"{prefix}pk__in": RawSQL(sql, [f"%{value}%"] * len(columns))})
+        for path in plain:
+            condition |= Q(**{f"{path}__icontains": value})
+        return queryset.filter(condition)
+
+    def rank(self, queryset, paths, value):
+        table = queryset.model._meta.db_table
+        if table not in SEARCH_COLUMNS or len(value) < 3:
+            # Trigram MATCH needs at least three characters
+            return super().rank(queryset, paths, value)
+        phrase = '"{}"'.format(value.replace('"', '""'))
+        pk = queryset.model._meta.pk.column
+        # bm25 ranks are negative with the best match lowest
+        rank = RawSQL(
+            f"SELECT -rank FROM {table}_fts WHERE {table}_fts MATCH %s "
+            f"AND rowid = {table}.{pk}",
+            [phrase],
+            output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank)
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            for table, columns in SEARCH_COLUMNS.items():
+                column_list = ', '.join(columns)
+                new_values = ', '.join(f"new.{column}" for column in columns)
+                old_values = ', '.join(f"old.{column}" for column in columns)
+                cursor.execute(
+                    f"SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+                    f"AND name LIKE '{table}_fts_%'"
+                )
+                had_triggers = cursor.fetchone()[0] == 3
+
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+                    f"{column_list}, content='{table}', content_rowid='id', "
+                    f"tokenize='trigram')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} "
+                    f"BEGIN INSERT INTO {table}_fts(rowid, {column_list}) "
+                    f"VALUES (new.id, {new_values}); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} "
+                    f"BEGIN INSERT INTO {table}_fts({table}_fts, rowid, {column_list}) "
+                    f"VALUES ('delete', old.id, {old_values}); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au "
+                    f"AFTER UPDATE OF {column_list} ON {table} "
+                    f"BEGIN INSERT INTO {table}_fts({table}_fts, rowid, {column_list}) "
+                    f"VALUES ('delete', old.id, {old_values}); "
+                    f"INSERT INTO {table}_fts(rowid, {column_list}) "
+                    f"VALUES (new.id, {new_values}); END"
+                )
+                # Writes made while the triggers were missing (e.g. after a
+                # migration rebuilt the table) are recovered by a rebuild
+                if not had_triggers:
+                    cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            for table in SEARCH_COLUMNS:
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+BACKENDS = {
+    'postgresql': PostgresTrigramBackend,
+    'sqlite': SQLiteFTSBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """Return the search backend for the database alias ``using``."""
+    override = getattr(settings, 'CRM_SEARCH_BACKEND', None)
+    if override:
+        return import_string(override)()
+    return BACKENDS.get(connections[using].vendor, SearchBackend)()
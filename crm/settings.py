@@ -29,4 +29,12 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'crm.tasks.generate_crm_report',
         'schedule': crontab(day_of_week='mon', hour=6, minute=0),
     },
+    'clean-inactive-customers': {
+        'task': 'crm.tasks.clean_inactive_customers',
+        'schedule': crontab(day_of_week='sun', hour=2, minute=0),
+    },
+    'prune-tombstones': {
+        'task': 'crm.tasks.prune_tombstones',
+        'schedule': crontab(hour=3, minute=0),
+    },
 }
@@ -0,0 +1,120 @@
+"""
+Signal handlers keeping the denormalized customer order aggregates and the
+GraphQL response cache current, publishing the subscription channels and
+feeding the change feed (``updated_at`` and tombstones).
+
+Bulk write paths bypass these signals and call
+``Customer.objects.record_orders``, ``response_cache.invalidate`` and the
+``pubsub`` publishers themselves.
+
+The search indexes are re-installed after every migrate run, since SQLite
+drops the FTS triggers whenever a migration rebuilds the table.
+"""
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Customer, Order, Product, Tombstone
+from .pubsub import publish_orders_created, publish_stock_changes
+from .response_cache import invalidate
+from .search import get_search_backend
+
+SEARCH_MIGRATION = ('crm', '0005_search_indexes')
+
+
+@receiver(post_save, sender=Order)
+def update_customer_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """Fold a new order into its customer's aggregates, or recompute on edits."""
+    if raw:
+        return
+    if created:
+        Customer.objects.record_orders([instance])
+        return
+    customer_ids = {instance.customer_id, getattr(instance, '_loaded_customer_id', None)}
+    Customer.objects.refresh_order_stats(customer_ids - {None})
+    instance._loaded_customer_id = instance.customer_id
+
+
+@receiver(post_delete, sender=Order)
+def update_customer_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """Recompute the customer's aggregates after one of its orders is deleted."""
+    # Orders cascading from a customer deletion have nobody left to update
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model is Customer:
+        return
+    Customer.objects.refresh_order_stats([instance.customer_id])
+
+
+@receiver(post_save, sender=Order)
+def publish_created_order(sender, instance, created, raw=False, **kwargs):
+    """Announce a new order to ``orderCreated`` subscribers once it commits."""
+    if created and not raw:
+        publish_orders_created([instance])
+
+
+@receiver(post_save, sender=Product)
+def publish_product_stock(sender, instance, created, raw=False, **kwargs):
+    """Announce a new product or a changed stock level to ``productStockChanged``."""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_stock', None)
+    if created or previous != instance.stock:
+        publish_stock_changes([(instance, previous)])
+    instance._loaded_stock = instance.stock
+
+
+@receiver(post_migrate)
+def ensure_search_indexes(sender, using='default', **kwargs):
+    """Restore search indexes or triggers lost when a migration rebuilt a table."""
+    if sender.name != 'crm':
+        return
+    connection = connections[using]
+    if SEARCH_MIGRATION in MigrationRecorder(connection).applied_migrations():
+        get_search_backend(using).install(connection)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def invalidate_cached_responses(sender, raw=False, **kwargs):
+    """Drop cached GraphQL responses that read the changed model."""
+    if not raw:
+        invalidate(sender)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_cached_order_products(sender, action, **kwargs):
+    """Drop cached responses reading either side of a changed order/product link."""
+    if action.startswith('post_'):
+        invalidate(Order, Product)
+
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def record_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone so incremental syncs learn about the delete."""
+    Tombstone.objects.record([instance])
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def touch_orders_on_products_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump ``updated_at`` of orders whose product set changed."""
+    if action == 'pre_clear' and reverse:
+        # product.orders.clear() does not say which orders it unlinked
+        instance._cleared_order_ids = list(instance.orders.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        order_ids = [instance.pk]
+    elif action == 'post_clear':
+        order_ids = instance.__dict__.pop('_cleared_order_ids', [])
+    else:
+        order_ids = pk_set
+    Order.objects.filter(pk__in=order_ids).update(updated_at=timezone.now())
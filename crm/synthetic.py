@@ -0,0 +1,214 @@
+"""
+Deterministic synthetic CRM data at realistic scale.
+
+``generate`` fills the database with customers, products and orders drawn
+from a ``random.Random(seed)``, so the same seed and ``end`` always produce
+the same rows. The distributions follow what real shops see rather than
+uniform noise:
+
+* Customers place orders with Zipf-like weights (``customer_skew``), so a
+  small share of customers accounts for most orders and many have none.
+* Product popularity is skewed the same way (``product_skew``); prices are
+  log-normal and some stock is below ``LOW_STOCK_THRESHOLD``.
+* Basket sizes are geometric: mostly one to three products, rarely more.
+* Order dates spread over ``days`` before ``end``, denser towards ``end``.
+
+Rows are written with ``bulk_create``, ``batch_size`` per transaction, so
+signals do not fire: customer aggregates are rebuilt set-based afterwards
+and cached responses invalidated, as for the other bulk write paths.
+``created_at`` is the insertion time, as ``auto_now_add`` overrides it.
+On backends that cannot return IDs from a bulk insert (MySQL, MariaDB
+before 10.5) the new IDs are read back, assuming no one else inserts into
+the same tables meanwhile.
+"""
+import math
+import random
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ORDER_STATS_BATCH_SIZE, Customer, Order, Product
+from .response_cache import invalidate
+
+# Rows inserted per transaction
+GENERATE_BATCH_SIZE = 5000
+
+FIRST_NAMES = [
+    'Alice', 'Bob', 'Carol', 'David', 'Emma', 'Farid', 'Grace', 'Hiro', 'Ines', 'James',
+    'Kwame', 'Laura', 'Mei', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq',
+    'Uma', 'Victor', 'Wanjiru', 'Xavier', 'Yara', 'Zoe',
+]
+LAST_NAMES = [
+    'Johnson', 'Smith', 'White', 'Brown', 'Mwangi', 'Garcia', 'Kim', 'Okafor', 'Silva',
+    'Novak', 'Tanaka', 'Muller', 'Rossi', 'Haddad', 'Patel', 'Nguyen', 'Kowalski', 'Otieno',
+]
+DOMAINS = ['example.com', 'example.org', 'example.net']
+ADJECTIVES = [
+    'Compact', 'Wireless', 'Ergonomic', 'Portable', 'Premium', 'Smart', 'Classic', 'Rugged',
+    'Silent', 'Ultra',
+]
+NOUNS = [
+    'Laptop', 'Mouse', 'Keyboard', 'Monitor', 'Webcam', 'Headset', 'Charger', 'Speaker',
+    'Router', 'Tablet', 'Dock', 'Microphone', 'Lamp', 'Chair', 'Desk',
+]
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights of ranks ``1..count`` proportional to ``rank ** -skew``."""
+    return list(accumulate(rank ** -skew for rank in range(1, count + 1)))
+
+
+class SyntheticData:
+    """Draws synthetic rows from one seeded random stream."""
+
+    def __init__(self, seed=0, days=365, end=None, customer_skew=1.1, product_skew=0.8):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.end = end or timezone.now()
+        self.customer_skew = customer_skew
+        self.product_skew = product_skew
+
+    def customer(self, idx):
+        rng = self.rng
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        # Emails stay unique through the row index
+        email = f"{first.lower()}.{last.lower()}{idx}@{rng.choice(DOMAINS)}"
+        kind = rng.random()
+        if kind < 0.4:
+            phone = f"+{rng.randrange(10 ** 10, 10 ** 12)}"
+        elif kind < 0.7:
+            area, exchange, line = (
+                rng.randrange(200, 1000), rng.randrange(100, 1000), rng.randrange(10 ** 4)
+            )
+            phone = f"{area}-{exchange}-{line:04d}"
+        else:
+            phone = None
+        return Customer(name=f"{first} {last}", email=email, phone=phone)
+
+    def product(self, idx):
+        rng = self.rng
+        price = min(Decimal(math.exp(rng.gauss(3.5, 1.0))), Decimal('5000'))
+        price = max(price.quantize(Decimal('0.01')), Decimal('0.50'))
+        # About one product in ten is running low
+        stock = rng.randrange(10) if rng.random() < 0.1 else 10 + int(rng.expovariate(1 / 60))
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {idx}"
+        return Product(name=name, price=price, stock=stock)
+
+    def basket_size(self, limit):
+        return min(1 + int(self.rng.expovariate(0.8)), limit)
+
+    def order_date(self):
+        # Business grows over the period, so recent days see more orders
+        age = self.days * (1 - math.sqrt(self.rng.random()))
+        return self.end - timedelta(days=age)
+
+    def orders(self, count, customer_pks, products):
+        """
+        Yield ``(order, product_pks)`` for ``count`` orders of ``customer_pks``
+        and ``products`` (``(pk, price)`` pairs, most popular first).
+        """
+        rng = self.rng
+        customer_weights = zipf_weights(len(customer_pks), self.customer_skew)
+        product_weights = zipf_weights(len(products), self.product_skew)
+        # Popularity is not ordered by primary key
+        customer_pks = list(customer_pks)
+        rng.shuffle(customer_pks)
+        for _ in range(count):
+            customer_pk = rng.choices(customer_pks, cum_weights=customer_weights)[0]
+            size = self.basket_size(len(products))
+            basket = {}
+            while len(basket) < size:
+                pk, price = rng.choices(products, cum_weights=product_weights)[0]
+                basket[pk] = price
+            order = Order(
+                customer_id=customer_pk,
+                total_amount=sum(basket.values()),
+                order_date=self.order_date(),
+            )
+            yield order, list(basket)
+
+
+def bulk_insert(model, objects):
+    """``bulk_create`` ``objects`` and return them with their primary keys set."""
+    connection = connections[router.db_for_write(model)]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects)
+    # Auto-increment IDs are assigned in insert order, past the current maximum
+    last_pk = model.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+    model.objects.bulk_create(objects)
+    pks = (
+        model.objects.filter(pk__gt=last_pk).order_by('pk')
+        .values_list('pk', flat=True)[:len(objects)]
+    )
+    for obj, pk in zip(objects, pks):
+        obj.pk = pk
+    return objects
+
+
+def insert_batches(rows, batch_size, insert):
+    """Call ``insert`` with ``batch_size`` rows at a time, each in a transaction."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            with transaction.atomic():
+                insert(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            insert(batch)
+
+
+def generate(customers, products, orders, seed=0, days=365, end=None,
+             batch_size=GENERATE_BATCH_SIZE, log=None):
+    """
+    Insert ``customers``, ``products`` and ``orders`` synthetic rows drawn
+    from ``seed``; returns the counts. ``log`` is called with progress lines.
+    """
+    data = SyntheticData(seed, days, end)
+    log = log or (lambda message: None)
+    customer_pks, product_rows = [], []
+
+    def insert_customers(batch):
+        customer_pks.extend(obj.pk for obj in bulk_insert(Customer, batch))
+        log(f"{len(customer_pks)} customers")
+
+    def insert_products(batch):
+        created = bulk_insert(Product, batch)
+        product_rows.extend((obj.pk, obj.price) for obj in created)
+        log(f"{len(product_rows)} products")
+
+    inserted = 0
+
+    def insert_orders(batch):
+        nonlocal inserted
+        created = bulk_insert(Order, [order for order, _ in batch])
+        OrderProduct = Order.products.through
+        OrderProduct.objects.bulk_create([
+            OrderProduct(order_id=order.pk, product_id=product_pk)
+            for order, (_, product_pks) in zip(created, batch)
+            for product_pk in product_pks
+        ])
+        inserted += len(created)
+        log(f"{inserted} orders")
+
+    insert_batches((data.customer(idx) for idx in range(customers)), batch_size,
+                   insert_customers)
+    insert_batches((data.product(idx) for idx in range(products)), batch_size,
+                   insert_products)
+    if orders and customer_pks and product_rows:
+        insert_batches(data.orders(orders, customer_pks, product_rows), batch_size,
+                       insert_orders)
+
+        # Order counts and lifetime values for the customers just created
+        for start in range(0, len(customer_pks), ORDER_STATS_BATCH_SIZE):
+            with transaction.atomic():
+                Customer.objects.refresh_order_stats(
+                    customer_pks[start:start + ORDER_STATS_BATCH_SIZE]
+                )
+    invalidate(Customer, Product, Order)
+    return {'customers': len(customer_pks), 'products': len(product_rows), 'orders': inserted}
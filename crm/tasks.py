@@ -1,71 +1,33 @@
 """
 Celery tasks for CRM app.
 """
-from datetime import datetime
+from datetime import timedelta
+
 from celery import shared_task
+from django.conf import settings
+from django.core.management import call_command
 from django.utils import timezone
-import requests
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+
+from crm.models import Customer, Order, Tombstone
 
 
 @shared_task
 def generate_crm_report():
     """
-    Generate a weekly CRM report using GraphQL queries.
-    Fetches total customers, total orders, and total revenue.
+    Generate a weekly CRM report.
+    Fetches total customers, total orders, and total revenue with database
+    aggregates (the same ones behind the crmStats query), so the report
+    runs in constant memory at any table size.
     """
-    url = "http://localhost:8000/graphql"
     log_file = '/tmp/crm_report_log.txt'
     timestamp = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Create GraphQL client
-    transport = RequestsHTTPTransport(url=url)
-    client = Client(transport=transport, fetch_schema_from_transport=False)
-    
+
     try:
-        # Query for total customers
-        customers_query = gql("""
-            query {
-                allCustomers {
-                    id
-                }
-            }
-        """)
-        
-        # Query for total orders and revenue
-        orders_query = gql("""
-            query {
-                allOrders {
-                    edges {
-                        node {
-                            id
-                            totalAmount
-                        }
-                    }
-                }
-            }
-        """)
-        
-        # Execute queries
-        customers_result = client.execute(customers_query)
-        orders_result = client.execute(orders_query)
-        
-        # Count customers
-        customers = customers_result.get('allCustomers', [])
-        total_customers = len(customers)
-        
-        # Count orders and calculate revenue
-        orders_edges = orders_result.get('allOrders', {}).get('edges', [])
-        total_orders = len(orders_edges)
-        
-        # Calculate total revenue
-        total_revenue = sum(
-            float(edge['node']['totalAmount']) 
-            for edge in orders_edges 
-            if edge.get('node', {}).get('totalAmount')
-        )
-        
+        total_customers = Customer.objects.customer_counts()['customers']
+        order_stats = Order.objects.stats()
+        total_orders = order_stats['orders']
+        total_revenue = order_stats['revenue']
+
         # Format revenue
         revenue_str = f"{total_revenue:.2f}"
         
@@ -77,7 +39,8 @@ def generate_crm_report():
         return {
             'customers': total_customers,
             'orders': total_orders,
-            'revenue': total_revenue
+            # Decimal as a string keeps cents exact through the result backend
+            'revenue': revenue_str
         }
         
     except Exception as e:
@@ -86,3 +49,22 @@ def generate_crm_report():
         with open(log_file, 'a') as f:
             f.write(error_message)
         raise
+
+
+@shared_task
+def clean_inactive_customers(days=365):
+    """
+    Delete customers with no orders in the last ``days`` days, in bounded
+    batches (see the clean_inactive_customers management command).
+    """
+    call_command('clean_inactive_customers', days=days)
+
+
+@shared_task
+def prune_tombstones(days=None):
+    """
+    Delete change feed tombstones older than ``days`` (default
+    ``CRM_TOMBSTONE_RETENTION_DAYS``); syncs must run more often than that.
+    """
+    days = days or getattr(settings, 'CRM_TOMBSTONE_RETENTION_DAYS', 90)
+    return Tombstone.objects.prune(timezone.now() - timedelta(days=days))
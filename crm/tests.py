@@ -1,9 +1,21 @@
 """
 Tests for CRM app.
 """
+import asyncio
+import json
 import pytest
-from django.test import TestCase
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from decimal import Decimal
+from alx_backend_graphql.schema import schema
+from .filters import CustomerFilter, OrderFilter, ProductFilter
 from .models import Customer, Product, Order
 
 
@@ -81,3 +93,2243 @@ class OrderModelTest(TestCase):
         self.assertEqual(order.calculate_total(), Decimal("80.00"))
 
 
+class OrderLoaderTest(TestCase):
+    """Test DataLoader batching of order relations."""
+
+    ORDERS_QUERY = """
+        query {
+            allOrders {
+                edges {
+                    node {
+                        customer { email }
+                        products { edges { node { name } } }
+                    }
+                }
+            }
+        }
+    """
+
+    def create_orders(self, count):
+        """Create ``count`` orders, each with its own customer and two products."""
+        start = Customer.objects.count()
+        for idx in range(start, start + count):
+            customer = Customer.objects.create(
+                name=f"Customer {idx}",
+                email=f"customer{idx}@example.com"
+            )
+            products = [
+                Product.objects.create(name=f"Product {idx}-{n}", price=Decimal("5.00"))
+                for n in range(2)
+            ]
+            order = Order.objects.create(customer=customer, total_amount=Decimal("10.00"))
+            order.products.set(products)
+
+    def execute(self, query):
+        """Execute ``query`` with a fresh request as the GraphQL context."""
+        context = RequestFactory().post('/graphql')
+        result = schema.execute(query, context_value=context)
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_query_count_is_bounded(self):
+        """Test that the query count does not grow with the page size."""
+        self.create_orders(3)
+        with self.assertNumQueries(2):
+            data = self.execute(self.ORDERS_QUERY)
+        self.assertEqual(len(data['allOrders']['edges']), 3)
+
+        self.create_orders(20)
+        with self.assertNumQueries(2):
+            data = self.execute(self.ORDERS_QUERY)
+        self.assertEqual(len(data['allOrders']['edges']), 23)
+
+    def test_resolved_relations(self):
+        """Test that batched relations match the per-row relations."""
+        self.create_orders(5)
+        data = self.execute(self.ORDERS_QUERY)
+        for edge, order in zip(data['allOrders']['edges'], Order.objects.all()):
+            node = edge['node']
+            self.assertEqual(node['customer']['email'], order.customer.email)
+            self.assertEqual(
+                [product['node']['name'] for product in node['products']['edges']],
+                [product.name for product in order.products.all()]
+            )
+
+    def test_nested_customer_orders(self):
+        """Test that reverse relations are batched across a page of customers."""
+        self.create_orders(10)
+        query = """
+            query {
+                allCustomersFiltered {
+                    edges { node { email orders { edges { node { totalAmount } } } } }
+                }
+            }
+        """
+        with self.assertNumQueries(2):
+            data = self.execute(query)
+        for edge in data['allCustomersFiltered']['edges']:
+            self.assertEqual(len(edge['node']['orders']['edges']), 1)
+
+
+class QueryOptimizerTest(TestCase):
+    """Test selection-set aware queryset optimization."""
+
+    def setUp(self):
+        customer = Customer.objects.create(
+            name="Test Customer",
+            email="optimizer@example.com",
+            phone="+1234567890"
+        )
+        product = Product.objects.create(name="Widget", price=Decimal("9.99"), stock=3)
+        order = Order.objects.create(customer=customer, total_amount=Decimal("9.99"))
+        order.products.add(product)
+
+    def capture(self, query):
+        """Execute ``query`` and return the SQL it issued."""
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(query, context_value=RequestFactory().post('/graphql'))
+        self.assertIsNone(result.errors)
+        return [q['sql'] for q in queries.captured_queries]
+
+    def test_only_requested_columns(self):
+        """Test that unrequested columns are not selected."""
+        page_sql, = self.capture(
+            "{ allCustomersFiltered { edges { node { email } } } }"
+        )
+        self.assertIn('"customers"."email"', page_sql)
+        self.assertNotIn('"customers"."phone"', page_sql)
+        self.assertNotIn('"customers"."name"', page_sql)
+
+    def test_forward_relation_is_joined(self):
+        """Test that a requested customer is fetched with select_related."""
+        page_sql, = self.capture(
+            "{ allOrders { edges { node { totalAmount customer { name } } } } }"
+        )
+        self.assertIn('INNER JOIN "customers"', page_sql)
+        self.assertIn('"customers"."name"', page_sql)
+        self.assertNotIn('"customers"."email"', page_sql)
+
+    def test_to_many_relation_is_prefetched_with_fragments(self):
+        """Test that fragments are followed into prefetched relations."""
+        queries = self.capture("""
+            query {
+                allProducts { edges { node { ...ProductFields } } }
+            }
+            fragment ProductFields on ProductNode {
+                name
+                orders { edges { node { totalAmount } } }
+            }
+        """)
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"orders"."total_amount"', queries[1])
+        self.assertNotIn('"orders"."order_date"', queries[1].split('FROM')[0])
+
+
+class BulkCreateCustomersTest(TestCase):
+    """Test the set-based BulkCreateCustomers mutation."""
+
+    MUTATION = """
+        mutation BulkCreate($input: [BulkCustomerInput]!) {
+            bulkCreateCustomers(input: $input) {
+                customers { email }
+                errors
+            }
+        }
+    """
+
+    def execute(self, rows):
+        """Run the mutation for ``rows`` and return its payload."""
+        result = schema.execute(
+            self.MUTATION,
+            variable_values={'input': rows},
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        return result.data['bulkCreateCustomers']
+
+    def test_partial_success_errors(self):
+        """Test per-row errors for DB, in-payload and phone collisions."""
+        Customer.objects.create(name="Existing", email="taken@example.com")
+        payload = self.execute([
+            {'name': 'A', 'email': 'a@example.com', 'phone': '+1234567890'},
+            {'name': 'B', 'email': 'taken@example.com'},
+            {'name': 'C', 'email': 'a@example.com'},
+            {'name': 'D', 'email': 'd@example.com', 'phone': 'not-a-phone'},
+            {'name': 'E', 'email': 'e@example.com', 'phone': '123-456-7890'},
+        ])
+        self.assertEqual(
+            [customer['email'] for customer in payload['customers']],
+            ['a@example.com', 'e@example.com']
+        )
+        self.assertEqual(payload['errors'], [
+            "Row 2: Email 'taken@example.com' already exists",
+            "Row 3: Email 'a@example.com' already exists",
+            "Row 4: Invalid phone format for 'not-a-phone'",
+        ])
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_query_count_is_constant(self):
+        """Test that the row count does not change the number of queries."""
+        rows = [
+            {'name': f'Customer {idx}', 'email': f'bulk{idx}@example.com'}
+            for idx in range(100)
+        ]
+        # One uniqueness probe plus a savepoint-wrapped INSERT
+        with self.assertNumQueries(4):
+            payload = self.execute(rows)
+        self.assertEqual(len(payload['customers']), 100)
+        self.assertEqual(payload['errors'], [])
+
+
+class UpdateLowStockProductsTest(TestCase):
+    """Test the single-statement UpdateLowStockProducts mutation."""
+
+    def setUp(self):
+        for name, stock in [("Low", 2), ("Edge", 9), ("Stocked", 15), ("Empty", 0)]:
+            Product.objects.create(name=name, price=Decimal("1.50"), stock=stock)
+
+    def execute(self, arguments=""):
+        """Run the mutation and return its payload."""
+        result = schema.execute(
+            "mutation { updateLowStockProducts%s { updatedProducts { name stock price } message } }"
+            % arguments,
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        return result.data['updateLowStockProducts']
+
+    def stock_levels(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_default_restock(self):
+        """Test that products below 10 are restocked by 10 in one statement."""
+        with self.assertNumQueries(1):
+            payload = self.execute()
+        self.assertEqual(payload['message'], "Successfully updated 3 low-stock products")
+        self.assertEqual(
+            sorted((p['name'], p['stock'], p['price']) for p in payload['updatedProducts']),
+            [("Edge", 19, "1.50"), ("Empty", 10, "1.50"), ("Low", 12, "1.50")]
+        )
+        self.assertEqual(
+            self.stock_levels(),
+            {"Low": 12, "Edge": 19, "Stocked": 15, "Empty": 10}
+        )
+
+    def test_threshold_increment_and_batches(self):
+        """Test custom arguments with batches smaller than the match set."""
+        payload = self.execute("(threshold: 20, increment: 5, batchSize: 2)")
+        self.assertEqual(len(payload['updatedProducts']), 4)
+        self.assertEqual(
+            self.stock_levels(),
+            {"Low": 7, "Edge": 14, "Stocked": 20, "Empty": 5}
+        )
+
+    def test_other_backends_select_then_update(self):
+        """Test that backends without UPDATE ... RETURNING lock, update and re-read."""
+        from unittest import mock
+
+        with mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch.object(connection.features, 'can_return_columns_from_insert', True), \
+                CaptureQueriesContext(connection) as queries:
+            products = Product.objects.restock(threshold=10, increment=10, batch_size=2)
+        self.assertFalse(any('RETURNING' in query['sql'] for query in queries))
+        self.assertEqual([product.stock for product in products], [12, 19, 10])
+        self.assertEqual(
+            self.stock_levels(),
+            {"Low": 12, "Edge": 19, "Stocked": 15, "Empty": 10}
+        )
+
+    def test_rejects_non_positive_increment(self):
+        """Test that a non-positive increment is rejected."""
+        result = schema.execute(
+            "mutation { updateLowStockProducts(increment: 0) { message } }",
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIn("Increment must be positive", str(result.errors))
+        self.assertEqual(self.stock_levels()["Low"], 2)
+
+
+class CreateOrderTest(TestCase):
+    """Test the batched CreateOrder mutation."""
+
+    MUTATION = """
+        mutation CreateOrder($input: OrderInput!) {
+            createOrder(input: $input) {
+                order { totalAmount products { edges { node { name } } } }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Buyer", email="buyer@example.com")
+        self.products = [
+            Product.objects.create(name=f"Item {idx}", price=Decimal("2.50"))
+            for idx in range(5)
+        ]
+
+    def execute(self, product_ids):
+        return schema.execute(
+            self.MUTATION,
+            variable_values={'input': {
+                'customerId': str(self.customer.pk),
+                'productIds': product_ids,
+            }},
+            context_value=RequestFactory().post('/graphql')
+        )
+
+    def test_query_count_independent_of_basket_size(self):
+        """Test that products are resolved and linked in constant queries."""
+        for basket in (self.products[:1], self.products):
+            # customer, products, savepoint, order insert, through insert,
+            # customer stats update, release
+            with self.assertNumQueries(7):
+                result = schema.execute(
+                    "mutation($input: OrderInput!) { createOrder(input: $input) { __typename } }",
+                    variable_values={'input': {
+                        'customerId': str(self.customer.pk),
+                        'productIds': [str(product.pk) for product in basket],
+                    }}
+                )
+            self.assertIsNone(result.errors)
+            order = Order.objects.first()
+            self.assertEqual(order.products.count(), len(basket))
+            self.assertEqual(order.total_amount, Decimal("2.50") * len(basket))
+
+    def test_missing_products_reported_together(self):
+        """Test that every missing product ID is reported in one error."""
+        result = self.execute([str(self.products[0].pk), "9998", "9999", "abc"])
+        self.assertEqual(
+            result.errors[0].message,
+            "Products with IDs '9998', '9999', 'abc' do not exist"
+        )
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_order_response(self):
+        """Test the order returned to the client."""
+        result = self.execute([str(product.pk) for product in self.products[:2]])
+        self.assertIsNone(result.errors)
+        order = result.data['createOrder']['order']
+        self.assertEqual(order['totalAmount'], "5.00")
+        self.assertEqual(len(order['products']['edges']), 2)
+
+
+class BulkCreateOrdersTest(TestCase):
+    """Test the BulkCreateOrders mutation."""
+
+    MUTATION = """
+        mutation BulkCreateOrders($input: [OrderInput]!) {
+            bulkCreateOrders(input: $input) {
+                orders { totalAmount customer { email } products { edges { node { name } } } }
+                errors
+            }
+        }
+    """
+
+    def setUp(self):
+        self.customers = [
+            Customer.objects.create(name=f"Buyer {idx}", email=f"buyer{idx}@example.com")
+            for idx in range(3)
+        ]
+        self.products = [
+            Product.objects.create(name=f"Item {idx}", price=Decimal(f"{idx + 1}.25"))
+            for idx in range(4)
+        ]
+
+    def execute(self, rows):
+        result = schema.execute(
+            self.MUTATION,
+            variable_values={'input': rows},
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        return result.data['bulkCreateOrders']
+
+    def row(self, customer, *products):
+        return {
+            'customerId': str(customer.pk),
+            'productIds': [str(product.pk) for product in products],
+        }
+
+    def test_partial_success_errors(self):
+        """Test totals and per-row errors for invalid references."""
+        payload = self.execute([
+            self.row(self.customers[0], self.products[0], self.products[1]),
+            {'customerId': '9999', 'productIds': [str(self.products[0].pk)]},
+            {'customerId': str(self.customers[1].pk), 'productIds': ['9999']},
+            {'customerId': str(self.customers[1].pk), 'productIds': []},
+            self.row(self.customers[2], self.products[3]),
+        ])
+        self.assertEqual(payload['errors'], [
+            "Row 2: Customer with ID '9999' does not exist",
+            "Row 3: Product with ID '9999' does not exist",
+            "Row 4: At least one product must be selected",
+        ])
+        self.assertEqual(
+            [(order['totalAmount'], order['customer']['email']) for order in payload['orders']],
+            [("3.50", "buyer0@example.com"), ("4.25", "buyer2@example.com")]
+        )
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Order.products.through.objects.count(), 3)
+
+    def test_query_count_independent_of_row_count(self):
+        """Test that the number of queries does not grow with the payload."""
+        for count in (2, 40):
+            rows = [
+                self.row(self.customers[idx % 3], *self.products[:idx % 4 + 1])
+                for idx in range(count)
+            ]
+            # customers, products, savepoint, orders, through rows, customer
+            # stats, release, plus one batched query each for response
+            # customers and products
+            with self.assertNumQueries(9):
+                payload = self.execute(rows)
+            self.assertEqual(len(payload['orders']), count)
+            self.assertEqual(payload['errors'], [])
+
+
+class CustomerOrderStatsTest(TestCase):
+    """Test the denormalized customer order aggregates."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Stats", email="stats@example.com")
+        self.other = Customer.objects.create(name="Other", email="other@example.com")
+        self.product = Product.objects.create(name="Thing", price=Decimal("4.00"))
+
+    def create_order(self, customer, amount, days_ago=0):
+        return Order.objects.create(
+            customer=customer,
+            total_amount=Decimal(amount),
+            order_date=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def assertStats(self, customer, order_count, lifetime_value, last_order_at):
+        customer.refresh_from_db()
+        self.assertEqual(customer.order_count, order_count)
+        self.assertEqual(customer.lifetime_value, Decimal(lifetime_value))
+        self.assertEqual(customer.last_order_at, last_order_at)
+
+    def test_created_and_deleted_orders(self):
+        """Test that saves and deletes keep the aggregates current."""
+        newest = self.create_order(self.customer, "10.50", days_ago=1)
+        oldest = self.create_order(self.customer, "2.25", days_ago=30)
+        self.assertStats(self.customer, 2, "12.75", newest.order_date)
+
+        newest.delete()
+        self.assertStats(self.customer, 1, "2.25", oldest.order_date)
+
+    def test_reassigned_order(self):
+        """Test that moving an order refreshes both customers."""
+        order = self.create_order(self.customer, "5.00")
+        order = Order.objects.get(pk=order.pk)
+        order.customer = self.other
+        order.save()
+        self.assertStats(self.customer, 0, "0.00", None)
+        self.assertStats(self.other, 1, "5.00", order.order_date)
+
+    def test_bulk_create_orders(self):
+        """Test that the bulk mutation updates the aggregates."""
+        product_ids = [str(self.product.pk)]
+        result = schema.execute(
+            """mutation($input: [OrderInput]!) { bulkCreateOrders(input: $input) { errors } }""",
+            variable_values={'input': [
+                {'customerId': str(self.customer.pk), 'productIds': product_ids},
+                {'customerId': str(self.customer.pk), 'productIds': product_ids * 2},
+                {'customerId': str(self.other.pk), 'productIds': product_ids},
+            ]},
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).order_count, 2)
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).lifetime_value, Decimal("12.00"))
+        self.assertEqual(Customer.objects.get(pk=self.other.pk).order_count, 1)
+
+    def test_check_and_rebuild_commands(self):
+        """Test drift detection and the rebuild command."""
+        order = self.create_order(self.customer, "7.00")
+        Customer.objects.filter(pk=self.customer.pk).update(order_count=0, lifetime_value=0)
+
+        with self.assertRaises(CommandError):
+            call_command('check_customer_stats', stdout=StringIO())
+
+        call_command('rebuild_customer_stats', '--batch-size', '1', stdout=StringIO())
+        self.assertStats(self.customer, 1, "7.00", order.order_date)
+        out = StringIO()
+        call_command('check_customer_stats', stdout=out)
+        self.assertIn("consistent", out.getvalue())
+
+
+class FilterIndexPlanTest(TestCase):
+    """Query-plan regression tests for the indexes behind crm/filters.py."""
+
+    # (filterset, filter data, keep default ordering, expected index)
+    PLANS = [
+        (OrderFilter, {'order_date_gte': '2024-01-01T00:00:00Z'}, True, 'orders_date_idx'),
+        (OrderFilter, {'total_amount': '10'}, True, 'orders_total_idx'),
+        (OrderFilter, {'total_amount_gte': '10'}, False, 'orders_total_idx'),
+        (OrderFilter, {'customer': None}, True, 'orders_customer_date_idx'),
+        (OrderFilter, {'product_id': '1'}, True, 'orders_products_product_id'),
+        (ProductFilter, {'stock': '3'}, True, 'products_stock_idx'),
+        (ProductFilter, {'stock_lte': '3'}, False, 'products_stock_idx'),
+        (ProductFilter, {'low_stock': 'true'}, True, 'products_low_stock_idx'),
+        (ProductFilter, {'price': '10'}, True, 'products_price_idx'),
+        (ProductFilter, {'price_gte': '10'}, False, 'products_price_idx'),
+        (CustomerFilter, {'created_at_gte': '2024-01-01T00:00:00Z'}, True, 'customers_created_idx'),
+        (CustomerFilter, {}, True, 'customers_created_idx'),
+    ]
+
+    # LIKE 'x%' can only use an index with PostgreSQL's pattern opclass
+    POSTGRESQL_PLANS = [
+        (CustomerFilter, {'phone_pattern': '+1'}, False, 'customers_phone_idx'),
+    ]
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Plan", email="plan@example.com")
+        if connection.vendor == 'postgresql':
+            # Tiny test tables always favour a sequential scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def test_filters_use_indexes(self):
+        """Test that every filter is served by its index."""
+        plans = list(self.PLANS)
+        if connection.vendor == 'postgresql':
+            plans += self.POSTGRESQL_PLANS
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f"No plan expectations for {connection.vendor}")
+
+        for filterset_class, data, ordered, index in plans:
+            if 'customer' in data:
+                data = {'customer': str(self.customer.pk)}
+            model = filterset_class._meta.model
+            with self.subTest(filter=filterset_class.__name__, data=data):
+                filterset = filterset_class(data=data, queryset=model.objects.all())
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                queryset = filterset.qs if ordered else filterset.qs.order_by()
+                self.assertIn(index, queryset.explain())
+
+
+class SearchBackendTest(TestCase):
+    """Test the indexed substring search behind the name and email filters."""
+
+    def setUp(self):
+        self.alice = Customer.objects.create(name="Alice Smith", email="alice@example.com")
+        self.bob = Customer.objects.create(name="Bob Alison", email="bob@sample.org")
+        self.carol = Customer.objects.create(name="Carol", email="carol@example.com")
+        self.laptop = Product.objects.create(name="Laptop Pro", price=Decimal('999.99'))
+        self.mouse = Product.objects.create(name="Wireless Mouse", price=Decimal('19.99'))
+        self.order = Order.objects.create(customer=self.alice, total_amount=Decimal("999.99"))
+        self.order.products.add(self.laptop)
+
+    def filter_pks(self, filterset_class, data):
+        model = filterset_class._meta.model
+        filterset = filterset_class(data=data, queryset=model.objects.all())
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return [obj.pk for obj in filterset.qs]
+
+    def test_filters_match_icontains(self):
+        """Test that indexed filters return the same rows as icontains."""
+        cases = [
+            (CustomerFilter, {'name_icontains': 'ALI'}, Q(name__icontains='ALI')),
+            (CustomerFilter, {'name': 'al'}, Q(name__icontains='al')),
+            (CustomerFilter, {'email_icontains': 'example'}, Q(email__icontains='example')),
+            (CustomerFilter, {'email': '100%'}, Q(email__icontains='100%')),
+            (ProductFilter, {'name_icontains': 'pro'}, Q(name__icontains='pro')),
+            (OrderFilter, {'customer_name': 'smith'}, Q(customer__name__icontains='smith')),
+            (OrderFilter, {'product_name': 'LAPTOP'}, Q(products__name__icontains='LAPTOP')),
+            (OrderFilter, {'product_name': 'mouse'}, Q(products__name__icontains='mouse')),
+        ]
+        for filterset_class, data, expected in cases:
+            model = filterset_class._meta.model
+            with self.subTest(filter=filterset_class.__name__, data=data):
+                self.assertEqual(
+                    self.filter_pks(filterset_class, data),
+                    list(model.objects.filter(expected).values_list('pk', flat=True)),
+                )
+
+    def test_index_tracks_writes(self):
+        """Test that the search index follows updates, deletes and bulk inserts."""
+        self.carol.name = "Caroline Ng"
+        self.carol.save()
+        self.bob.delete()
+        Customer.objects.bulk_create([Customer(name="Ngozi", email="ngozi@example.com")])
+
+        pks = self.filter_pks(CustomerFilter, {'name_icontains': 'ng'})
+        self.assertEqual(
+            pks, list(Customer.objects.filter(name__icontains='ng').values_list('pk', flat=True))
+        )
+        self.assertEqual(len(pks), 2)
+        self.assertEqual(self.filter_pks(CustomerFilter, {'name_icontains': 'alison'}), [])
+
+    def test_search_ranks_best_match_first(self):
+        """Test that the search filter orders rows by relevance."""
+        Customer.objects.create(name="Ali", email="ali@ali.com")
+        pks = self.filter_pks(CustomerFilter, {'search': 'ali'})
+        self.assertEqual(
+            set(pks),
+            set(Customer.objects.filter(
+                Q(name__icontains='ali') | Q(email__icontains='ali')
+            ).values_list('pk', flat=True)),
+        )
+        self.assertEqual(Customer.objects.get(pk=pks[0]).name, "Ali")
+
+    def test_filter_uses_search_index(self):
+        """Test that the icontains filters are answered from the search index."""
+        if connection.vendor != 'sqlite':
+            self.skipTest(f"No plan expectations for {connection.vendor}")
+        filterset = CustomerFilter(
+            data={'name_icontains': 'alice'}, queryset=Customer.objects.all()
+        )
+        self.assertIn('customers_fts VIRTUAL TABLE INDEX', filterset.qs.explain())
+
+
+class KeysetPaginationTest(TestCase):
+    """Test keyset cursors on the top-level connections."""
+
+    QUERY = """
+        query Page($first: Int, $after: String, $last: Int, $before: String) {
+            allOrders(first: $first, after: $after, last: $last, before: $before) {
+                edges { cursor node { totalAmount } }
+                pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Keyset", email="keyset@example.com")
+        # Pairs of orders share an order_date so the id must break ties
+        now = timezone.now()
+        self.orders = [
+            Order.objects.create(
+                customer=self.customer,
+                total_amount=Decimal(idx),
+                order_date=now - timedelta(days=idx // 2),
+            )
+            for idx in range(7)
+        ]
+
+    def page(self, **variables):
+        result = schema.execute(
+            self.QUERY, variable_values=variables,
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        return result.data['allOrders']
+
+    def amounts(self, page):
+        return [Decimal(edge['node']['totalAmount']) for edge in page['edges']]
+
+    def test_negative_page_sizes_are_rejected(self):
+        """Test that negative first/last fail with a clear error instead of a slicing error."""
+        for name in ('first', 'last'):
+            with self.subTest(argument=name):
+                result = schema.execute(
+                    self.QUERY, variable_values={name: -3},
+                    context_value=RequestFactory().post('/graphql')
+                )
+                self.assertEqual(
+                    [error.message for error in result.errors],
+                    [f'Argument "{name}" must be a non-negative integer'],
+                )
+
+    def test_forward_pages_cover_default_ordering(self):
+        """Test that first/after walks every row once, in Meta.ordering order."""
+        seen = []
+        after = None
+        while True:
+            page = self.page(first=3, after=after)
+            seen += self.amounts(page)
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        self.assertEqual(seen, [order.total_amount for order in Order.objects.all()])
+
+    def test_backward_pages(self):
+        """Test that last/before pages mirror the forward pages."""
+        expected = [order.total_amount for order in Order.objects.all()]
+        page = self.page(last=3)
+        self.assertEqual(self.amounts(page), expected[-3:])
+        self.assertTrue(page['pageInfo']['hasPreviousPage'])
+        page = self.page(last=3, before=page['pageInfo']['startCursor'])
+        self.assertEqual(self.amounts(page), expected[-6:-3])
+
+    def test_insert_ahead_does_not_shift_page(self):
+        """Test that rows inserted before the cursor do not repeat rows."""
+        first = self.page(first=3)
+        Order.objects.create(customer=self.customer, total_amount=Decimal('99'))
+        second = self.page(first=3, after=first['pageInfo']['endCursor'])
+        expected = [order.total_amount for order in Order.objects.all()]
+        self.assertEqual(self.amounts(second), expected[4:7])
+
+    def test_page_query_has_no_offset(self):
+        """Test that a deep page is a range condition rather than an OFFSET."""
+        first = self.page(first=2)
+        with CaptureQueriesContext(connection) as queries:
+            self.page(first=2, after=first['pageInfo']['endCursor'])
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT', sql.upper())
+
+    def test_page_uses_ordering_index(self):
+        """Test that the next page is read straight from the ordering index."""
+        if connection.vendor != 'sqlite':
+            self.skipTest(f"No plan expectations for {connection.vendor}")
+        from .pagination import keyset_filter, keyset_ordering, order_by
+
+        queryset = Order.objects.all()
+        keys = keyset_ordering(queryset)
+        self.assertEqual(keys, [('order_date', True), ('id', True)])
+        last = self.orders[3]
+        plan = queryset.filter(
+            keyset_filter(keys, [last.order_date, last.pk], True)
+        ).order_by(*order_by(keys))[:3].explain()
+        self.assertIn('orders_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is reported as an error."""
+        result = schema.execute(
+            self.QUERY, variable_values={'first': 2, 'after': 'bogus'},
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIn('Invalid cursor', str(result.errors[0]))
+
+    def test_search_ordering_is_paginated(self):
+        """Test that ranked search results page by rank."""
+        for idx in range(4):
+            Customer.objects.create(name=f"Alice {'x' * idx}", email=f"a{idx}@example.com")
+        query = """
+            query Page($after: String) {
+                allCustomersFiltered(search: "alice", first: 2, after: $after) {
+                    edges { node { email } }
+                    pageInfo { hasNextPage endCursor }
+                }
+            }
+        """
+        emails = []
+        after = None
+        while True:
+            result = schema.execute(
+                query, variable_values={'after': after},
+                context_value=RequestFactory().post('/graphql')
+            )
+            self.assertIsNone(result.errors)
+            page = result.data['allCustomersFiltered']
+            emails += [edge['node']['email'] for edge in page['edges']]
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        self.assertEqual(len(emails), 4)
+        self.assertEqual(len(set(emails)), 4)
+
+
+class CRMStatsTest(TestCase):
+    """Test the aggregate crmStats query and the report task."""
+
+    QUERY = """
+        query Stats($start: DateTime, $end: DateTime) {
+            crmStats(start: $start, end: $end) {
+                customers newCustomers orders revenue averageOrderValue activeCustomers
+                weeks { weekStart orders revenue activeCustomers }
+            }
+        }
+    """
+
+    def setUp(self):
+        # Monday noon, so the orders below fall in two known weeks
+        self.monday = timezone.now().replace(
+            hour=12, minute=0, second=0, microsecond=0
+        ) - timedelta(days=timezone.now().weekday() + 14)
+        self.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        Customer.objects.create(name="Carol", email="carol@example.com")
+        for customer, amount, days in [
+            (self.alice, '10.10', 0), (self.alice, '20.20', 1),
+            (self.bob, '0.30', 2), (self.bob, '100.00', 8),
+        ]:
+            Order.objects.create(
+                customer=customer, total_amount=Decimal(amount),
+                order_date=self.monday + timedelta(days=days)
+            )
+
+    def execute(self, **variables):
+        result = schema.execute(
+            self.QUERY, variable_values=variables,
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        return result.data['crmStats']
+
+    def test_totals(self):
+        """Test that totals are exact decimal aggregates."""
+        with self.assertNumQueries(3):
+            stats = self.execute()
+        self.assertEqual(stats['customers'], 3)
+        self.assertEqual(stats['orders'], 4)
+        self.assertEqual(Decimal(stats['revenue']), Decimal('130.60'))
+        self.assertEqual(Decimal(stats['averageOrderValue']), Decimal('32.65'))
+        self.assertEqual(stats['activeCustomers'], 2)
+
+    def test_weekly_breakdown(self):
+        """Test that orders are grouped per calendar week."""
+        weeks = self.execute()['weeks']
+        self.assertEqual([week['orders'] for week in weeks], [3, 1])
+        self.assertEqual(
+            [Decimal(week['revenue']) for week in weeks], [Decimal('30.60'), Decimal('100.00')]
+        )
+        self.assertEqual([week['activeCustomers'] for week in weeks], [2, 1])
+
+    def test_date_range(self):
+        """Test that start is inclusive and end is exclusive."""
+        stats = self.execute(
+            start=(self.monday + timedelta(days=1)).isoformat(),
+            end=(self.monday + timedelta(days=8)).isoformat(),
+        )
+        self.assertEqual(stats['orders'], 2)
+        self.assertEqual(Decimal(stats['revenue']), Decimal('20.50'))
+        # Every customer joined after the range ended
+        self.assertEqual(stats['customers'], 0)
+        self.assertEqual(stats['newCustomers'], 0)
+
+        stats = self.execute(start=self.monday.isoformat())
+        self.assertEqual(stats['orders'], 4)
+        self.assertEqual(stats['newCustomers'], 3)
+
+    def test_invalid_range(self):
+        """Test that an empty range is rejected."""
+        result = schema.execute(
+            self.QUERY,
+            variable_values={'start': self.monday.isoformat(), 'end': self.monday.isoformat()},
+            context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIn('Start must be before end', str(result.errors[0]))
+
+    def test_report_task_uses_aggregates(self):
+        """Test that the report task computes its totals in the database."""
+        from .tasks import generate_crm_report
+
+        with self.assertNumQueries(2):
+            report = generate_crm_report()
+        self.assertEqual(report, {'customers': 3, 'orders': 4, 'revenue': '130.60'})
+
+
+class GraphQLExecutorTest(TestCase):
+    """Test the executors used by cron jobs and Celery tasks."""
+
+    def test_local_executor_runs_in_process(self):
+        """Test that documents run against the schema without HTTP."""
+        from .executors import LocalExecutor
+
+        data = LocalExecutor().execute(
+            "query Stats($end: DateTime) { hello crmStats(end: $end) { orders } }",
+            {'end': timezone.now().isoformat()},
+        )
+        self.assertEqual(data, {'hello': "Hello, GraphQL!", 'crmStats': {'orders': 0}})
+
+    def test_errors_raise(self):
+        """Test that GraphQL errors surface as GraphQLExecutionError."""
+        from .executors import GraphQLExecutionError, execute
+
+        with self.assertRaisesMessage(GraphQLExecutionError, "Cannot query field 'nope'"):
+            execute("{ nope }", mode='local')
+
+    def test_update_low_stock_cron(self):
+        """Test that the low-stock cron job runs the mutation in-process."""
+        from .cron import update_low_stock
+
+        product = Product.objects.create(name="Cron Widget", price=Decimal("1.00"), stock=2)
+        update_low_stock()
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 12)
+
+    def test_http_executor_reuses_session(self):
+        """Test that remote execution posts JSON over one pooled session."""
+        from unittest import mock
+        from .executors import HTTPExecutor
+
+        executor = HTTPExecutor('http://crm.test/graphql', retries=2, persisted=False)
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'data': {'hello': 'hi'}}
+        with mock.patch.object(executor.session, 'post', return_value=response) as post:
+            self.assertEqual(executor.execute("{ hello }"), {'hello': 'hi'})
+            self.assertEqual(executor.execute("{ hello }"), {'hello': 'hi'})
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(
+            post.call_args.kwargs['json'], {'query': "{ hello }", 'variables': {}}
+        )
+        adapter = executor.session.get_adapter('http://crm.test/graphql')
+        self.assertEqual(adapter.max_retries.connect, 2)
+        self.assertEqual(adapter.max_retries.status, 0)
+
+    def test_http_executor_sends_hash_first(self):
+        """Test that the query text is only sent when the hash is unknown."""
+        from unittest import mock
+        from .executors import HTTPExecutor
+
+        executor = HTTPExecutor('http://crm.test/graphql')
+        not_found = mock.Mock(status_code=200)
+        not_found.json.return_value = {'errors': [{'message': 'PersistedQueryNotFound'}]}
+        found = mock.Mock(status_code=200)
+        found.json.return_value = {'data': {'hello': 'hi'}}
+        with mock.patch.object(
+            executor.session, 'post', side_effect=[not_found, found, found]
+        ) as post:
+            executor.execute("{ hello }")
+            executor.execute("{ hello }")
+        bodies = [call.kwargs['json'] for call in post.call_args_list]
+        self.assertEqual([body['query'] for body in bodies], [None, "{ hello }", None])
+
+
+class OrderReminderPipelineTest(TestCase):
+    """Test the chunked order-reminder pipeline."""
+
+    def setUp(self):
+        import tempfile
+
+        from crm.cron_jobs import send_order_reminders
+
+        self.module = send_order_reminders
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_file = f"{self.tmp.name}/reminders.log"
+        self.watermark_file = f"{self.tmp.name}/watermark.json"
+        self.customers = [
+            Customer.objects.create(name=f"Reminder {idx}", email=f"remind{idx}@example.com")
+            for idx in range(3)
+        ]
+        self.addCleanup(self.tmp.cleanup)
+
+    def create_orders(self, count):
+        return [
+            Order.objects.create(
+                customer=self.customers[idx % 3], total_amount=Decimal("1.00")
+            )
+            for idx in range(count)
+        ]
+
+    def run_pipeline(self, chunk_size=2):
+        return self.module.send_order_reminders(
+            chunk_size=chunk_size, log_file=self.log_file, watermark_file=self.watermark_file
+        )
+
+    def reminder_lines(self):
+        with open(self.log_file) as f:
+            return [line for line in f if 'Order ID:' in line]
+
+    def test_reminds_each_customer_once_across_chunks(self):
+        """Test that pages are walked in chunks and customers are deduplicated."""
+        orders = self.create_orders(7)
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.run_pipeline(chunk_size=2)
+        self.assertEqual(stats['orders'], 7)
+        self.assertEqual(stats['reminders'], 3)
+        self.assertEqual(len(self.reminder_lines()), 3)
+        self.assertEqual(stats['last_order_id'], max(order.pk for order in orders))
+        # Four pages of at most two orders, each joined to its customers
+        self.assertEqual(len(queries), 4)
+
+    def test_watermark_skips_processed_orders(self):
+        """Test that a re-run only processes orders newer than the watermark."""
+        self.create_orders(3)
+        self.run_pipeline()
+        self.assertEqual(self.run_pipeline()['orders'], 0)
+
+        new_order, = self.create_orders(1)
+        stats = self.run_pipeline()
+        self.assertEqual(stats['orders'], 1)
+        self.assertEqual(self.module.read_watermark(self.watermark_file), new_order.pk)
+        self.assertEqual(len(self.reminder_lines()), 4)
+
+
+class CleanInactiveCustomersTest(TestCase):
+    """Test the batched inactive-customer cleanup command."""
+
+    def setUp(self):
+        import tempfile
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        old = timezone.now() - timedelta(days=400)
+        self.never = [
+            Customer.objects.create(name=f"Never {idx}", email=f"never{idx}@example.com")
+            for idx in range(3)
+        ]
+        self.stale = Customer.objects.create(name="Stale", email="stale@example.com")
+        stale_order = Order.objects.create(
+            customer=self.stale, total_amount=Decimal("5.00"), order_date=old
+        )
+        stale_order.products.add(Product.objects.create(name="Old", price=Decimal("5.00")))
+        self.active = Customer.objects.create(name="Active", email="active@example.com")
+        Order.objects.create(customer=self.active, total_amount=Decimal("5.00"))
+        # Old orders do not make a customer with recent orders inactive
+        Order.objects.create(customer=self.active, total_amount=Decimal("5.00"), order_date=old)
+
+    def call(self, *args):
+        out = StringIO()
+        call_command(
+            'clean_inactive_customers', *args,
+            f"--log-file={self.tmp.name}/cleanup.log", stdout=out
+        )
+        return out.getvalue()
+
+    def test_inactive_is_an_anti_join(self):
+        """Test that candidates are selected with a single NOT EXISTS query."""
+        since = timezone.now() - timedelta(days=365)
+        queryset = Customer.objects.inactive(since)
+        self.assertIn('NOT EXISTS', str(queryset.query))
+        self.assertEqual(
+            set(queryset.values_list('pk', flat=True)),
+            {customer.pk for customer in self.never} | {self.stale.pk},
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        """Test that --dry-run only reports the candidate count."""
+        output = self.call('--dry-run')
+        self.assertIn("Would delete 4 inactive customers", output)
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_deletes_in_batches(self):
+        """Test that stale customers and their orders are deleted batch by batch."""
+        with CaptureQueriesContext(connection) as queries:
+            output = self.call('--batch-size=2')
+        self.assertIn("Deleted 4 inactive customers and 1 orders", output)
+        self.assertEqual(list(Customer.objects.values_list('pk', flat=True)), [self.active.pk])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(Order.products.through.objects.exists())
+        # Two batches, each committed in its own transaction
+        self.assertEqual(
+            sum(1 for query in queries.captured_queries if 'SAVEPOINT' in query['sql']
+                and 'RELEASE' in query['sql']),
+            2,
+        )
+        with open(f"{self.tmp.name}/cleanup.log") as f:
+            self.assertIn("Deleted 4 inactive customers", f.read())
+
+
+class PersistedQueryViewTest(TestCase):
+    """Test automatic persisted queries on the GraphQL endpoint."""
+
+    QUERY = "query Hello { hello }"
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .persisted_queries import get_document_cache
+
+        cache.clear()
+        self.documents = get_document_cache()
+        self.documents.clear()
+
+    def extensions(self, query):
+        from .persisted_queries import query_hash
+
+        return {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}}
+
+    def post(self, body):
+        return self.client.post(
+            '/graphql', body, content_type='application/json', HTTP_HOST='localhost'
+        )
+
+    def get(self, params):
+        return self.client.get(
+            '/graphql', params, HTTP_HOST='localhost', HTTP_ACCEPT='application/json'
+        )
+
+    def test_hash_only_get_after_registration(self):
+        """Test that a registered hash can be executed over GET without the query."""
+        response = self.get({'extensions': json.dumps(self.extensions(self.QUERY))})
+        self.assertEqual(response.json()['errors'][0]['message'], "PersistedQueryNotFound")
+
+        response = self.post({'query': self.QUERY, 'extensions': self.extensions(self.QUERY)})
+        self.assertEqual(response.json()["data"], {"hello": "Hello, GraphQL!"})
+
+        response = self.get({'extensions': json.dumps(self.extensions(self.QUERY))})
+        self.assertEqual(response.json()["data"], {"hello": "Hello, GraphQL!"})
+
+    def test_hash_mismatch_is_rejected(self):
+        """Test that a query cannot be registered under another query's hash."""
+        response = self.post({'query': "{ hello }", 'extensions': self.extensions(self.QUERY)})
+        self.assertIn("does not match", response.json()['errors'][0]['message'])
+
+    def test_mutation_by_hash_requires_post(self):
+        """Test that persisted mutations are not executed over GET."""
+        mutation = "mutation { updateLowStockProducts { message } }"
+        self.post({'query': mutation, 'extensions': self.extensions(mutation)})
+        response = self.get({'extensions': json.dumps(self.extensions(mutation))})
+        self.assertEqual(response.status_code, 405)
+
+    def test_documents_are_parsed_once(self):
+        """Test that repeated documents are served from the document cache."""
+        for _ in range(3):
+            self.assertEqual(
+                self.post({'query': self.QUERY}).json()['data'], {'hello': "Hello, GraphQL!"}
+            )
+        stats = self.documents.stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_invalid_documents_report_errors(self):
+        """Test that cached validation errors are still returned."""
+        for _ in range(2):
+            response = self.post({'query': "{ nope }"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Cannot query field 'nope'", response.json()['errors'][0]['message'])
+
+    def test_stats_require_staff(self):
+        """Test that cache metrics are not public outside DEBUG."""
+        response = self.client.get('/graphql/stats', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(CRM_RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTest(TestCase):
+    """Test the opt-in response cache and its signal invalidation."""
+
+    PRODUCTS = "query { allProducts(first: 10) { edges { node { name stock } } } }"
+    ORDERS = """
+        query Orders($first: Int) {
+            allOrders(first: $first) {
+                edges { node { totalAmount products { edges { node { name } } } } }
+            }
+        }
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.product = Product.objects.create(name="Cached", price=Decimal("2.00"), stock=1)
+        self.customer = Customer.objects.create(name="Cache", email="cache@example.com")
+
+    def post(self, query, variables=None):
+        response = self.client.post(
+            '/graphql', {'query': query, 'variables': variables or {}},
+            content_type='application/json', HTTP_HOST='localhost'
+        )
+        return response.json()
+
+    def assertCache(self, payload, status):
+        self.assertEqual(payload.get('extensions', {}).get('responseCache'), status)
+
+    def test_identical_queries_hit(self):
+        """Test that a repeated query is answered without touching the database."""
+        self.assertCache(self.post(self.PRODUCTS), 'MISS')
+        with self.assertNumQueries(0):
+            payload = self.post(self.PRODUCTS)
+        self.assertCache(payload, 'HIT')
+        self.assertEqual(payload['data']['allProducts']['edges'][0]['node']['name'], "Cached")
+
+    def test_variables_are_part_of_the_key(self):
+        """Test that different variables are cached separately."""
+        self.assertCache(self.post(self.ORDERS, {'first': 1}), 'MISS')
+        self.assertCache(self.post(self.ORDERS, {'first': 2}), 'MISS')
+        self.assertCache(self.post(self.ORDERS, {'first': 1}), 'HIT')
+
+    def test_save_and_delete_invalidate(self):
+        """Test that post_save and post_delete drop responses reading the model."""
+        self.post(self.PRODUCTS)
+        self.product.stock = 5
+        self.product.save()
+        payload = self.post(self.PRODUCTS)
+        self.assertCache(payload, 'MISS')
+        self.assertEqual(payload['data']['allProducts']['edges'][0]['node']['stock'], 5)
+
+        # Unrelated models leave the response cached
+        Customer.objects.create(name="Other", email="other@example.com")
+        self.assertCache(self.post(self.PRODUCTS), 'HIT')
+
+        self.product.delete()
+        self.assertEqual(self.post(self.PRODUCTS)['data']['allProducts']['edges'], [])
+
+    def test_m2m_and_bulk_paths_invalidate(self):
+        """Test that product links and signal-less bulk writes invalidate."""
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal("2.00"))
+        self.post(self.ORDERS, {'first': 5})
+        order.products.add(self.product)
+        payload = self.post(self.ORDERS, {'first': 5})
+        self.assertCache(payload, 'MISS')
+        node = payload['data']['allOrders']['edges'][0]['node']
+        self.assertEqual(len(node['products']['edges']), 1)
+
+        self.post(self.PRODUCTS)
+        Product.objects.restock(threshold=10, increment=10)
+        self.assertCache(self.post(self.PRODUCTS), 'MISS')
+
+    def test_mutations_and_uncacheable_fields_bypass(self):
+        """Test that only allow-listed query root fields are cached."""
+        mutation = "mutation { updateLowStockProducts { message } }"
+        self.assertNotIn('responseCache', self.post(mutation)['extensions'])
+        self.assertNotIn('responseCache', self.post(mutation)['extensions'])
+
+    def test_ttl_is_shortest_of_models_read(self):
+        """Test that per-type TTLs apply to the models a query reads."""
+        from alx_backend_graphql.schema import schema as project_schema
+        from graphql import get_operation_ast, parse
+        from .response_cache import get_response_cache
+
+        response_cache = get_response_cache(project_schema)
+        document = parse(self.ORDERS)
+        labels = response_cache.dependencies(document, get_operation_ast(document))
+        self.assertEqual(labels, {'crm.Order', 'crm.Customer', 'crm.Product'})
+        self.assertEqual(response_cache.ttl(labels), 30)
+        document = parse(self.PRODUCTS)
+        self.assertEqual(
+            response_cache.ttl(response_cache.dependencies(document, get_operation_ast(document))),
+            300,
+        )
+
+
+class QueryComplexityTest(TestCase):
+    """Test depth and cost limits on GraphQL operations."""
+
+    ORDERS = """
+        query Orders($first: Int) {
+            allOrders(first: $first) { edges { node { customer { name } } } }
+        }
+    """
+    NESTED = """
+        query {
+            allOrders(first: 100) { edges { node {
+                customer { orders { edges { node {
+                    products { edges { node { name } } }
+                } } } }
+            } } }
+        }
+    """
+
+    def post(self, query, variables=None):
+        return self.client.post(
+            '/graphql', {'query': query, 'variables': variables or {}},
+            content_type='application/json', HTTP_HOST='localhost'
+        )
+
+    def cost(self, query, variables=None):
+        from graphql import parse
+        from .complexity import CostAnalyzer
+
+        document = parse(query)
+        analyzer = CostAnalyzer(schema.graphql_schema, document, variables)
+        return analyzer.operation_cost(document.definitions[0])
+
+    def test_cost_follows_page_sizes(self):
+        """Test that connection sizes multiply the cost of their edges."""
+        # 1 connection + 10 edges x (edge, node, customer)
+        self.assertEqual(self.cost(self.ORDERS, {'first': 10}), 31)
+        self.assertEqual(self.cost(self.ORDERS, {'first': 1}), 4)
+        # Omitted page sizes assume the relay maximum
+        self.assertEqual(self.cost(self.ORDERS), 301)
+        self.assertEqual(self.cost("{ allCustomers { name } }"), 100)
+        self.assertEqual(self.cost("{ hello }"), 0)
+
+    def test_fragments_are_counted(self):
+        """Test that fragment spreads cost the same as inline selections."""
+        query = """
+            query { allOrders(first: 10) { edges { node { ...OrderFields } } } }
+            fragment OrderFields on OrderNode { customer { name } }
+        """
+        self.assertEqual(self.cost(query), 31)
+
+    def test_cost_is_reported(self):
+        """Test that the estimated cost is returned in the response extensions."""
+        Order.objects.create(
+            customer=Customer.objects.create(name="Cost", email="cost@example.com"),
+            total_amount=Decimal("1.00"),
+        )
+        for first, cost in ((10, 31), (2, 7)):
+            payload = self.post(self.ORDERS, {'first': first}).json()
+            self.assertNotIn('errors', payload)
+            self.assertEqual(payload['extensions']['cost'], {'requested': cost, 'maximum': 10000})
+
+    def test_expensive_queries_are_rejected(self):
+        """Test that over-budget operations fail before touching the database."""
+        with self.assertNumQueries(0):
+            response = self.post(self.NESTED)
+        self.assertEqual(response.status_code, 400)
+        payload = response.json()
+        self.assertNotIn('data', payload)
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'QUERY_TOO_COMPLEX')
+        self.assertGreater(payload['extensions']['cost']['requested'], 10000)
+
+    def test_documented_queries_are_accepted(self):
+        """Test that the README examples and unpaginated nested queries stay within limits."""
+        import re
+        from pathlib import Path
+        from graphql import parse, specified_rules, validate
+        from .complexity import complexity_rules
+
+        readme = (Path(__file__).resolve().parent.parent / 'README.md').read_text()
+        queries = re.findall(r"```graphql\n(.*?)```", readme, re.S)
+        queries.append(
+            "{ allOrders { edges { node { customer { email } "
+            "products { edges { node { name } } } } } } }"
+        )
+        self.assertGreater(len(queries), 5)
+        for query in queries:
+            with self.subTest(query=query):
+                errors = validate(
+                    schema.graphql_schema, parse(query), (*specified_rules, *complexity_rules())
+                )
+                self.assertEqual(errors, [])
+        # Nested connections without first/last count as a handful of rows
+        self.assertEqual(self.cost(queries[-1]), 2401)
+        self.assertEqual(self.post(queries[-1]).status_code, 200)
+
+    @override_settings(CRM_QUERY_MAX_COST=20)
+    def test_budget_applies_per_request(self):
+        """Test that the same cached document is priced with each request's variables."""
+        self.assertEqual(self.post(self.ORDERS, {'first': 5}).status_code, 200)
+        self.assertEqual(self.post(self.ORDERS, {'first': 50}).status_code, 400)
+
+    def test_depth_limit(self):
+        """Test that deeply nested operations are rejected."""
+        query = """
+            query { allOrders(first: 1) { edges { node {
+                customer { orders(first: 1) { edges { node {
+                    products(first: 1) { edges { node {
+                        orders(first: 1) { edges { node { id } } }
+                    } } }
+                } } } }
+            } } } }
+        """
+        response = self.post(query)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('exceeds maximum operation depth', response.json()['errors'][0]['message'])
+
+
+@override_settings(CRM_TRACING_SAMPLE_RATE=1.0, CRM_TRACING_EXTENSIONS=True)
+class TracingTest(TestCase):
+    """Test sampled resolver and SQL tracing."""
+
+    QUERY = "query Orders { allOrders(first: 5) { edges { node { customer { name } } } } }"
+
+    def setUp(self):
+        customer = Customer.objects.create(name="Traced", email="traced@example.com")
+        for _ in range(3):
+            Order.objects.create(customer=customer, total_amount=Decimal("1.00"))
+
+    def post(self, query):
+        with self.assertLogs('crm.tracing') as logs:
+            payload = self.client.post(
+                '/graphql', {'query': query}, content_type='application/json',
+                HTTP_HOST='localhost'
+            ).json()
+        return payload, logs
+
+    def test_resolvers_are_timed(self):
+        """Test that the response carries Apollo tracing for every resolver."""
+        payload, _ = self.post(self.QUERY)
+        tracing = payload['extensions']['tracing']
+        self.assertEqual(tracing['version'], 1)
+        resolvers = {tuple(r['path']): r for r in tracing['execution']['resolvers']}
+        self.assertIn(('allOrders',), resolvers)
+        self.assertIn(('allOrders', 'edges', 2, 'node', 'customer', 'name'), resolvers)
+        customer = resolvers[('allOrders', 'edges', 0, 'node', 'customer')]
+        self.assertEqual(customer['parentType'], 'OrderNode')
+        self.assertGreaterEqual(customer['startOffset'], 0)
+        self.assertLessEqual(customer['duration'], tracing['duration'])
+
+    def test_sql_is_attributed_to_fields(self):
+        """Test that SQL queries are counted per field and logged as JSON."""
+        payload, logs = self.post(self.QUERY)
+        sql = payload['extensions']['sql']
+        self.assertEqual(sql['count'], 1)
+        self.assertEqual(sql['byField'], {'allOrders': 1})
+        self.assertEqual(sql['duplicates'], [])
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['operation'], 'Orders')
+        self.assertEqual(record['sql_count'], 1)
+        self.assertEqual(record['cost'], payload['extensions']['cost']['requested'])
+
+    def test_duplicate_queries_are_flagged(self):
+        """Test that repeated SQL is reported with the fields that ran it."""
+        from .tracing import RequestTrace
+
+        trace = RequestTrace()
+        for field in ('allCustomers', 'allCustomers', 'hello'):
+            trace.field = field
+            trace.execute_wrapper(lambda *args: None, 'SELECT 1', (), False, {})
+        trace.finish()
+        self.assertEqual(
+            trace.duplicates(),
+            [{'sql': 'SELECT 1', 'count': 3, 'fields': ['allCustomers', 'hello']}],
+        )
+        with self.assertLogs('crm.tracing', 'WARNING'):
+            trace.log('Duplicated')
+
+    @override_settings(CRM_TRACING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_traced(self):
+        """Test that requests outside the sample carry no trace."""
+        payload = self.client.post(
+            '/graphql', {'query': self.QUERY}, content_type='application/json',
+            HTTP_HOST='localhost'
+        ).json()
+        self.assertNotIn('tracing', payload['extensions'])
+
+
+class AsyncGraphQLViewTest(TestCase):
+    """Test the async GraphQL view and schema."""
+
+    QUERY = """
+        query {
+            hello
+            crmStats { customers orders revenue weeks { orders } }
+            allCustomers { name }
+            allOrders(first: 5) {
+                edges { node {
+                    totalAmount
+                    customer { name orders { edges { node { totalAmount } } } }
+                    products { edges { node { name } } }
+                } }
+            }
+        }
+    """
+
+    def setUp(self):
+        customer = Customer.objects.create(name="Async", email="async@example.com")
+        product = Product.objects.create(name="Async Product", price=Decimal("4.00"), stock=2)
+        order = Order.objects.create(customer=customer, total_amount=Decimal("4.00"))
+        order.products.add(product)
+
+    async def post(self, query, path='/graphql/async'):
+        response = await self.async_client.post(
+            path, {'query': query}, content_type='application/json', HTTP_HOST='localhost'
+        )
+        return response.json()
+
+    def test_schemas_match(self):
+        """Test that the async schema exposes the same API as the sync one."""
+        from alx_backend_graphql.schema import async_schema
+
+        self.assertEqual(str(async_schema), str(schema))
+
+    async def test_same_results_as_sync_view(self):
+        """Test that async resolvers, threaded resolvers and loaders agree with the sync view."""
+        payload = await self.post(self.QUERY)
+        self.assertNotIn('errors', payload)
+        self.assertEqual(payload, await self.post(self.QUERY, path='/graphql'))
+        self.assertEqual(payload['data']['crmStats']['revenue'], '4.00')
+        node = payload['data']['allOrders']['edges'][0]['node']
+        self.assertEqual(node['products']['edges'][0]['node']['name'], "Async Product")
+
+    async def test_async_mutations(self):
+        """Test the mutations using the async ORM and their validation."""
+        payload = await self.post("""
+            mutation {
+                createCustomer(name: "New", email: "new@example.com", phone: "+1234567890") {
+                    customer { email }
+                }
+                createProduct(input: {name: "Gadget", price: "3.50", stock: 4}) {
+                    product { name stock }
+                }
+                updateLowStockProducts { message }
+            }
+        """)
+        self.assertNotIn('errors', payload)
+        self.assertEqual(
+            payload['data']['createProduct']['product'], {'name': "Gadget", 'stock': 4}
+        )
+        self.assertTrue(await Customer.objects.filter(email="new@example.com").aexists())
+
+        payload = await self.post(
+            'mutation { createProduct(input: {name: "Bad", price: "-1"}) { product { name } } }'
+        )
+        self.assertEqual(payload['errors'][0]['message'], "Price must be positive")
+
+    async def test_limits_apply(self):
+        """Test that cost limits are enforced before async execution."""
+        response = await self.async_client.post(
+            '/graphql/async', {'query': QueryComplexityTest.NESTED},
+            content_type='application/json', HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_COMPLEX'
+        )
+
+
+class BatchQueryTest(TestCase):
+    """Test batches of operations sent as a JSON array."""
+
+    ORDERS = "query Orders { allOrders(first: 5) { edges { node { customer { name } } } } }"
+
+    def setUp(self):
+        customer = Customer.objects.create(name="Batch", email="batch@example.com")
+        product = Product.objects.create(name="Batched", price=Decimal("1.00"), stock=1)
+        for _ in range(3):
+            Order.objects.create(customer=customer, total_amount=Decimal("1.00")).products.add(
+                product
+            )
+
+    def post(self, body, path='/graphql'):
+        return self.client.post(
+            path, json.dumps(body), content_type='application/json', HTTP_HOST='localhost'
+        )
+
+    def test_results_in_order(self):
+        """Test that each operation gets its own result, in request order."""
+        response = self.post([
+            {'id': 'a', 'query': "{ hello }"},
+            {'id': 'b', 'query': "query { allProducts { edges { node { name } } } }"},
+            {'id': 'c', 'query': "{ missingField }"},
+        ])
+        payload = response.json()
+        self.assertEqual([result['id'] for result in payload], ['a', 'b', 'c'])
+        self.assertEqual(payload[0]['data'], {'hello': "Hello, GraphQL!"})
+        self.assertEqual(
+            payload[1]['data']['allProducts']['edges'], [{'node': {'name': "Batched"}}]
+        )
+        self.assertIn('errors', payload[2])
+        self.assertEqual([result['status'] for result in payload], [200, 200, 400])
+
+    def test_operations_share_loaders(self):
+        """Test that the operations of a batch share one set of loaders."""
+        from unittest import mock
+        from . import loaders
+
+        with mock.patch.object(
+            loaders, 'LoaderRegistry', wraps=loaders.LoaderRegistry
+        ) as registry:
+            payload = self.post([{'query': self.ORDERS}, {'query': self.ORDERS}]).json()
+        self.assertEqual(registry.call_count, 1)
+        self.assertEqual(payload[0]['data'], payload[1]['data'])
+        self.assertEqual(len(payload[0]['data']['allOrders']['edges']), 3)
+
+    def test_mutations_run_in_order(self):
+        """Test that queries after a mutation see its writes."""
+        payload = self.post([
+            {'query': 'mutation { createProduct(input: {name: "Later", price: "2"}) '
+                      '{ product { name } } }'},
+            {'query': "{ allProducts { edges { node { name } } } }"},
+        ]).json()
+        names = [edge['node']['name'] for edge in payload[1]['data']['allProducts']['edges']]
+        self.assertIn("Later", names)
+
+    def test_reads_after_write_are_fresh(self):
+        """Test that loaders do not serve rows cached before a mutation wrote them."""
+        customer = Customer.objects.create(name="Fresh", email="fresh@example.com")
+        product = Product.objects.create(name="Fresh", price=Decimal("5.00"), stock=5)
+        mutation = {
+            'query': 'mutation($input: [OrderInput]!) { bulkCreateOrders(input: $input) '
+                     '{ orders { customer { orderCount lifetimeValue } } } }',
+            'variables': {'input': [
+                {'customerId': str(customer.pk), 'productIds': [str(product.pk)]}
+            ]},
+        }
+        query = {'query': f'{{ allOrders(first: 10, customerName: "Fresh") '
+                          f'{{ edges {{ node {{ customer {{ orderCount }} }} }} }} }}'}
+        for path in ['/graphql', '/graphql/async']:
+            with self.subTest(path=path):
+                Order.objects.filter(customer=customer).delete()
+                Customer.objects.refresh_order_stats([customer.pk])
+                payload = self.post([query, mutation, mutation, query], path).json()
+                stats = [
+                    payload[idx]['data']['bulkCreateOrders']['orders'][0]['customer']
+                    for idx in (1, 2)
+                ]
+                self.assertEqual(stats, [
+                    {'orderCount': 1, 'lifetimeValue': "5.00"},
+                    {'orderCount': 2, 'lifetimeValue': "10.00"},
+                ])
+                edges = payload[3]['data']['allOrders']['edges']
+                self.assertEqual([edge['node']['customer'] for edge in edges],
+                                 [{'orderCount': 2}] * 2)
+
+    @override_settings(CRM_GRAPHQL_MAX_BATCH_SIZE=2)
+    def test_batch_limits(self):
+        """Test that oversized, empty and malformed batches are rejected."""
+        self.assertEqual(self.post([{'query': "{ hello }"}] * 3).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post(["{ hello }"]).status_code, 400)
+
+    async def test_async_batches(self):
+        """Test that the async view runs batches with the same results."""
+        body = json.dumps([
+            {'query': self.ORDERS},
+            {'query': 'mutation { createCustomer(name: "A", email: "a@example.com", '
+                      'phone: "+1234567890") { customer { name } } }'},
+            {'query': "{ crmStats { customers } }"},
+            {'query': self.ORDERS},
+        ])
+        response = await self.async_client.post(
+            '/graphql/async', body, content_type='application/json', HTTP_HOST='localhost'
+        )
+        payload = response.json()
+        self.assertEqual(len(payload), 4)
+        self.assertEqual(payload[0]['data'], payload[3]['data'])
+        self.assertEqual(payload[1]['data']['createCustomer']['customer'], {'name': "A"})
+        self.assertEqual(payload[2]['data']['crmStats']['customers'], 2)
+
+
+class SubscriptionTest(TestCase):
+    """Test order and stock subscriptions and their websocket transport."""
+
+    ORDER_CREATED = "subscription { orderCreated { totalAmount customer { name } } }"
+
+    def setUp(self):
+        from .pubsub import InProcessBroker
+        from unittest import mock
+
+        self.customer = Customer.objects.create(name="Subscriber", email="sub@example.com")
+        self.product = Product.objects.create(name="Watched", price=Decimal("2.00"), stock=12)
+        self.broker = InProcessBroker()
+        patcher = mock.patch('crm.pubsub._broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self, channel):
+        """Record what ``channel`` receives from writes in the current block."""
+        from unittest import mock
+
+        messages = []
+        original = self.broker.publish
+
+        def record(published_channel, message):
+            if published_channel == channel:
+                messages.append(message)
+            original(published_channel, message)
+
+        return messages, mock.patch.object(self.broker, 'publish', side_effect=record)
+
+    def test_writes_publish_on_commit(self):
+        """Test that created orders and stock changes are published after commit."""
+        from .pubsub import ORDER_CREATED, PRODUCT_STOCK_CHANGED
+
+        orders, patch_orders = self.published(ORDER_CREATED)
+        with patch_orders, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            order = Order.objects.create(customer=self.customer, total_amount=Decimal("2.00"))
+            self.assertEqual(orders, [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(orders, [{'id': order.pk, 'customer_id': self.customer.pk}])
+
+        changes, patch_changes = self.published(PRODUCT_STOCK_CHANGED)
+        with patch_changes, self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(pk=self.product.pk)
+            product.name = "Renamed"
+            product.save()
+            product.stock = 5
+            product.save()
+            Product.objects.restock(threshold=10, increment=10)
+        self.assertEqual(changes, [
+            {'id': self.product.pk, 'stock': 5, 'previous_stock': 12},
+            {'id': self.product.pk, 'stock': 15, 'previous_stock': 5},
+        ])
+
+    def test_http_rejects_subscriptions(self):
+        """Test that subscriptions posted over HTTP are refused."""
+        response = self.client.post(
+            '/graphql', json.dumps({'query': self.ORDER_CREATED}),
+            content_type='application/json', HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("websocket", response.json()['errors'][0]['message'])
+
+    @asynccontextmanager
+    async def connect(self, path='/graphql', init=True):
+        """Open a websocket to the ASGI app, yielding ``(send, receive, accepted)``."""
+        from .websocket import PROTOCOL, websocket_application
+
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'websocket', 'path': path, 'subprotocols': [PROTOCOL]}
+        task = asyncio.create_task(websocket_application(scope, incoming.get, outgoing.put))
+
+        async def send(message):
+            await incoming.put({'type': 'websocket.receive', 'text': json.dumps(message)})
+
+        async def receive():
+            event = await asyncio.wait_for(outgoing.get(), 5)
+            return json.loads(event['text']) if event['type'] == 'websocket.send' else event
+
+        await incoming.put({'type': 'websocket.connect'})
+        try:
+            accepted = await receive()
+            if accepted['type'] == 'websocket.accept' and init:
+                await send({'type': 'connection_init'})
+                self.assertEqual(await receive(), {'type': 'connection_ack'})
+            yield send, receive, accepted
+        finally:
+            await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+            await asyncio.wait_for(task, 5)
+
+    async def subscribed(self, channel, count=1):
+        while self.broker.subscribers(channel) != count:
+            await asyncio.sleep(0.001)
+
+    async def test_order_created_over_websocket(self):
+        """Test that orders are streamed to matching subscribers until completed."""
+        from .pubsub import ORDER_CREATED
+
+        other = await Customer.objects.acreate(name="Other", email="other@example.com")
+        async with self.connect() as (send, receive, accepted):
+            self.assertEqual(accepted['subprotocol'], 'graphql-transport-ws')
+            await send({'id': '1', 'type': 'subscribe', 'payload': {'query': self.ORDER_CREATED}})
+            await send({'id': '2', 'type': 'subscribe', 'payload': {
+                'query': "subscription ($id: ID) { orderCreated(customerId: $id) { id } }",
+                'variables': {'id': str(other.pk)},
+            }})
+            await self.subscribed(ORDER_CREATED, 2)
+
+            order = await Order.objects.acreate(
+                customer=self.customer, total_amount=Decimal("3.50")
+            )
+            message = {'id': order.pk, 'customer_id': self.customer.pk}
+            self.broker.publish(ORDER_CREATED, message)
+            self.assertEqual(await receive(), {'type': 'next', 'id': '1', 'payload': {'data': {
+                'orderCreated': {'totalAmount': '3.50', 'customer': {'name': "Subscriber"}},
+            }}})
+
+            await send({'id': '1', 'type': 'complete'})
+            await self.subscribed(ORDER_CREATED, 1)
+
+    async def test_low_stock_changes(self):
+        """Test that lowStock subscribers only see changes around the threshold."""
+        from .pubsub import PRODUCT_STOCK_CHANGED
+
+        async with self.connect() as (send, receive, _):
+            await send({'id': 'low', 'type': 'subscribe', 'payload': {'query': (
+                "subscription { productStockChanged(lowStock: true) "
+                "{ product { name } previousStock stock } }"
+            )}})
+            await self.subscribed(PRODUCT_STOCK_CHANGED)
+
+            for stock, previous in [(40, 30), (4, 12)]:
+                self.broker.publish(PRODUCT_STOCK_CHANGED, {
+                    'id': self.product.pk, 'stock': stock, 'previous_stock': previous,
+                })
+            message = await receive()
+            self.assertEqual(message['payload']['data']['productStockChanged'], {
+                'product': {'name': "Watched"}, 'previousStock': 12, 'stock': 4,
+            })
+
+    async def test_protocol_errors(self):
+        """Test that invalid operations get errors and protocol violations close."""
+        async with self.connect() as (send, receive, _):
+            await send({'id': 'q', 'type': 'subscribe', 'payload': {'query': "{ hello }"}})
+            message = await receive()
+            self.assertEqual(message['type'], 'error')
+            self.assertIn("Only subscriptions", message['payload'][0]['message'])
+
+            await send({'type': 'connection_init'})
+            self.assertEqual((await receive())['code'], 4429)
+
+        async with self.connect(init=False) as (send, receive, _):
+            await send({'id': '1', 'type': 'subscribe', 'payload': {'query': self.ORDER_CREATED}})
+            self.assertEqual((await receive())['code'], 4401)
+
+        async with self.connect(path='/other') as (_, _, rejected):
+            self.assertEqual(rejected['type'], 'websocket.close')
+
+
+class ChangeFeedTest(TestCase):
+    """Test the *ChangedSince queries and tombstones for incremental syncs."""
+
+    QUERY = """
+        query Changes($since: DateTime!, $after: String) {
+            customersChangedSince(since: $since, first: 2, after: $after) {
+                edges { node { name } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.checkpoint = timezone.now() - timedelta(hours=1)
+        self.customers = [
+            Customer.objects.create(name=f"Feed {idx}", email=f"feed{idx}@example.com")
+            for idx in range(4)
+        ]
+        Customer.objects.update(updated_at=self.checkpoint - timedelta(days=1))
+
+    def execute(self, query, **variables):
+        result = schema.execute(
+            query, variable_values=variables, context_value=RequestFactory().post('/graphql')
+        )
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_pages_changes_oldest_first(self):
+        """Test that only rows written since the checkpoint are paged, in write order."""
+        for offset, customer in zip([3, 1, 2], self.customers[1:]):
+            Customer.objects.filter(pk=customer.pk).update(
+                updated_at=self.checkpoint + timedelta(minutes=offset)
+            )
+
+        names, after = [], None
+        while True:
+            page = self.execute(
+                self.QUERY, since=self.checkpoint.isoformat(), after=after
+            )['customersChangedSince']
+            names += [edge['node']['name'] for edge in page['edges']]
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        self.assertEqual(names, ["Feed 2", "Feed 3", "Feed 1"])
+
+    def test_bulk_writes_bump_updated_at(self):
+        """Test that aggregate updates and product link changes count as changes."""
+        customer = self.customers[0]
+        product = Product.objects.create(name="Feed", price=Decimal("1.00"), stock=1)
+        order = Order.objects.create(customer=customer, total_amount=Decimal("1.00"))
+        Order.objects.filter(pk=order.pk).update(updated_at=self.checkpoint)
+
+        order.products.add(product)
+        customer.refresh_from_db()
+        order.refresh_from_db()
+        self.assertGreater(customer.updated_at, self.checkpoint)
+        self.assertGreater(order.updated_at, self.checkpoint)
+
+        Order.objects.filter(pk=order.pk).update(updated_at=self.checkpoint)
+        product.orders.clear()
+        order.refresh_from_db()
+        self.assertGreater(order.updated_at, self.checkpoint)
+
+    def test_deletes_leave_tombstones(self):
+        """Test that deletes, including cascades, are reported with their node IDs."""
+        from graphene.relay import Node
+
+        customer = self.customers[0]
+        order = Order.objects.create(customer=customer, total_amount=Decimal("1.00"))
+        customer_pk, order_pk = customer.pk, order.pk
+        customer.delete()
+
+        data = self.execute("""
+            query Deleted($since: DateTime!) {
+                all: deletedSince(since: $since) { edges { node { model objectId } } }
+                customers: deletedSince(since: $since, model: CUSTOMER) {
+                    edges { node { deletedId } }
+                }
+            }
+        """, since=self.checkpoint.isoformat())
+        self.assertCountEqual(
+            [edge['node'] for edge in data['all']['edges']],
+            [{'model': 'ORDER', 'objectId': order_pk},
+             {'model': 'CUSTOMER', 'objectId': customer_pk}],
+        )
+        self.assertEqual(
+            data['customers']['edges'],
+            [{'node': {'deletedId': Node.to_global_id('CustomerNode', customer_pk)}}],
+        )
+
+    def test_prune_tombstones(self):
+        """Test that tombstones past the retention period are pruned."""
+        from .models import Tombstone
+        from .tasks import prune_tombstones
+
+        Tombstone.objects.record(self.customers[:2])
+        Tombstone.objects.filter(object_id=self.customers[0].pk).update(
+            deleted_at=timezone.now() - timedelta(days=91)
+        )
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)), [self.customers[1].pk]
+        )
+
+    def test_changes_use_updated_at_indexes(self):
+        """Test that change feed pages are served by the (updated_at, id) indexes."""
+        from .schema import changed_since
+
+        if connection.vendor != 'sqlite':
+            self.skipTest(f"No plan expectations for {connection.vendor}")
+        for model, index in [
+            (Customer, 'customers_updated_idx'),
+            (Product, 'products_updated_idx'),
+            (Order, 'orders_updated_idx'),
+        ]:
+            with self.subTest(model=model.__name__):
+                self.assertIn(index, changed_since(model, self.checkpoint).explain())
+
+
+class OrderExportTest(TestCase):
+    """Test the streaming order export command and endpoint."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.customer = Customer.objects.create(name="Exporter", email="export@example.com")
+        self.widget = Product.objects.create(name="Widget", price=Decimal("2.50"), stock=5)
+        self.gadget = Product.objects.create(name="Widget Pro", price=Decimal("4.00"), stock=5)
+        self.orders = []
+        for idx, products in enumerate([[self.widget], [self.widget, self.gadget], []]):
+            order = Order.objects.create(
+                customer=self.customer,
+                total_amount=sum((product.price for product in products), Decimal("0")),
+                order_date=now - timedelta(days=idx),
+            )
+            order.products.set(products)
+            self.orders.append(order)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_orders', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_ndjson_export(self):
+        """Test that each order is one line with its customer and products."""
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.pk for order in self.orders])
+        self.assertEqual(rows[1]['customer_email'], "export@example.com")
+        self.assertEqual(rows[1]['total_amount'], "6.50")
+        self.assertEqual(
+            [(product['name'], product['price']) for product in rows[1]['products']],
+            [("Widget", "2.50"), ("Widget Pro", "4.00")],
+        )
+        self.assertEqual(rows[2]['products'], [])
+
+    def test_filter_parity_with_all_orders(self):
+        """Test that export filters select the same orders as allOrders."""
+        from graphql_relay import from_global_id
+
+        since = (timezone.now() - timedelta(days=1, hours=1)).isoformat()
+        for filters in [{'orderDateGte': since}, {'productName': 'widget'}, {'totalAmountGte': 3}]:
+            with self.subTest(filters=filters):
+                arguments = ', '.join(
+                    f"{name}: {json.dumps(value)}" for name, value in filters.items()
+                )
+                result = schema.execute(
+                    f"{{ allOrders({arguments}) {{ edges {{ node {{ id }} }} }} }}",
+                    context_value=RequestFactory().post('/graphql'),
+                )
+                self.assertIsNone(result.errors)
+                # The connection repeats orders matched through several
+                # products; the export lists each order once
+                expected = list(dict.fromkeys(
+                    int(from_global_id(edge['node']['id'])[1])
+                    for edge in result.data['allOrders']['edges']
+                ))
+                args = [f"--filter={name}={value}" for name, value in filters.items()]
+                exported = [json.loads(line)['id'] for line in self.export(*args).splitlines()]
+                self.assertEqual(exported, expected)
+
+    def test_batches_fetch_products_once(self):
+        """Test that every batch costs one products query, however many orders it has."""
+        with self.assertNumQueries(3):
+            self.export('--chunk-size=2')
+
+    def test_csv_endpoint(self):
+        """Test that the endpoint streams CSV to staff, with OrderFilter filters."""
+        import csv
+        from django.contrib.auth.models import User
+
+        self.client.force_login(
+            User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        )
+        response = self.client.get(
+            '/export/orders', {'format': 'csv', 'totalAmountGte': '3'}, HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('orders.csv', response['Content-Disposition'])
+        lines = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['product_names'], "Widget;Widget Pro")
+
+    @override_settings(DEBUG=True)
+    async def test_asgi_streams_batch_by_batch(self):
+        """Test that under ASGI each batch is sent before the next one is read."""
+        from unittest import mock
+        from . import export
+
+        fetched = []
+        order_batches = export.order_batches
+
+        def counting_batches(orders, chunk_size):
+            # One order per batch
+            for rows in order_batches(orders, 1):
+                fetched.append(len(rows))
+                yield rows
+
+        with mock.patch.object(export, 'order_batches', counting_batches):
+            response = await self.async_client.get('/export/orders', HTTP_HOST='localhost')
+            self.assertTrue(response.is_async)
+            received = []
+            async for chunk in response.streaming_content:
+                if chunk:
+                    received.append((len(fetched), chunk))
+        self.assertEqual([batches for batches, _ in received], [1, 2, 3])
+        self.assertEqual(
+            [json.loads(chunk)['id'] for _, chunk in received],
+            [order.pk for order in self.orders],
+        )
+
+    def test_invalid_requests(self):
+        """Test that unknown filters and formats are rejected, and only staff may export."""
+        from django.contrib.auth.models import User
+
+        self.assertEqual(
+            self.client.get('/export/orders', HTTP_HOST='localhost').status_code, 403
+        )
+        self.client.force_login(
+            User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        )
+        for params in [{'format': 'xml'}, {'nope': '1'}, {'orderDateGte': 'yesterday'}]:
+            with self.subTest(params=params):
+                response = self.client.get('/export/orders', params, HTTP_HOST='localhost')
+                self.assertEqual(response.status_code, 400)
+        with self.assertRaises(CommandError):
+            self.export('--filter=nope=1')
+
+
+class ImportDataTest(TestCase):
+    """Test the bulk import command."""
+
+    def import_file(self, model, content, suffix='.ndjson', *args):
+        import os
+        import tempfile
+
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.unlink, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_data', model, f.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_customers_upsert_by_email(self):
+        """Test that customers are matched on email and invalid rows are rejected."""
+        Customer.objects.create(name="Old Name", email="alice@example.com")
+        out, err = self.import_file('customers', (
+            "name,email,phone\n"
+            "Alice,alice@example.com,+1234567890\n"
+            "Bob,bob@example.com,\n"
+            "Carol,not-an-email,\n"
+            "Dave,dave@example.com,12-34\n"
+        ), '.csv')
+
+        self.assertIn("Imported 2 of 4 customers rows", out)
+        self.assertIn("Line 4:", err)
+        self.assertIn("Invalid phone format for '12-34'", err)
+        self.assertEqual(Customer.objects.count(), 2)
+        alice = Customer.objects.get(email="alice@example.com")
+        self.assertEqual((alice.name, alice.phone), ("Alice", "+1234567890"))
+
+    def test_products_follow_create_product_rules(self):
+        """Test that product rows are validated like createProduct."""
+        existing = Product.objects.create(name="Widget", price=Decimal("1.00"), stock=1)
+        rows = [
+            {'id': existing.pk, 'name': "Widget", 'price': "2.50", 'stock': 7},
+            {'name': "Gadget", 'price': "4.00"},
+            {'name': "Free", 'price': "0"},
+            {'name': "Short", 'price': "1.00", 'stock': -1},
+        ]
+        out, err = self.import_file(
+            'products', ''.join(json.dumps(row) + '\n' for row in rows) + 'not json\n'
+        )
+
+        self.assertIn("Imported 2 of 5 products rows", out)
+        self.assertIn("Price must be positive", err)
+        self.assertIn("Stock cannot be negative", err)
+        self.assertIn("Line 5: Invalid JSON", err)
+        existing.refresh_from_db()
+        self.assertEqual((existing.price, existing.stock), (Decimal("2.50"), 7))
+        self.assertEqual(Product.objects.get(name="Gadget").stock, 0)
+
+    def test_explicit_ids_mixed_with_new_rows(self):
+        """Test that rows without an ID are inserted after the sequence passes imported IDs."""
+        from unittest import mock
+        from crm.importer import BulkImporter
+
+        existing = Product.objects.create(name="Existing", price=Decimal("1.00"), stock=1)
+        rows = [
+            {'name': "First new", 'price': "1.00"},
+            {'id': existing.pk + 10, 'name': "Imported", 'price': "2.00"},
+            {'name': "Second new", 'price': "1.00"},
+            {'id': existing.pk + 20, 'name': "Imported later", 'price': "2.00"},
+            {'name': "Third new", 'price': "1.00"},
+        ]
+        resets = []
+        reset_sequence = BulkImporter.reset_sequence
+
+        def record_reset(importer):
+            resets.append(sorted(Product.objects.values_list('name', flat=True)))
+            reset_sequence(importer)
+
+        with mock.patch.object(BulkImporter, 'reset_sequence', record_reset):
+            out, err = self.import_file(
+                'products', ''.join(json.dumps(row) + '\n' for row in rows), '.ndjson',
+                '--batch-size=3',
+            )
+
+        self.assertIn("Imported 5 of 5 products rows", out)
+        # Each batch resets after its ID rows and before its new rows
+        self.assertEqual(resets, [
+            ["Existing", "Imported"],
+            ["Existing", "First new", "Imported", "Imported later", "Second new"],
+        ])
+        self.assertEqual(
+            dict(Product.objects.values_list('pk', 'name')),
+            {
+                existing.pk: "Existing",
+                existing.pk + 10: "Imported",
+                existing.pk + 11: "First new",
+                existing.pk + 12: "Second new",
+                existing.pk + 20: "Imported later",
+                existing.pk + 21: "Third new",
+            },
+        )
+
+    def test_publishes_subscription_events(self):
+        """Test that imports publish new orders, new products and stock changes."""
+        from unittest import mock
+        from crm import pubsub
+
+        customer = Customer.objects.create(name="Events", email="events@example.com")
+        kept = Product.objects.create(name="Kept", price=Decimal("1.00"), stock=5)
+        changed = Product.objects.create(name="Changed", price=Decimal("1.00"), stock=5)
+        broker = mock.Mock()
+        products = [
+            {'id': kept.pk, 'name': "Kept", 'price': "1.00", 'stock': 5},
+            {'id': changed.pk, 'name': "Changed", 'price': "1.00", 'stock': 2},
+            {'name': "Added", 'price': "1.00", 'stock': 7},
+        ]
+        with mock.patch.object(pubsub, 'get_broker', return_value=broker), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.import_file(
+                'products', ''.join(json.dumps(row) + '\n' for row in products)
+            )
+            self.import_file(
+                'orders', f"customer_email,product_ids\nevents@example.com,{kept.pk}\n", '.csv'
+            )
+
+        added = Product.objects.get(name="Added")
+        order = Order.objects.get(customer=customer)
+        self.assertEqual(broker.publish.call_args_list, [
+            mock.call(pubsub.PRODUCT_STOCK_CHANGED,
+                      {'id': changed.pk, 'stock': 2, 'previous_stock': 5}),
+            mock.call(pubsub.PRODUCT_STOCK_CHANGED,
+                      {'id': added.pk, 'stock': 7, 'previous_stock': None}),
+            mock.call(pubsub.ORDER_CREATED, {'id': order.pk, 'customer_id': customer.pk}),
+        ])
+
+    def test_orders_by_customer_email(self):
+        """Test that orders resolve customers and products and refresh aggregates."""
+        customer = Customer.objects.create(name="Importer", email="import@example.com")
+        widget = Product.objects.create(name="Widget", price=Decimal("2.50"), stock=5)
+        gadget = Product.objects.create(name="Gadget", price=Decimal("4.00"), stock=5)
+        out, err = self.import_file('orders', (
+            "customer_email,product_ids\n"
+            f"import@example.com,{widget.pk};{gadget.pk}\n"
+            f"import@example.com,{widget.pk}\n"
+            f"missing@example.com,{widget.pk}\n"
+            "import@example.com,999999\n"
+        ), '.csv')
+
+        self.assertIn("Imported 2 of 4 orders rows", out)
+        self.assertIn("Customer with email 'missing@example.com' does not exist", err)
+        self.assertIn("999999", err)
+        orders = Order.objects.filter(customer=customer).order_by('total_amount')
+        self.assertEqual(
+            [order.total_amount for order in orders], [Decimal("2.50"), Decimal("6.50")]
+        )
+        self.assertEqual(
+            sorted(orders[1].products.values_list('pk', flat=True)), [widget.pk, gadget.pk]
+        )
+        customer.refresh_from_db()
+        self.assertEqual((customer.order_count, customer.lifetime_value), (2, Decimal("9.00")))
+
+    def test_export_round_trip(self):
+        """Test that an export_orders file imports back onto the same orders."""
+        customer = Customer.objects.create(name="Exporter", email="export@example.com")
+        widget = Product.objects.create(name="Widget", price=Decimal("2.50"), stock=5)
+        order = Order.objects.create(
+            customer=customer, total_amount=Decimal("2.50"), order_date=timezone.now()
+        )
+        order.products.set([widget])
+        exported = StringIO()
+        call_command('export_orders', stdout=exported, stderr=StringIO())
+        Order.objects.filter(pk=order.pk).update(total_amount=Decimal("99.00"))
+        order.products.clear()
+
+        out, err = self.import_file('orders', exported.getvalue())
+        self.assertIn("Imported 1 of 1 orders rows", out)
+        self.assertEqual(err, "")
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("2.50"))
+        self.assertEqual(list(order.products.all()), [widget])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_queries_per_batch(self):
+        """Test that a batch of new customers costs a fixed number of queries."""
+        content = "name,email\n" + "".join(
+            f"Customer {idx},customer{idx}@example.com\n" for idx in range(10)
+        )
+        with CaptureQueriesContext(connection) as small:
+            self.import_file('customers', content, '.csv', '--batch-size=10')
+        content = "name,email\n" + "".join(
+            f"Customer {idx},bulk{idx}@example.com\n" for idx in range(100)
+        )
+        with CaptureQueriesContext(connection) as large:
+            self.import_file('customers', content, '.csv', '--batch-size=100')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Customer.objects.count(), 110)
+
+
+class SyntheticDataTest(TestCase):
+    """Test the seeded synthetic data generator."""
+
+    END = timezone.now().replace(microsecond=0)
+
+    def snapshot(self):
+        orders = Order.objects.order_by('pk')
+        return [
+            (order.customer.email, order.total_amount, order.order_date,
+             sorted(order.products.values_list('name', flat=True)))
+            for order in orders.select_related('customer')
+        ]
+
+    def regenerate(self, seed, **kwargs):
+        from crm.synthetic import generate
+
+        Order.objects.all().delete()
+        Customer.objects.all().delete()
+        Product.objects.all().delete()
+        generate(50, 20, 100, seed=seed, end=self.END, **kwargs)
+        return self.snapshot()
+
+    def test_same_seed_same_data(self):
+        """Test that a seed and end date always generate the same rows."""
+        first = self.regenerate(7)
+        self.assertEqual(self.regenerate(7, batch_size=30), first)
+        self.assertNotEqual(self.regenerate(8), first)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_distributions(self):
+        """Test skewed customers, small baskets, valid values and consistent aggregates."""
+        from crm.schema import CreateCustomer, LOW_STOCK_THRESHOLD
+        from crm.synthetic import generate
+
+        counts = generate(200, 50, 2000, seed=1, days=90, end=self.END)
+        self.assertEqual(counts, {'customers': 200, 'products': 50, 'orders': 2000})
+
+        order_counts = sorted(Customer.objects.values_list('order_count', flat=True))
+        self.assertEqual(sum(order_counts), 2000)
+        # The busiest tenth of customers places a large share of the orders
+        self.assertGreater(sum(order_counts[-20:]), 1000)
+        self.assertEqual(list(Customer.objects.order_stats_drift()), [])
+
+        baskets = [order.products.count() for order in Order.objects.order_by('pk')[:200]]
+        self.assertTrue(all(size >= 1 for size in baskets))
+        self.assertGreater(sum(size <= 3 for size in baskets), len(baskets) / 2)
+
+        dates = Order.objects.values_list('order_date', flat=True)
+        self.assertTrue(all(self.END - timedelta(days=90) <= date <= self.END for date in dates))
+        self.assertTrue(Product.objects.filter(stock__lt=LOW_STOCK_THRESHOLD).exists())
+        self.assertFalse(Product.objects.filter(price__lte=0).exists())
+        phones = Customer.objects.exclude(phone=None).values_list('phone', flat=True)
+        self.assertTrue(phones)
+        self.assertTrue(all(CreateCustomer.validate_phone(phone) for phone in phones))
+
+    def test_backends_without_returning_ids(self):
+        """Test that IDs are read back where bulk inserts cannot return them."""
+        from unittest import mock
+
+        expected = self.regenerate(5)
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', False):
+            self.assertEqual(self.regenerate(5, batch_size=30), expected)
+        self.assertFalse(Order.objects.filter(customer=None).exists())
+        self.assertEqual(list(Customer.objects.order_stats_drift()), [])
+
+    def test_command(self):
+        """Test that generate_data reports what it inserted."""
+        out = StringIO()
+        call_command(
+            'generate_data', '--customers=20', '--products=5', '--orders=40', '--seed=3',
+            '--end=2024-01-01', stdout=out,
+        )
+        self.assertIn("Generated 20 customers, 5 products and 40 orders", out.getvalue())
+        self.assertEqual(Order.objects.count(), 40)
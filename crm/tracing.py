@@ -0,0 +1,173 @@
+"""
+Sampled per-resolver tracing for GraphQL requests.
+
+A sampled request (``CRM_TRACING_SAMPLE_RATE``) carries a ``RequestTrace``
+on its context for the duration of execution. ``TracingMiddleware`` times
+every resolver, and a database execute wrapper attributes each SQL query to
+the field that was resolving when it ran. Queries repeated with the same
+SQL are reported as duplicates, which is how N+1 patterns show up. Each
+trace is written to the ``crm.tracing`` logger as one JSON line and, with
+``CRM_TRACING_EXTENSIONS``, returned to the client as Apollo tracing
+(``extensions.tracing``) plus an ``extensions.sql`` summary.
+
+Requests that are not sampled pay one attribute lookup per field.
+"""
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+TRACE_ATTRIBUTE = '_crm_trace'
+
+# Slowest resolvers included in the log line
+SLOWEST_RESOLVERS = 5
+
+
+def field_key(path):
+    """Return ``path`` without list indices, e.g. ``allOrders.edges.node.customer``."""
+    return '.'.join(str(key) for key in path.as_list() if not isinstance(key, int))
+
+
+def isoformat(moment):
+    return moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+class RequestTrace:
+    """Resolver timings and SQL queries of one GraphQL request."""
+
+    def __init__(self):
+        self.start_time = datetime.now(dt_timezone.utc)
+        self.start = time.perf_counter_ns()
+        self.end_time = None
+        self.duration = None
+        self.resolvers = []
+        self.queries = []
+        # Field SQL is attributed to: the last one that started resolving,
+        # since graphql-core completes a field's value right after resolving it
+        self.field = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((self.field, sql, time.perf_counter_ns() - started))
+
+    def record(self, info, started, duration):
+        self.resolvers.append({
+            'path': info.path.as_list(),
+            'parentType': str(info.parent_type),
+            'fieldName': info.field_name,
+            'returnType': str(info.return_type),
+            'startOffset': started - self.start,
+            'duration': duration,
+        })
+
+    def finish(self):
+        self.duration = time.perf_counter_ns() - self.start
+        self.end_time = datetime.now(dt_timezone.utc)
+
+    def duplicates(self):
+        """Return the SQL statements run more than once, with the fields that ran them."""
+        fields = defaultdict(list)
+        for field, sql, _ in self.queries:
+            fields[sql].append(field)
+        return [
+            {'sql': sql, 'count': len(ran_by), 'fields': sorted(set(map(str, ran_by)))}
+            for sql, ran_by in fields.items()
+            if len(ran_by) > 1
+        ]
+
+    def sql_summary(self):
+        by_field = defaultdict(int)
+        for field, _, _ in self.queries:
+            by_field[field or '(request)'] += 1
+        return {
+            'count': len(self.queries),
+            'duration': sum(duration for _, _, duration in self.queries),
+            'byField': dict(by_field),
+            'duplicates': self.duplicates(),
+        }
+
+    def extensions(self):
+        """Return the trace as Apollo tracing and SQL response extensions."""
+        return {
+            'tracing': {
+                'version': 1,
+                'startTime': isoformat(self.start_time),
+                'endTime': isoformat(self.end_time),
+                'duration': self.duration,
+                'execution': {'resolvers': self.resolvers},
+            },
+            'sql': self.sql_summary(),
+        }
+
+    def log(self, operation_name=None, cost=None):
+        """Write the trace to the ``crm.tracing`` logger, as a warning if it has duplicates."""
+        sql = self.sql_summary()
+        slowest = sorted(self.resolvers, key=lambda resolver: -resolver['duration'])
+        record = {
+            'operation': operation_name,
+            'duration_ms': self.duration / 1e6,
+            'cost': cost,
+            'resolvers': len(self.resolvers),
+            'slowest': [
+                {'path': resolver['path'], 'duration_ms': resolver['duration'] / 1e6}
+                for resolver in slowest[:SLOWEST_RESOLVERS]
+            ],
+            'sql_count': sql['count'],
+            'sql_ms': sql['duration'] / 1e6,
+            'sql_by_field': sql['byField'],
+            'duplicates': sql['duplicates'],
+        }
+        level = logging.WARNING if record['duplicates'] else logging.INFO
+        logger.log(level, json.dumps(record, default=str))
+
+
+def should_trace():
+    rate = getattr(settings, 'CRM_TRACING_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+
+@contextmanager
+def trace_request(request):
+    """
+    Trace the GraphQL execution for ``request`` (its context) when sampled,
+    yielding the ``RequestTrace`` or ``None``.
+    """
+    if not should_trace():
+        yield None
+        return
+
+    trace = RequestTrace()
+    setattr(request, TRACE_ATTRIBUTE, trace)
+    try:
+        with connection.execute_wrapper(trace.execute_wrapper):
+            yield trace
+    finally:
+        trace.finish()
+        delattr(request, TRACE_ATTRIBUTE)
+
+
+class TracingMiddleware:
+    """Graphene middleware timing the resolvers of traced requests."""
+
+    def resolve(self, next, root, info, **args):
+        trace = getattr(info.context, TRACE_ATTRIBUTE, None)
+        if trace is None:
+            return next(root, info, **args)
+
+        trace.field = field_key(info.path)
+        started = time.perf_counter_ns()
+        try:
+            return next(root, info, **args)
+        finally:
+            trace.record(info, started, time.perf_counter_ns() - started)
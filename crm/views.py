@@ -0,0 +1,459 @@
+"""
+GraphQL views for the CRM API.
+"""
+import asyncio
+import json
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed,
+    JsonResponse, StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import GraphQLError, OperationType, get_operation_ast, validate
+from graphql.execution import ExecutionResult
+
+from alx_backend_graphql.schema import async_schema
+
+from .async_execution import SyncResolverMiddleware, execute_document_async
+from .complexity import complexity_rules, max_query_cost, operation_key
+from .export import aexport_orders, export_orders, filter_orders, get_writer
+from .loaders import reset_loaders
+from .persisted_queries import execute_document, get_document_cache, get_registry
+from .response_cache import get_response_cache
+from .tracing import trace_request
+
+# Operations accepted in one batch request
+MAX_BATCH_SIZE = 20
+
+# A parsed, validated and priced document ready to execute
+PreparedRequest = namedtuple('PreparedRequest', 'document operation_ast cost extensions')
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQL view with automatic persisted queries and cached documents.
+
+    Documents are looked up in the process-wide document cache instead of
+    being parsed and validated on every request, and clients may send a
+    registered ``sha256Hash`` in place of the query text, over GET or POST.
+    Operations deeper or costlier than the configured limits are rejected
+    before execution, and their estimated cost is reported in the
+    ``cost`` extension. Sampled requests are traced, see ``crm.tracing``.
+    A JSON array of operations is executed as a batch with one request
+    context, so queries share DataLoaders and the database connection; a
+    mutation runs with empty loaders and leaves them empty, so later
+    operations read what it wrote.
+    Read-only queries are served from the response cache when it is
+    enabled, and ``extensions`` of the execution result are returned to the
+    client.
+    """
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        return self.encode_response(request, execution_result, id, show_graphiql)
+
+    def encode_response(self, request, execution_result, id=None, show_graphiql=False):
+        """Return the JSON body and status code for ``execution_result``."""
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def parse_body(self, request):
+        """
+        Parse the request body; a JSON array is a batch of operations,
+        answered with an array of results in the same order.
+        """
+        if self.get_content_type(request) == "application/json":
+            self.batch = self.batch or request.body.lstrip()[:1] == b"["
+        data = super().parse_body(request)
+        if self.batch:
+            max_size = getattr(settings, "CRM_GRAPHQL_MAX_BATCH_SIZE", MAX_BATCH_SIZE)
+            if len(data) > max_size:
+                raise HttpError(HttpResponseBadRequest(
+                    f"Batches are limited to {max_size} operations."
+                ))
+            if not all(isinstance(entry, dict) for entry in data):
+                raise HttpError(HttpResponseBadRequest(
+                    "Every batch entry must be a JSON query."
+                ))
+        return data
+
+    @staticmethod
+    def get_extensions(request, data):
+        """Return the request's ``extensions`` object from the query string or body."""
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        return extensions if isinstance(extensions, dict) else None
+
+    def prepare_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        """
+        Resolve, parse, validate and price the request's document. Returns a
+        ``PreparedRequest``, or the result to respond with when the document
+        must not execute.
+        """
+        try:
+            query, query_key = get_registry().resolve(query, self.get_extensions(request, data))
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        document, errors = get_document_cache().get(self.schema, query, key=query_key)
+        if errors:
+            return ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method.lower() == "get":
+            if operation_ast and operation_ast.operation != OperationType.QUERY:
+                if show_graphiql:
+                    return None
+
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["POST"],
+                        "Can only perform a {} operation from a POST request.".format(
+                            operation_ast.operation.value
+                        ),
+                    )
+                )
+
+        if operation_ast and operation_ast.operation == OperationType.SUBSCRIPTION:
+            return ExecutionResult(errors=[GraphQLError(
+                "Subscriptions are only served over the websocket transport."
+            )])
+
+        # Cost depends on the variables, so it is checked on every request
+        costs = {}
+        errors = validate(
+            self.schema.graphql_schema, document, complexity_rules(variables, costs.update)
+        )
+        cost = costs.get(operation_key(operation_ast)) if operation_ast else None
+        extensions = {}
+        if operation_ast is not None:
+            extensions["cost"] = {"requested": cost, "maximum": max_query_cost()}
+        if errors:
+            return ExecutionResult(errors=errors, extensions=extensions or None)
+        return PreparedRequest(document, operation_ast, cost, extensions)
+
+    def get_execution_options(self, request, context, variables, operation_name):
+        options = {
+            "root_value": self.get_root_value(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "context_value": context,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            options["execution_context_class"] = self.execution_context_class
+        return options
+
+    @staticmethod
+    def is_mutation(operation_ast):
+        return bool(operation_ast) and operation_ast.operation == OperationType.MUTATION
+
+    @staticmethod
+    def is_atomic_mutation(operation_ast):
+        return bool(
+            operation_ast
+            and operation_ast.operation == OperationType.MUTATION
+            and (
+                graphene_settings.ATOMIC_MUTATIONS is True
+                or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+            )
+        )
+
+    def execute_atomic(self, request, schema, document, options):
+        with transaction.atomic():
+            result = execute_document(schema, document, **options)
+            if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                transaction.set_rollback(True)
+        return result
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        prepared = self.prepare_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        if not isinstance(prepared, PreparedRequest):
+            return prepared
+
+        context = self.get_context(request)
+        options = self.get_execution_options(request, context, variables, operation_name)
+        mutation = self.is_mutation(prepared.operation_ast)
+        if mutation:
+            # Loaded rows may be stale once the mutation writes
+            reset_loaders(context)
+        with trace_request(context) as trace:
+            try:
+                if self.is_atomic_mutation(prepared.operation_ast):
+                    result = self.execute_atomic(request, self.schema, prepared.document, options)
+                else:
+                    result = self.execute_query(prepared.document, prepared.operation_ast, options)
+            except Exception as e:
+                result = ExecutionResult(errors=[e])
+        if mutation:
+            reset_loaders(context)
+        return self.finish_request(result, prepared, operation_name, trace)
+
+    def finish_request(self, result, prepared, operation_name, trace=None):
+        """Log ``trace`` and add the request's extensions to ``result``."""
+        extensions = dict(prepared.extensions)
+        if trace is not None:
+            if prepared.operation_ast is not None:
+                operation_name = operation_key(prepared.operation_ast)
+            trace.log(operation_name, prepared.cost)
+            if getattr(settings, "CRM_TRACING_EXTENSIONS", False):
+                extensions.update(trace.extensions())
+        if extensions:
+            result.extensions = {**extensions, **(result.extensions or {})}
+        return result
+
+    def lookup_response(self, document, operation_ast, options):
+        """
+        Look ``document`` up in the response cache. Returns ``(hit, store)``:
+        the cached result, or a function storing the executed result when
+        the document is cacheable.
+        """
+        response_cache = get_response_cache(self.schema)
+        labels = response_cache and response_cache.dependencies(document, operation_ast)
+        if labels is None:
+            return None, None
+
+        key = response_cache.key(
+            document, options["operation_name"], options["variable_values"], labels
+        )
+        data = response_cache.get(key)
+        if data is not None:
+            return ExecutionResult(data=data, extensions={"responseCache": "HIT"}), None
+
+        def store(result):
+            if not result.errors:
+                response_cache.set(key, result.data, labels)
+                result.extensions = {**(result.extensions or {}), "responseCache": "MISS"}
+            return result
+
+        return None, store
+
+    def execute_query(self, document, operation_ast, options):
+        """Execute a non-mutation ``document``, through the response cache if enabled."""
+        hit, store = self.lookup_response(document, operation_ast, options)
+        if hit is not None:
+            return hit
+        result = execute_document(self.schema, document, **options)
+        return store(result) if store else result
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    Async version of ``CRMGraphQLView`` for ASGI deployments.
+
+    Persisted queries, cost limits and the response cache behave the same,
+    and run on the event loop. Documents execute with the async executor
+    against ``async_schema`` (see ``crm.async_execution``), so a request
+    waiting on the database does not stop the server from accepting and
+    answering others. Consecutive queries in a batch run concurrently.
+    Sampled tracing is only available on the sync view.
+    """
+
+    view_is_async = True
+
+    def __init__(self, schema=None, **kwargs):
+        super().__init__(schema=schema or async_schema, **kwargs)
+
+    def get_middleware(self, request):
+        return [SyncResolverMiddleware(), *super().get_middleware(request)]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = await self.get_batch_responses_async(request, data)
+                result = "[{}]".format(",".join([response[0] for response in responses]))
+                status_code = (
+                    responses
+                    and max(responses, key=lambda response: response[1])[1]
+                    or 200
+                )
+            else:
+                result, status_code = await self.get_response_async(request, data)
+
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    def is_read_only(self, request, data):
+        """Return whether the batch entry ``data`` is a query."""
+        try:
+            query, _, operation_name, _ = self.get_graphql_params(request, data)
+            query, query_key = get_registry().resolve(query, self.get_extensions(request, data))
+        except (GraphQLError, HttpError):
+            return False
+        if not query:
+            return False
+        document, _ = get_document_cache().get(self.schema, query, key=query_key)
+        operation_ast = document and get_operation_ast(document, operation_name)
+        return bool(operation_ast) and operation_ast.operation == OperationType.QUERY
+
+    async def get_batch_responses_async(self, request, data):
+        """
+        Answer a batch in order. With ``CRM_GRAPHQL_BATCH_PARALLEL``,
+        consecutive queries run concurrently; mutations still run one at a
+        time, after everything before them.
+        """
+        parallel = getattr(settings, "CRM_GRAPHQL_BATCH_PARALLEL", True)
+        responses = []
+        queries = []
+        for entry in data:
+            if parallel and self.is_read_only(request, entry):
+                queries.append(self.get_response_async(request, entry))
+                continue
+            responses.extend(await asyncio.gather(*queries))
+            queries = []
+            responses.append(await self.get_response_async(request, entry))
+        responses.extend(await asyncio.gather(*queries))
+        return responses
+
+    async def get_response_async(self, request, data):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = await self.execute_graphql_request_async(
+            request, data, query, variables, operation_name
+        )
+        return self.encode_response(request, execution_result, id)
+
+    async def execute_graphql_request_async(self, request, data, query, variables, operation_name):
+        prepared = self.prepare_request(request, data, query, variables, operation_name)
+        if not isinstance(prepared, PreparedRequest):
+            return prepared
+
+        context = self.get_context(request)
+        options = self.get_execution_options(request, context, variables, operation_name)
+        mutation = self.is_mutation(prepared.operation_ast)
+        if mutation:
+            reset_loaders(context)
+        try:
+            if self.is_atomic_mutation(prepared.operation_ast):
+                # A transaction is bound to one thread: run the sync schema there
+                options["middleware"] = super().get_middleware(request)
+                result = await sync_to_async(self.execute_atomic)(
+                    request, graphene_settings.SCHEMA, prepared.document, options
+                )
+            else:
+                result = await self.execute_query_async(
+                    prepared.document, prepared.operation_ast, options
+                )
+        except Exception as e:
+            result = ExecutionResult(errors=[e])
+        if mutation:
+            reset_loaders(context)
+        return self.finish_request(result, prepared, operation_name)
+
+    async def execute_query_async(self, document, operation_ast, options):
+        """Async version of ``execute_query``."""
+        hit, store = self.lookup_response(document, operation_ast, options)
+        if hit is not None:
+            return hit
+        result = await execute_document_async(self.schema, document, **options)
+        return store(result) if store else result
+
+
+def graphql_stats(request):
+    """Report document cache metrics; staff only outside DEBUG."""
+    if not (settings.DEBUG or request.user.is_staff):
+        return HttpResponseForbidden()
+    return JsonResponse({'documents': get_document_cache().stats()})
+
+
+@require_GET
+def export_orders_view(request):
+    """
+    Stream every order matching the ``OrderFilter`` query parameters as
+    ``?format=`` ndjson (default), csv or parquet; staff only outside DEBUG.
+    """
+    if not (settings.DEBUG or request.user.is_staff):
+        return HttpResponseForbidden()
+    params = request.GET.dict()
+    try:
+        writer = get_writer(params.pop('format', 'ndjson'))
+        orders = filter_orders(params)
+    except (ValueError, ImproperlyConfigured) as e:
+        return HttpResponseBadRequest(str(e))
+    except ValidationError as e:
+        return HttpResponseBadRequest(' '.join(e.messages))
+
+    # Under ASGI a sync iterator would be read into memory before sending
+    stream = aexport_orders if isinstance(request, ASGIRequest) else export_orders
+    response = StreamingHttpResponse(stream(orders, writer), content_type=writer.content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders.{writer.extension}"'
+    return response
@@ -0,0 +1,201 @@
+"""
+GraphQL subscriptions over websockets for the ASGI application.
+
+Speaks the ``graphql-transport-ws`` protocol (as implemented by the
+``graphql-ws`` client library) on ``/graphql``: the client opens the socket
+with that subprotocol, sends ``connection_init``, and then any number of
+``subscribe`` messages, each answered with ``next`` messages until either
+side sends ``complete``. Only subscription operations are accepted; queries
+and mutations keep using HTTP.
+
+Documents go through the same parse cache and depth and cost limits as the
+HTTP views, and execute against ``async_schema`` with the async view's
+middleware (see ``crm.async_execution``).
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from django.conf import settings
+from graphql import GraphQLError, OperationType, get_operation_ast, validate
+from graphql.execution import ExecutionResult
+
+from alx_backend_graphql.schema import async_schema
+
+from .async_execution import SyncResolverMiddleware, subscribe_document
+from .complexity import complexity_rules
+from .persisted_queries import get_document_cache
+
+PROTOCOL = 'graphql-transport-ws'
+
+PATH = '/graphql'
+
+# Seconds a client has to send connection_init
+DEFAULT_INIT_TIMEOUT = 10
+
+
+class ProtocolError(Exception):
+    """A protocol violation, closing the socket with ``code``."""
+
+    def __init__(self, code, reason):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+class Disconnected(Exception):
+    """The client went away."""
+
+
+class GraphQLWebSocket:
+    """One ``graphql-transport-ws`` connection."""
+
+    def __init__(self, scope, receive, send, schema=None):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.schema = schema or async_schema
+        self.acknowledged = False
+        self.operations = {}
+
+    async def run(self):
+        message = await self.receive()
+        if message['type'] != 'websocket.connect':
+            return
+        if PROTOCOL not in self.scope.get('subprotocols', ()):
+            # Closing before accepting rejects the handshake
+            await self.send({'type': 'websocket.close', 'code': 1002})
+            return
+        await self.send({'type': 'websocket.accept', 'subprotocol': PROTOCOL})
+
+        try:
+            await self.serve()
+        except ProtocolError as error:
+            await self.send({'type': 'websocket.close', 'code': error.code, 'reason': error.reason})
+        except Disconnected:
+            pass
+        finally:
+            operations = list(self.operations.values())
+            for task in operations:
+                task.cancel()
+            await asyncio.gather(*operations, return_exceptions=True)
+
+    async def serve(self):
+        timeout = getattr(settings, 'CRM_WEBSOCKET_INIT_TIMEOUT', DEFAULT_INIT_TIMEOUT)
+        try:
+            message = await asyncio.wait_for(self.receive_message(), timeout)
+        except asyncio.TimeoutError:
+            raise ProtocolError(4408, "Connection initialisation timeout")
+        while True:
+            await self.handle(message)
+            message = await self.receive_message()
+
+    async def receive_message(self):
+        event = await self.receive()
+        if event['type'] == 'websocket.disconnect':
+            raise Disconnected()
+        try:
+            message = json.loads(event.get('text') or event.get('bytes') or '')
+        except ValueError:
+            raise ProtocolError(4400, "Invalid message received")
+        if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+            raise ProtocolError(4400, "Invalid message received")
+        return message
+
+    async def send_message(self, message):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(message)})
+
+    async def handle(self, message):
+        kind = message['type']
+        if kind == 'connection_init':
+            if self.acknowledged:
+                raise ProtocolError(4429, "Too many initialisation requests")
+            self.acknowledged = True
+            await self.send_message({'type': 'connection_ack'})
+        elif kind == 'ping':
+            await self.send_message({'type': 'pong'})
+        elif kind == 'pong':
+            pass
+        elif kind == 'subscribe':
+            if not self.acknowledged:
+                raise ProtocolError(4401, "Unauthorized")
+            operation_id, payload = message.get('id'), message.get('payload')
+            if not isinstance(operation_id, str) or not isinstance(payload, dict):
+                raise ProtocolError(4400, "Invalid message received")
+            if operation_id in self.operations:
+                raise ProtocolError(4409, f"Subscriber for {operation_id} already exists")
+            self.operations[operation_id] = asyncio.create_task(
+                self.run_operation(operation_id, payload)
+            )
+        elif kind == 'complete':
+            task = self.operations.pop(message.get('id'), None)
+            if task is not None:
+                task.cancel()
+        else:
+            raise ProtocolError(4400, f"Unknown message type '{kind}'")
+
+    def subscribe(self, payload):
+        """
+        Parse, validate and subscribe to the operation in ``payload``,
+        returning an ``ExecutionResult`` with errors or the result stream.
+        """
+        query = payload.get('query')
+        if not isinstance(query, str):
+            return ExecutionResult(errors=[GraphQLError("Must provide query string.")])
+        document, errors = get_document_cache().get(self.schema, query)
+        if errors:
+            return ExecutionResult(errors=errors)
+
+        operation_name = payload.get('operationName')
+        operation_ast = get_operation_ast(document, operation_name)
+        if operation_ast is None or operation_ast.operation != OperationType.SUBSCRIPTION:
+            return ExecutionResult(errors=[GraphQLError(
+                "Only subscriptions are served over the websocket; "
+                "send queries and mutations over HTTP."
+            )])
+
+        variables = payload.get('variables')
+        errors = validate(self.schema.graphql_schema, document, complexity_rules(variables))
+        if errors:
+            return ExecutionResult(errors=errors)
+        return subscribe_document(
+            self.schema,
+            document,
+            lambda: SimpleNamespace(scope=self.scope),
+            variable_values=variables,
+            operation_name=operation_name,
+            middleware=[SyncResolverMiddleware()],
+        )
+
+    async def run_operation(self, operation_id, payload):
+        results = self.subscribe(payload)
+        if not isinstance(results, ExecutionResult):
+            results = await results
+        if isinstance(results, ExecutionResult):
+            self.operations.pop(operation_id, None)
+            await self.send_message({
+                'type': 'error',
+                'id': operation_id,
+                'payload': [error.formatted for error in results.errors],
+            })
+            return
+
+        try:
+            async for result in results:
+                await self.send_message({
+                    'type': 'next', 'id': operation_id, 'payload': result.formatted,
+                })
+        finally:
+            await results.aclose()
+        # The stream ended on the server side
+        if self.operations.pop(operation_id, None) is not None:
+            await self.send_message({'type': 'complete', 'id': operation_id})
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI application serving GraphQL subscriptions on ``/graphql``."""
+    if scope['path'].rstrip('/') != PATH:
+        await receive()
+        await send({'type': 'websocket.close', 'code': 1000})
+        return
+    await GraphQLWebSocket(scope, receive, send).run()